@@ -0,0 +1,42 @@
+from cache_personas import dias_restantes
+
+# Decisiones de acceso
+PERMITIDO = "permitido"
+DENEGADO = "denegado"
+DESCONOCIDO = "desconocido"
+
+
+def evaluar_acceso(nombre_bd, info):
+    """
+    Calcula el estado de acceso de una persona reconocida.
+
+    Args:
+        nombre_bd: Nombre reconocido o "Desconocido"
+        info: InfoPersona de la caché de personas o None
+
+    Returns:
+        Diccionario con la decisión ("permitido", "denegado" o "desconocido"), los
+        días restantes, la etiqueta y el color (BGR) a dibujar sobre el rostro, y el
+        texto y color de la etiqueta de estado
+    """
+    if nombre_bd == "Desconocido" or not info:
+        return {"decision": DESCONOCIDO, "dias": None,
+                "etiqueta": "Desconocido", "color": (0, 255, 0),
+                "estado_texto": "⚠ Persona no reconocida", "color_estado": "gray"}
+
+    # La fecha de expiración viene precalculada en la caché
+    dias = dias_restantes(info)
+
+    # Estado según condiciones
+    if info.habilitado == 0:
+        return {"decision": DENEGADO, "dias": dias,
+                "etiqueta": f"{nombre_bd} (DENEGADO)", "color": (0, 0, 255),  # Rojo en BGR
+                "estado_texto": f"✘ {nombre_bd}: Acceso denegado", "color_estado": "red"}
+    if dias is not None and dias <= 5:
+        return {"decision": PERMITIDO, "dias": dias,
+                "etiqueta": f"{nombre_bd} ({dias} dias)", "color": (0, 165, 255),  # Naranja en BGR
+                "estado_texto": f"⚠ {nombre_bd}: {dias} días restantes", "color_estado": "orange"}
+    dias_texto = "?" if dias is None else dias
+    return {"decision": PERMITIDO, "dias": dias,
+            "etiqueta": f"{nombre_bd}", "color": (0, 255, 0),  # Verde en BGR
+            "estado_texto": f"✓ {nombre_bd}: Acceso permitido ({dias_texto} días)", "color_estado": "green"}
@@ -3,17 +3,23 @@ from tkinter import messagebox, ttk
 import cv2
 from PIL import Image, ImageTk
 from datetime import datetime
+from registro import registrar_o_fusionar
+from calidad import SelectorMuestras, evaluar_calidad
 
 
 class AdminWindow:
-    def __init__(self, parent, logic, cap):
+    def __init__(self, parent, logic, camara):
         """
         Inicializa la ventana de administración
 
+        Args:
+            parent: Ventana padre (root)
+            logic: Instancia de FaceAppLogic
+            camara: CameraSource compartida con la ventana principal
         """
         self.parent = parent
         self.logic = logic
-        self.cap = cap
+        self.camara = camara
         self.window = None
 
     def show(self):
@@ -329,8 +335,12 @@ class AdminWindow:
         progress_label = ttk.Label(progress_frame, text="Buscando rostro para iniciar captura...")
         progress_label.pack()
 
+        # Selección de las mejores muestras según su calidad
+        selector = SelectorMuestras()
+
         # Crear una barra de progreso
-        progress_bar = ttk.Progressbar(top, orient="horizontal", length=300, mode="determinate", maximum=10)
+        progress_bar = ttk.Progressbar(top, orient="horizontal", length=300, mode="determinate",
+                                       maximum=selector.suficientes)
         progress_bar.pack(pady=5)
 
         label_video_capture = tk.Label(top)
@@ -340,70 +350,100 @@ class AdminWindow:
         captured_images = []
         is_capturing = [False]  # Usar una lista para poder modificarla en la función anidada
         rostro_detectado = [False]  # Para controlar si ya se detectó un rostro
+        caja_anterior = [None]  # Caja del frame anterior, para medir la estabilidad
 
         def guardar_imagenes():
             try:
-                self.logic.registrar_rostro_multiple(nombre, captured_images[:10], carnet_id)
-                messagebox.showinfo("Éxito", f"10 imágenes del rostro de {nombre} registradas correctamente.")
+                # Comprueba si el rostro ya está registrado y ofrece fusionarlo
+                mensaje = registrar_o_fusionar(top, self.logic, nombre, captured_images, carnet_id)
+                if mensaje is None:
+                    # Registro cancelado por el usuario
+                    top.destroy()
+                    return
+                messagebox.showinfo("Éxito", mensaje)
                 top.destroy()
                 self.refrescar_tabla()
             except Exception as e:
                 messagebox.showerror("Error", f"No se pudo registrar el rostro: {e}")
 
+        ultima_secuencia = [0]  # Último frame de la cámara ya procesado
+
         def actualizar_captura():
-            ret, frame = self.cap.read()
-            if ret:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = self.logic.face_cascade.detectMultiScale(
-                    gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
-                )
-
-                frame_copia = frame.copy()
-
-                # Si hay un rostro y no estamos capturando aún, iniciamos la captura
-                if len(faces) > 0 and not is_capturing[0] and not rostro_detectado[0]:
-                    is_capturing[0] = True
-                    rostro_detectado[0] = True
-                    progress_label.config(text="¡Rostro detectado! Capturando imágenes (0/10)")
-
-                # Dibujar rectángulos alrededor de los rostros detectados
-                for (x, y, w, h) in faces:
-                    cv2.rectangle(frame_copia, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-                # Mostrar la imagen en la interfaz
-                img = cv2.cvtColor(frame_copia, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(img)
-                imgtk = ImageTk.PhotoImage(image=img)
-                label_video_capture.imgtk = imgtk
-                label_video_capture.configure(image=imgtk)
-                label_video_capture.img = imgtk
-
-                # Si estamos en modo captura y hay un rostro, capturamos la imagen
-                if is_capturing[0] and len(faces) > 0:
-                    x, y, w, h = faces[0]  # Capturar el primer rostro detectado
-                    face_roi = frame[y:y + h, x:x + w]
-                    captured_images.append(face_roi)
-
-                    # Actualizar la barra de progreso y el texto
-                    num_captured = len(captured_images)
-                    progress_bar["value"] = num_captured
-                    progress_label.config(text=f"Capturando imágenes ({num_captured}/10)")
-
-                    # Señal visual de captura
-                    cv2.rectangle(frame_copia, (x, y), (x + w, y + h), (0, 0, 255), 3)
-
-                    if num_captured >= 10:
-                        is_capturing[0] = False
-                        progress_label.config(text="¡Captura completa! Guardando...")
-                        # Guardar automáticamente las imágenes después de un corto retraso
-                        top.after(500, guardar_imagenes)
-                    else:
-                        # Pequeño retraso para no tomar todas las imágenes idénticas
-                        # pero lo suficientemente rápido para ser automático
-                        top.after(100, actualizar_captura)
-                        return
+            if not top.winfo_exists():
+                return
 
+            frame, secuencia, _ = self.camara.leer()
+            if frame is None or secuencia == ultima_secuencia[0]:
+                # Todavía no hay un frame nuevo de la cámara
                 top.after(30, actualizar_captura)
+                return
+            ultima_secuencia[0] = secuencia
+
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = self.logic.detectar_rostros(gray)
+
+            frame_copia = frame.copy()
+
+            # Si hay un rostro y no estamos capturando aún, iniciamos la captura
+            if len(faces) > 0 and not is_capturing[0] and not rostro_detectado[0]:
+                is_capturing[0] = True
+                rostro_detectado[0] = True
+                progress_label.config(text=f"¡Rostro detectado! Capturando imágenes (0/{selector.suficientes})")
+
+            # Dibujar rectángulos alrededor de los rostros detectados
+            for (x, y, w, h) in faces:
+                cv2.rectangle(frame_copia, (x, y), (x + w, y + h), (0, 255, 0), 2)
+
+            # Mostrar la imagen en la interfaz
+            img = cv2.cvtColor(frame_copia, cv2.COLOR_BGR2RGB)
+            img = Image.fromarray(img)
+            imgtk = ImageTk.PhotoImage(image=img)
+            label_video_capture.imgtk = imgtk
+            label_video_capture.configure(image=imgtk)
+            label_video_capture.img = imgtk
+
+            # Si estamos en modo captura y hay un rostro, lo evaluamos como candidato
+            if is_capturing[0] and len(faces) > 0:
+                x, y, w, h = faces[0]  # Capturar el primer rostro detectado
+                face_roi = frame[y:y + h, x:x + w]
+                calidad = evaluar_calidad(face_roi, faces[0], caja_anterior[0])
+                caja_anterior[0] = faces[0]
+                aceptada = selector.ofrecer(face_roi, calidad)
+
+                # Actualizar la barra de progreso y el texto
+                buenas = min(selector.buenas, selector.suficientes)
+                progress_bar["value"] = buenas
+                texto = f"Capturando imágenes ({buenas}/{selector.suficientes})"
+                if calidad.motivo:
+                    texto += f" - {calidad.motivo}"
+                progress_label.config(text=texto)
+
+                # Señal visual de captura: rojo si la muestra se guardó, naranja si se descartó
+                color = (0, 0, 255) if aceptada else (0, 165, 255)
+                cv2.rectangle(frame_copia, (x, y), (x + w, y + h), color, 3)
+
+                if selector.completo:
+                    is_capturing[0] = False
+                    captured_images[:] = selector.muestras()
+                    progress_label.config(text="¡Captura completa! Guardando...")
+                    # Guardar automáticamente las imágenes después de un corto retraso
+                    top.after(500, guardar_imagenes)
+                elif selector.fallido:
+                    # Ningún frame pasó el control de calidad: terminar en lugar de seguir siempre
+                    is_capturing[0] = False
+                    progress_label.config(text="No se pudo capturar el rostro")
+                    motivo = selector.ultimo_motivo or "calidad insuficiente"
+                    messagebox.showerror("Error", f"No se pudo capturar el rostro ({motivo}). "
+                                                  "Inténtelo de nuevo.")
+                    top.destroy()
+                    return
+                else:
+                    # Pequeño retraso para no tomar todas las imágenes idénticas
+                    # pero lo suficientemente rápido para ser automático
+                    top.after(100, actualizar_captura)
+                    return
+
+            top.after(30, actualizar_captura)
 
         # Iniciar la actualización de la cámara que ahora incluye la detección, captura y guardado automático
         actualizar_captura()
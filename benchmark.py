@@ -0,0 +1,549 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+import esquema
+from deteccion import detectar_rostros, roi_alrededor
+from generar_datos import generar_base_datos, generar_escenas, generar_galeria, generar_grupo, perturbar
+from indice import IndiceIVF
+from lbp import ReconocedorLBP, distancias_chi2
+from logic import BACKENDS, BACKEND_OPENCV, FaceAppLogic
+from seguimiento import calcular_iou
+
+
+def cargar_video(ruta, cantidad):
+    """
+    Frames de un video. Las cajas de referencia son las del JSON que guarda
+    generar_datos.py junto al video o, si no existe, las detecciones a escala completa.
+    """
+    ruta_json = os.path.splitext(ruta)[0] + ".json"
+    verdad = None
+    if os.path.exists(ruta_json):
+        with open(ruta_json, encoding="utf-8") as archivo:
+            verdad = json.load(archivo)["frames"]
+
+    cap = cv2.VideoCapture(ruta)
+    cascada = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    escenas = []
+    while len(escenas) < cantidad:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if verdad is not None and len(escenas) < len(verdad):
+            cajas = [tuple(rostro["caja"]) for rostro in verdad[len(escenas)]]
+        else:
+            cajas = [tuple(caja) for caja in detectar_rostros(cascada, gray, 1.0)]
+        escenas.append((gray, cajas))
+    cap.release()
+    return escenas
+
+
+def medir_deteccion(cascada, escenas, escala, usar_roi=False, umbral_iou=0.3):
+    """
+    Returns:
+        (tasa de detección, falsos positivos por frame, ms medios, ms p95)
+    """
+    tiempos = []
+    aciertos = 0
+    total = 0
+    falsos = 0
+    for gray, reales in escenas:
+        # Con ROI se simula conocer la posición previa de los rostros
+        roi = roi_alrededor(reales, gray.shape) if usar_roi else None
+        inicio = time.perf_counter()
+        cajas = detectar_rostros(cascada, gray, escala, roi)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+        usadas = set()
+        for real in reales:
+            total += 1
+            for indice, caja in enumerate(cajas):
+                if indice not in usadas and calcular_iou(real, tuple(caja)) >= umbral_iou:
+                    usadas.add(indice)
+                    aciertos += 1
+                    break
+        falsos += len(cajas) - len(usadas)
+
+    tasa = aciertos / total if total else 0.0
+    return tasa, falsos / max(len(escenas), 1), float(np.mean(tiempos)), float(np.percentile(tiempos, 95))
+
+
+def benchmark_deteccion(args):
+    if args.video:
+        escenas = cargar_video(args.video, args.frames)
+        origen = args.video
+    else:
+        logic = FaceAppLogic(args.db, entrenar=False, solo_lectura=True)
+        try:
+            _, rostros = logic.cargar_rostros()
+        finally:
+            logic.cerrar()
+        if len(rostros) == 0:
+            print("La base de datos no tiene muestras para generar escenas")
+            return
+        escenas = generar_escenas(rostros, args.frames)
+        origen = f"{len(escenas)} escenas sintéticas de {args.db}"
+
+    cascada = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    print(f"Detección Haar sobre {origen}")
+    print(f"{'escala':>7} {'roi':>4} {'detección':>10} {'falsos/frame':>13} {'ms medio':>9} {'ms p95':>8}")
+    for escala in args.escalas:
+        for usar_roi in ((False, True) if args.roi else (False,)):
+            tasa, falsos, medio, p95 = medir_deteccion(cascada, escenas, escala, usar_roi)
+            print(f"{escala:>7.2f} {'sí' if usar_roi else 'no':>4} {tasa:>10.1%} {falsos:>13.2f} "
+                  f"{medio:>9.2f} {p95:>8.2f}")
+
+
+def benchmark_reconocimiento(args):
+    # Solo lectura: medir no debe migrar la BD ni dejar un modelo guardado junto a ella
+    logic = FaceAppLogic(args.db, entrenar=False, solo_lectura=True)
+    try:
+        logic.entrenar_modelo()
+        logic.modelo_modificado = False
+        _, rostros = logic.cargar_rostros()
+        if len(rostros) == 0:
+            print("La base de datos no tiene muestras")
+            return
+        print(f"Reconocimiento por frame ({args.repeticiones} repeticiones, "
+              f"{logic.hilos_reconocimiento} hilos en el pool)")
+        print(f"{'rostros':>8} {'bucle ms':>9} {'lote ms':>8} {'aceleración':>12} {'iguales':>8}")
+        for cantidad in args.rostros:
+            frame, cajas = generar_grupo(rostros, cantidad)
+
+            inicio = time.perf_counter()
+            for _ in range(args.repeticiones):
+                en_bucle = [logic.reconocer_rostro(frame[y:y + h, x:x + w]) for x, y, w, h in cajas]
+            ms_bucle = (time.perf_counter() - inicio) * 1000 / args.repeticiones
+
+            inicio = time.perf_counter()
+            for _ in range(args.repeticiones):
+                ids, distancias, _ = logic.reconocer_rostros(frame, cajas)
+            ms_lote = (time.perf_counter() - inicio) * 1000 / args.repeticiones
+
+            iguales = [persona_id for persona_id, _ in en_bucle] == ids
+            print(f"{cantidad:>8} {ms_bucle:>9.2f} {ms_lote:>8.2f} {ms_bucle / max(ms_lote, 1e-9):>11.2f}x "
+                  f"{'sí' if iguales else 'no':>8}")
+    finally:
+        logic.cerrar()
+
+
+def comparar_decisiones(opencv, numpy_lbp, consultas, umbral):
+    """Devuelve (decisiones distintas, máxima diferencia de distancia)"""
+    distintas = 0
+    max_diferencia = 0.0
+    for consulta in consultas:
+        etiqueta_cv, distancia_cv = opencv.predict(consulta)
+        etiqueta_np, distancia_np = numpy_lbp.predict(consulta)
+        decision_cv = etiqueta_cv if distancia_cv < umbral else None
+        decision_np = etiqueta_np if distancia_np < umbral else None
+        if etiqueta_cv != etiqueta_np or decision_cv != decision_np:
+            distintas += 1
+        max_diferencia = max(max_diferencia, abs(distancia_cv - distancia_np))
+    return distintas, max_diferencia
+
+
+def benchmark_lbp(args):
+    logic = FaceAppLogic(args.db, entrenar=False, solo_lectura=True)
+    try:
+        ids, rostros = logic.cargar_rostros()
+    finally:
+        logic.cerrar()
+    if len(rostros) < 2:
+        print("La base de datos necesita al menos dos muestras")
+        return
+    etiquetas = np.array(ids, dtype=np.int32)
+    rng = np.random.default_rng(0)
+
+    # 1. Mismas decisiones que cv2.face sobre la base de datos
+    opencv = cv2.face.LBPHFaceRecognizer_create()
+    opencv.train(rostros, etiquetas)
+    numpy_lbp = ReconocedorLBP()
+    numpy_lbp.train(rostros, etiquetas)
+    histogramas_iguales = np.array_equal(
+        np.vstack([h.reshape(1, -1) for h in opencv.getHistograms()]), numpy_lbp.histogramas)
+
+    consultas = [perturbar(rostros[int(rng.integers(len(rostros)))], rng) for _ in range(args.consultas)]
+    distintas, max_diferencia = comparar_decisiones(opencv, numpy_lbp, consultas + list(rostros), args.umbral)
+
+    # Dejando una muestra fuera: la decisión depende de las demás muestras
+    distintas_fuera = 0
+    for indice in range(len(rostros)):
+        resto = [rostro for i, rostro in enumerate(rostros) if i != indice]
+        opencv_fuera = cv2.face.LBPHFaceRecognizer_create()
+        opencv_fuera.train(resto, np.delete(etiquetas, indice))
+        numpy_fuera = ReconocedorLBP()
+        numpy_fuera.train(resto, np.delete(etiquetas, indice))
+        diferentes, diferencia = comparar_decisiones(opencv_fuera, numpy_fuera, [rostros[indice]], args.umbral)
+        distintas_fuera += diferentes
+        max_diferencia = max(max_diferencia, diferencia)
+
+    total = len(consultas) + 2 * len(rostros)
+    print(f"Verificación sobre {args.db} ({len(rostros)} muestras, {total} consultas)")
+    print(f"  Histogramas idénticos a cv2.face: {'sí' if histogramas_iguales else 'no'}")
+    print(f"  Decisiones distintas: {distintas + distintas_fuera} de {total}")
+    print(f"  Máxima diferencia de distancia: {max_diferencia:.2e}")
+
+    # 2. Latencia de predict según el tamaño de la galería
+    print(f"\n{'muestras':>9} {'opencv ms':>10} {'numpy ms':>9}")
+    for cantidad in args.muestras:
+        # Diez muestras por persona, como registrar_rostro_multiple
+        galeria, etiquetas_galeria = generar_galeria(rostros, cantidad, rng)
+        opencv = cv2.face.LBPHFaceRecognizer_create()
+        opencv.train(galeria, etiquetas_galeria)
+        numpy_lbp = ReconocedorLBP()
+        numpy_lbp.train(galeria, etiquetas_galeria)
+
+        consultas = [perturbar(galeria[int(rng.integers(cantidad))], rng) for _ in range(args.repeticiones)]
+        tiempos = []
+        for reconocedor in (opencv, numpy_lbp):
+            inicio = time.perf_counter()
+            for consulta in consultas:
+                reconocedor.predict(consulta)
+            tiempos.append((time.perf_counter() - inicio) * 1000 / len(consultas))
+        print(f"{cantidad:>9} {tiempos[0]:>10.2f} {tiempos[1]:>9.2f}")
+
+
+def benchmark_indice(args):
+    logic = FaceAppLogic(args.db, entrenar=False, solo_lectura=True)
+    try:
+        _, rostros = logic.cargar_rostros()
+    finally:
+        logic.cerrar()
+    if len(rostros) == 0:
+        print("La base de datos no tiene muestras")
+        return
+    rng = np.random.default_rng(0)
+
+    print(f"Índice IVF (PCA {args.dimensiones} dimensiones, {args.candidatos} candidatos)")
+    print(f"{'muestras':>9} {'construir s':>12} {'nprobe':>7} {'exacto ms':>10} {'índice ms':>10} "
+          f"{'recall@1':>9} {'vecino en cand.':>16}")
+    for cantidad in args.muestras:
+        exacto = ReconocedorLBP()
+        consultas = []
+        # Generar la galería por bloques para no acumular las imágenes; las consultas
+        # son variantes nuevas de muestras de la galería
+        for inicio in range(0, cantidad, 1000):
+            galeria, etiquetas = generar_galeria(rostros, min(1000, cantidad - inicio), rng)
+            exacto.update(galeria, etiquetas + inicio // 10)
+            por_bloque = -(-args.repeticiones * len(galeria) // cantidad)
+            consultas.extend(perturbar(galeria[int(i)], rng) for i in rng.integers(len(galeria), size=por_bloque))
+        consultas = exacto.calcular_histogramas(consultas)
+
+        indice = IndiceIVF(dimensiones=args.dimensiones, candidatos=args.candidatos, minimo_muestras=0)
+        inicio = time.perf_counter()
+        indice.construir(exacto.histogramas)
+        segundos_construir = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        vecinos = [int(np.argmin(distancias_chi2(exacto.histogramas, exacto._sumas[:cantidad], consulta)))
+                   for consulta in consultas]
+        ms_exacto = (time.perf_counter() - inicio) * 1000 / len(consultas)
+
+        for nprobe in args.nprobe:
+            aciertos = 0
+            contenidos = 0
+            inicio = time.perf_counter()
+            for consulta, vecino in zip(consultas, vecinos):
+                filas = np.sort(indice.buscar(consulta, nprobe=nprobe))
+                distancias = distancias_chi2(exacto.histogramas[filas], exacto._sumas[filas], consulta)
+                aciertos += int(filas[int(np.argmin(distancias))] == vecino)
+                contenidos += int(vecino in filas)
+            ms_indice = (time.perf_counter() - inicio) * 1000 / len(consultas)
+            print(f"{cantidad:>9} {segundos_construir:>12.2f} {nprobe:>7} {ms_exacto:>10.2f} {ms_indice:>10.2f} "
+                  f"{aciertos / len(consultas):>9.1%} {contenidos / len(consultas):>16.1%}")
+
+
+def crear_bd_sintetica(com, personas, muestras_persona, bytes_muestra, semilla=0):
+    """Llena una base de datos con personas y muestras aleatorias (sin rostros reales)"""
+    rng = np.random.default_rng(semilla)
+    hoy = datetime.now()
+    filas = [(f"Persona {i}", int(rng.random() < 0.8),
+              (hoy - timedelta(days=int(rng.integers(0, 60)))).strftime("%Y-%m-%d"), f"{i:08d}")
+             for i in range(personas)]
+    com.executemany("INSERT INTO personas (nombre, habilitado, fecha_registro, carnet_id) VALUES (?, ?, ?, ?)",
+                    filas)
+    muestra = rng.integers(0, 256, bytes_muestra, dtype=np.uint8).tobytes()
+    com.executemany("INSERT INTO imagenes_personas (persona_id, encoding, formato) VALUES (?, ?, 1)",
+                    ((persona_id, muestra) for persona_id in range(1, personas + 1)
+                     for _ in range(muestras_persona)))
+    com.commit()
+
+
+def medir_operacion(operacion, repeticiones, rng):
+    """Microsegundos (media, p50, p95) de operacion(i) con i aleatorio"""
+    tiempos = []
+    for i in rng.integers(0, 1 << 30, size=repeticiones):
+        inicio = time.perf_counter()
+        operacion(int(i))
+        tiempos.append((time.perf_counter() - inicio) * 1e6)
+    return np.mean(tiempos), np.percentile(tiempos, 50), np.percentile(tiempos, 95)
+
+
+def benchmark_sqlite(args):
+    n = args.personas
+    limite = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+    with tempfile.TemporaryDirectory() as carpeta:
+        configuraciones = []
+        # Antes: solo las tablas, journal por defecto y synchronous=FULL
+        com = sqlite3.connect(os.path.join(carpeta, "base.db"))
+        esquema.MIGRACIONES[0][2](com.cursor())
+        configuraciones.append(("sin optimizar", com))
+        # Después: esquema migrado (índices) y pragmas de rendimiento
+        com = esquema.conectar(os.path.join(carpeta, "optimizada.db"))
+        esquema.migrar(com)
+        configuraciones.append(("WAL + índices", com))
+
+        for _, com in configuraciones:
+            crear_bd_sintetica(com, n, args.muestras, args.bytes_muestra)
+
+        def operaciones(com):
+            cursor = com.cursor()
+
+            def actualizar(i):
+                cursor.execute("UPDATE personas SET habilitado = ? WHERE id = ?", (i & 1, i % n + 1))
+                com.commit()
+
+            return (
+                ("buscar por nombre", lambda i: cursor.execute(
+                    "SELECT id FROM personas WHERE nombre = ?", (f"Persona {i % n}",)).fetchall()),
+                ("info por id", lambda i: cursor.execute(
+                    "SELECT habilitado, fecha_registro, carnet_id FROM personas WHERE id = ?",
+                    (i % n + 1,)).fetchone()),
+                ("muestras de persona", lambda i: cursor.execute(
+                    "SELECT encoding, formato FROM imagenes_personas WHERE persona_id = ?",
+                    (i % n + 1,)).fetchall()),
+                ("barrido expiración", lambda i: cursor.execute(
+                    "SELECT COUNT(*) FROM personas WHERE habilitado = 1 AND fecha_registro <= ?",
+                    (limite,)).fetchone()),
+                ("actualizar + commit", actualizar),
+            )
+
+        print(f"SQLite: {n} personas, {args.muestras} muestras de {args.bytes_muestra} bytes por persona "
+              f"({args.repeticiones} repeticiones, microsegundos)")
+        print(f"{'operación':<22} {'configuración':<15} {'media':>9} {'p50':>9} {'p95':>9}")
+        mediciones = [operaciones(com) for _, com in configuraciones]
+        for indice_operacion in range(len(mediciones[0])):
+            for (nombre_configuracion, _), ops in zip(configuraciones, mediciones):
+                nombre, operacion = ops[indice_operacion]
+                media, p50, p95 = medir_operacion(operacion, args.repeticiones, np.random.default_rng(0))
+                print(f"{nombre:<22} {nombre_configuracion:<15} {media:>9.1f} {p50:>9.1f} {p95:>9.1f}")
+
+        for _, com in configuraciones:
+            com.close()
+
+
+def percentiles(tiempos):
+    """Resumen (milisegundos) de una lista de tiempos en milisegundos"""
+    tiempos = np.asarray(tiempos, dtype=np.float64)
+    resumen = {"n": int(tiempos.size), "media": float(tiempos.mean())}
+    for p in (50, 90, 95, 99):
+        resumen[f"p{p}"] = float(np.percentile(tiempos, p))
+    resumen["max"] = float(tiempos.max())
+    return resumen
+
+
+def cronometrar(funcion, repeticiones):
+    """Percentiles de funcion(i) para i en range(repeticiones)"""
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(i)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return percentiles(tiempos)
+
+
+def medir_logica(logic, escenas, args, rng):
+    """Percentiles de cada etapa de FaceAppLogic sobre su base de datos"""
+    etapas = {}
+    etapas["cargar_rostros"] = cronometrar(lambda _: logic.cargar_rostros(), args.repeticiones_carga)
+    etapas["entrenar_modelo"] = cronometrar(lambda _: logic.entrenar_modelo(), args.repeticiones_carga)
+    # El benchmark no debe dejar un modelo guardado junto a la base de datos
+    logic.modelo_modificado = False
+
+    ids, rostros = logic.cargar_rostros()
+    consultas = [perturbar(rostros[int(i)], rng) for i in rng.integers(len(rostros), size=args.consultas)]
+    etapas["reconocer_rostro"] = cronometrar(lambda i: logic.reconocer_rostro(consultas[i]), len(consultas))
+
+    personas = logic.obtener_todas_personas_con_id()
+    elegidas = [personas[int(i)] for i in rng.integers(len(personas), size=args.consultas)]
+    etapas["sqlite/obtener_info_persona"] = cronometrar(
+        lambda i: logic.obtener_info_persona(elegidas[i][0]), len(elegidas))
+    etapas["sqlite/buscar_ids_por_nombre"] = cronometrar(
+        lambda i: logic.buscar_ids_por_nombre(elegidas[i][1]), len(elegidas))
+    etapas["sqlite/obtener_todas_personas"] = cronometrar(
+        lambda _: logic.obtener_todas_personas_con_id(), args.repeticiones_carga)
+
+    if escenas:
+        etapas["detectMultiScale"] = cronometrar(lambda i: logic.detectar_rostros(escenas[i][0]), len(escenas))
+    return etapas
+
+
+def imprimir_etapas(titulo, etapas):
+    print(f"\n{titulo}")
+    print(f"{'etapa':<34} {'n':>5} {'media ms':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for nombre, r in etapas.items():
+        print(f"{nombre:<34} {r['n']:>5} {r['media']:>9.3f} {r['p50']:>9.3f} {r['p95']:>9.3f} {r['p99']:>9.3f}")
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar_resultados(actual, anterior, tolerancia):
+    """Imprime la variación del p50 y p95 de cada etapa respecto a un JSON anterior"""
+    print(f"\nComparación con el commit {anterior['meta'].get('commit')} (tolerancia {tolerancia:.0%})")
+    print(f"{'galería/etapa':<45} {'p50':>8} {'p95':>8}")
+    regresiones = 0
+    for galeria, etapas in actual["galerias"].items():
+        for nombre, r in etapas.items():
+            previo = anterior["galerias"].get(galeria, {}).get(nombre)
+            if previo is None:
+                continue
+            cambios = [r[p] / max(previo[p], 1e-9) for p in ("p50", "p95")]
+            marca = " <- regresión" if cambios[0] > 1 + tolerancia else ""
+            regresiones += bool(marca)
+            print(f"{galeria + '/' + nombre:<45} {cambios[0]:>7.2f}x {cambios[1]:>7.2f}x{marca}")
+    return regresiones
+
+
+def benchmark_suite(args):
+    rng = np.random.default_rng(args.semilla)
+    resultado = {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit_actual(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "cpus": os.cpu_count(),
+            "backend": args.backend,
+            "argumentos": {clave: valor for clave, valor in vars(args).items() if clave != "funcion"},
+        },
+        "galerias": {},
+    }
+
+    logic = FaceAppLogic(args.db, entrenar=False, backend=args.backend, solo_lectura=True)
+    try:
+        _, rostros = logic.cargar_rostros()
+        if len(rostros) == 0:
+            print("La base de datos no tiene muestras")
+            return
+        escenas = cargar_video(args.video, args.frames) if args.video else generar_escenas(rostros, args.frames)
+        resultado["galerias"][os.path.basename(args.db)] = medir_logica(logic, escenas, args, rng)
+    finally:
+        logic.cerrar()
+
+    # Galerías sintéticas del tamaño pedido, en una BD temporal
+    for cantidad in args.tamanos:
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, f"sintetica_{cantidad}.db")
+            # Diez muestras por persona, como registrar_rostro_multiple
+            generar_base_datos(ruta, rostros, max(1, cantidad // 10), 10, rng)
+            logic = FaceAppLogic(ruta, entrenar=False, backend=args.backend, solo_lectura=True)
+            try:
+                resultado["galerias"][f"sintetica_{cantidad}"] = medir_logica(logic, None, args, rng)
+            finally:
+                logic.cerrar()
+
+    for galeria, etapas in resultado["galerias"].items():
+        imprimir_etapas(f"{galeria} (backend {args.backend})", etapas)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.json}")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            anterior = json.load(archivo)
+        if comparar_resultados(resultado, anterior, args.tolerancia):
+            raise SystemExit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mediciones de rendimiento del sistema de reconocimiento")
+    parser.add_argument("--db", default="rostrosv2.db", help="Ruta de la base de datos SQLite")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    parser_deteccion = subparsers.add_parser(
+        "deteccion", help="Tasa de detección frente a latencia a distintas escalas")
+    parser_deteccion.add_argument("--escalas", type=float, nargs="+", default=[1.0, 0.75, 0.5, 0.35, 0.25])
+    parser_deteccion.add_argument("--frames", type=int, default=200, help="Número de frames a medir")
+    parser_deteccion.add_argument("--video", help="Usar un video en lugar de escenas sintéticas")
+    parser_deteccion.add_argument("--roi", action="store_true",
+                                  help="Medir también la detección limitada a la región de los rostros")
+    parser_deteccion.set_defaults(funcion=benchmark_deteccion)
+
+    parser_reconocimiento = subparsers.add_parser(
+        "reconocimiento", help="Reconocimiento rostro a rostro frente a reconocer_rostros en lote")
+    parser_reconocimiento.add_argument("--rostros", type=int, nargs="+", default=[1, 4, 8],
+                                       help="Rostros por frame a medir")
+    parser_reconocimiento.add_argument("--repeticiones", type=int, default=50)
+    parser_reconocimiento.set_defaults(funcion=benchmark_reconocimiento)
+
+    parser_lbp = subparsers.add_parser(
+        "lbp", help="Compara el backend numpy con cv2.face: decisiones y latencia de predict")
+    parser_lbp.add_argument("--consultas", type=int, default=200,
+                            help="Variantes perturbadas de las muestras a comparar")
+    parser_lbp.add_argument("--umbral", type=float, default=80, help="Umbral de reconocer_rostro")
+    parser_lbp.add_argument("--muestras", type=int, nargs="+", default=[20, 200, 2000],
+                            help="Tamaños de galería para medir la latencia")
+    parser_lbp.add_argument("--repeticiones", type=int, default=50)
+    parser_lbp.set_defaults(funcion=benchmark_lbp)
+
+    parser_indice = subparsers.add_parser(
+        "indice", help="Recall y latencia del índice aproximado frente a la búsqueda exacta")
+    parser_indice.add_argument("--muestras", type=int, nargs="+", default=[2000, 10000],
+                               help="Tamaños de galería sintética")
+    parser_indice.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16],
+                               help="Listas recorridas por búsqueda")
+    parser_indice.add_argument("--dimensiones", type=int, default=64)
+    parser_indice.add_argument("--candidatos", type=int, default=100)
+    parser_indice.add_argument("--repeticiones", type=int, default=100)
+    parser_indice.set_defaults(funcion=benchmark_indice)
+
+    parser_sqlite = subparsers.add_parser(
+        "sqlite", help="Latencia de consultas y actualizaciones con y sin WAL e índices")
+    parser_sqlite.add_argument("--personas", type=int, default=10000)
+    parser_sqlite.add_argument("--muestras", type=int, default=3, help="Muestras por persona")
+    parser_sqlite.add_argument("--bytes-muestra", type=int, default=1000)
+    parser_sqlite.add_argument("--repeticiones", type=int, default=500)
+    parser_sqlite.set_defaults(funcion=benchmark_sqlite)
+
+    parser_suite = subparsers.add_parser(
+        "suite", help="Percentiles de cada etapa (detección, reconocimiento, entrenamiento, carga, SQLite)")
+    parser_suite.add_argument("--tamanos", type=int, nargs="*", default=[1000, 10000],
+                              help="Tamaños de galería sintética además de la BD (p. ej. 1000 10000 100000)")
+    parser_suite.add_argument("--backend", choices=BACKENDS, default=BACKEND_OPENCV)
+    parser_suite.add_argument("--frames", type=int, default=100, help="Frames para medir la detección")
+    parser_suite.add_argument("--video", help="Reproducir un video grabado en lugar de escenas sintéticas")
+    parser_suite.add_argument("--consultas", type=int, default=200,
+                              help="Rostros y búsquedas SQLite medidos por galería")
+    parser_suite.add_argument("--repeticiones-carga", type=int, default=3,
+                              help="Repeticiones de cargar_rostros y entrenar_modelo")
+    parser_suite.add_argument("--semilla", type=int, default=0)
+    parser_suite.add_argument("--json", help="Guardar los resultados en este archivo JSON")
+    parser_suite.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar")
+    parser_suite.add_argument("--tolerancia", type=float, default=0.2,
+                              help="Aumento relativo del p50 que se considera regresión")
+    parser_suite.set_defaults(funcion=benchmark_suite)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import threading
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+# Estado de una persona tal como lo necesita el bucle de video.
+# fecha_expiracion es un date precalculado (o None si no hay fecha de registro).
+InfoPersona = namedtuple(
+    "InfoPersona", ["id", "nombre", "habilitado", "fecha_registro", "fecha_expiracion", "carnet_id"])
+
+
+def dias_restantes(info, hoy=None):
+    """Días de acceso que le quedan a la persona, o None si no tiene fecha de registro"""
+    if info.fecha_expiracion is None:
+        return None
+    hoy = hoy or date.today()
+    return max(0, (info.fecha_expiracion - hoy).days)
+
+
+class PersonaCache:
+    """
+    Caché en memoria del estado de las personas indexada por id, para que el bucle
+    de reconocimiento no consulte SQLite en cada frame. Los caminos de escritura
+    deben llamar a invalidar() tras modificar la tabla personas. Con `version` la
+    caché también se recarga cuando otro proceso escribe en la base de datos.
+    """
+
+    COLUMNAS = "id, nombre, habilitado, fecha_registro, carnet_id"
+
+    def __init__(self, consultar, dias_suscripcion=30, version=None):
+        """
+        Args:
+            consultar: Función (sql, parametros) -> lista de filas, segura entre hilos
+            dias_suscripcion: Días de acceso desde fecha_registro hasta la expiración
+            version: Función opcional sin argumentos que cambia de valor cuando la BD
+                cambia (RepositorioSQLite.version_datos); se comprueba en cada consulta
+        """
+        self._consultar = consultar
+        self.dias_suscripcion = dias_suscripcion
+        self._version = version
+        self._version_cargada = None
+        self._por_id = {}
+        self._cargada = False
+        self._lock = threading.Lock()
+
+    def obtener(self, persona_id):
+        """Devuelve el InfoPersona del id indicado o None si no existe"""
+        with self._lock:
+            self._cargar_si_necesario()
+            return self._por_id.get(persona_id)
+
+    def invalidar(self, persona_id=None):
+        """Recarga una persona desde la BD, o marca toda la caché para recargarla si no se indica id"""
+        with self._lock:
+            if persona_id is None:
+                self._cargada = False
+                return
+            if not self._cargada:
+                return
+            persona_id = int(persona_id)
+            self._por_id.pop(persona_id, None)
+            filas = self._consultar(f"SELECT {self.COLUMNAS} FROM personas WHERE id = ?", (persona_id,))
+            for fila in filas:
+                self._guardar(self._crear_info(fila))
+
+    def _crear_info(self, fila):
+        persona_id, nombre, habilitado, fecha_registro, carnet_id = fila
+        fecha_expiracion = None
+        if fecha_registro:
+            try:
+                fecha_expiracion = (datetime.strptime(fecha_registro, "%Y-%m-%d").date()
+                                    + timedelta(days=self.dias_suscripcion))
+            except ValueError:
+                pass
+        return InfoPersona(persona_id, nombre, habilitado, fecha_registro, fecha_expiracion, carnet_id)
+
+    def _cargar_si_necesario(self):
+        version = None
+        if self._version is not None:
+            # Leída antes de cargar: una escritura durante la carga provoca otra recarga
+            version = self._version()
+            if version != self._version_cargada:
+                self._cargada = False
+        if self._cargada:
+            return
+        self._version_cargada = version
+        self._por_id = {}
+        for fila in self._consultar(f"SELECT {self.COLUMNAS} FROM personas", ()):
+            self._guardar(self._crear_info(fila))
+        self._cargada = True
+
+    def _guardar(self, info):
+        self._por_id[info.id] = info
@@ -0,0 +1,154 @@
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from seguimiento import calcular_iou
+
+# Umbrales de las capturas de registro (sobre el rostro reducido a 100x100 en grises)
+NITIDEZ_MINIMA = 30.0      # Varianza del laplaciano por debajo de la cual el rostro está movido/borroso
+NITIDEZ_OBJETIVO = 250.0
+TAMANO_MINIMO = 80         # Lado mínimo de la caja detectada, en píxeles del frame
+TAMANO_OBJETIVO = 160
+BRILLO_MINIMO = 50
+BRILLO_MAXIMO = 210
+CONTRASTE_MINIMO = 20.0    # Desviación típica de intensidad
+CONTRASTE_OBJETIVO = 55.0
+
+# Peso de cada criterio en la puntuación final
+PESOS = {"nitidez": 0.35, "tamano": 0.2, "iluminacion": 0.2, "estabilidad": 0.25}
+
+Calidad = namedtuple("Calidad", ["puntuacion", "nitidez", "tamano", "iluminacion", "estabilidad", "motivo"])
+
+
+def evaluar_calidad(rostro, caja, caja_anterior=None):
+    """
+    Puntúa un rostro candidato para el registro.
+
+    Args:
+        rostro: Recorte del rostro (BGR o grises) tal como sale del frame
+        caja: Caja (x, y, w, h) detectada en el frame actual
+        caja_anterior: Caja del frame anterior, para medir la estabilidad de la detección
+
+    Returns:
+        Calidad con la puntuación global (0-1), la de cada criterio y el motivo de
+        rechazo (None si el rostro es aceptable)
+    """
+    gris = cv2.cvtColor(rostro, cv2.COLOR_BGR2GRAY) if rostro.ndim > 2 else rostro
+    gris = cv2.resize(gris, (100, 100))
+
+    varianza = cv2.Laplacian(gris, cv2.CV_64F).var()
+    nitidez = min(varianza / NITIDEZ_OBJETIVO, 1.0)
+
+    lado = min(caja[2], caja[3])
+    tamano = min(lado / TAMANO_OBJETIVO, 1.0)
+
+    brillo = float(gris.mean())
+    contraste = float(gris.std())
+    iluminacion = (1.0 - abs(brillo - 128.0) / 128.0) * min(contraste / CONTRASTE_OBJETIVO, 1.0)
+
+    # Sin frame anterior no hay forma de saber si la cabeza está quieta
+    estabilidad = calcular_iou(caja, caja_anterior) if caja_anterior is not None else 0.5
+
+    motivo = None
+    if lado < TAMANO_MINIMO:
+        motivo = "Acérquese a la cámara"
+    elif not BRILLO_MINIMO <= brillo <= BRILLO_MAXIMO or contraste < CONTRASTE_MINIMO:
+        motivo = "Mejore la iluminación"
+    elif varianza < NITIDEZ_MINIMA:
+        motivo = "Imagen borrosa, no se mueva"
+
+    puntuacion = (PESOS["nitidez"] * nitidez + PESOS["tamano"] * tamano
+                  + PESOS["iluminacion"] * iluminacion + PESOS["estabilidad"] * estabilidad)
+    return Calidad(puntuacion, nitidez, tamano, iluminacion, estabilidad, motivo)
+
+
+def _miniatura(rostro):
+    """Rostro reducido a 25x25 en grises, para comparar capturas entre sí"""
+    gris = cv2.cvtColor(rostro, cv2.COLOR_BGR2GRAY) if rostro.ndim > 2 else rostro
+    return cv2.resize(gris, (25, 25), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+class SelectorMuestras:
+    """
+    Conserva durante la captura de registro las mejores muestras vistas hasta el
+    momento (como mucho `maximo`), evitando guardar capturas casi idénticas: si un
+    candidato se parece demasiado a una muestra ya guardada solo se queda el de
+    mayor puntuación. La captura puede terminar en cuanto hay `suficientes`
+    muestras buenas y diversas, o tras `maximo_candidatos` frames con lo que haya.
+    Si tras esos frames ninguno pasó el control de calidad la captura falla.
+    """
+
+    def __init__(self, maximo=10, suficientes=6, umbral_bueno=0.6, maximo_candidatos=80,
+                 diferencia_minima=2.0):
+        """
+        Args:
+            maximo: Tamaño del buffer de mejores muestras
+            suficientes: Muestras buenas con las que se da la captura por terminada
+            umbral_bueno: Puntuación a partir de la cual una muestra cuenta como buena
+            maximo_candidatos: Frames con rostro tras los que se termina igualmente
+            diferencia_minima: Diferencia media de intensidad (0-255) entre miniaturas
+                por debajo de la cual dos capturas se consideran la misma
+        """
+        self.maximo = maximo
+        self.suficientes = suficientes
+        self.umbral_bueno = umbral_bueno
+        self.maximo_candidatos = maximo_candidatos
+        self.diferencia_minima = diferencia_minima
+        self.candidatos = 0
+        self.ultimo_motivo = None  # Motivo del último rechazo, para explicar un fallo
+        self._muestras = []  # [(puntuacion, rostro, miniatura)]
+
+    def ofrecer(self, rostro, calidad):
+        """
+        Considera un rostro candidato.
+
+        Returns:
+            True si el rostro entró en el buffer
+        """
+        self.candidatos += 1
+        if calidad.motivo is not None:
+            self.ultimo_motivo = calidad.motivo
+            return False
+
+        miniatura = _miniatura(rostro)
+        muestra = (calidad.puntuacion, rostro.copy(), miniatura)
+
+        # Una captura casi idéntica a otra ya guardada solo la sustituye si es mejor
+        for i, (puntuacion, _, otra) in enumerate(self._muestras):
+            if np.abs(miniatura - otra).mean() < self.diferencia_minima:
+                if calidad.puntuacion > puntuacion:
+                    self._muestras[i] = muestra
+                    return True
+                return False
+
+        if len(self._muestras) < self.maximo:
+            self._muestras.append(muestra)
+            return True
+        peor = min(range(len(self._muestras)), key=lambda i: self._muestras[i][0])
+        if calidad.puntuacion > self._muestras[peor][0]:
+            self._muestras[peor] = muestra
+            return True
+        return False
+
+    @property
+    def buenas(self):
+        return sum(1 for puntuacion, _, _ in self._muestras if puntuacion >= self.umbral_bueno)
+
+    @property
+    def completo(self):
+        if self.buenas >= self.suficientes:
+            return True
+        return self.candidatos >= self.maximo_candidatos and len(self._muestras) > 0
+
+    @property
+    def fallido(self):
+        """True si se agotaron los candidatos sin ninguna muestra aceptable"""
+        return self.candidatos >= self.maximo_candidatos and not self._muestras
+
+    def muestras(self):
+        """Rostros a registrar, de mejor a peor; solo las buenas si hay suficientes"""
+        ordenadas = sorted(self._muestras, key=lambda m: m[0], reverse=True)
+        if self.buenas >= self.suficientes:
+            ordenadas = [m for m in ordenadas if m[0] >= self.umbral_bueno]
+        return [rostro for _, rostro, _ in ordenadas]
@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+
+import cv2
+
+
+def interpretar_fuente(texto):
+    """Índice de cámara si el texto es un número; si no, ruta de archivo o URL (rtsp://, http://...)"""
+    texto = str(texto).strip()
+    return int(texto) if texto.isdigit() else texto
+
+
+class CameraSource:
+    """
+    Hilo dueño del dispositivo de captura. Lee frames continuamente y conserva solo
+    el más reciente junto con su número de secuencia y marca de tiempo, de modo que
+    cualquier número de consumidores puede leerlo sin bloquear ni competir por la cámara.
+    También concentra la lógica de reconexión con reintentos y espera progresiva.
+    """
+
+    def __init__(self, fuente=0, max_reintentos=3, fps=15, espera_maxima=10.0,
+                 tiempo_real=True, repetir=True, alternar=True):
+        """
+        Args:
+            fuente: Índice de la cámara, ruta de un archivo de video o URL de un stream
+            max_reintentos: Intentos de apertura antes de cambiar de cámara y esperar
+            fps: FPS solicitados al dispositivo
+            espera_maxima: Espera máxima (segundos) entre rondas de reconexión
+            tiempo_real: Reproducir los archivos a su velocidad original; con False se
+                leen tan rápido como se pueda (para medir el rendimiento)
+            repetir: Volver a empezar los archivos al terminar; con False la captura se
+                detiene y terminado pasa a True
+            alternar: Si una cámara por índice falla, probar con la otra (0 <-> 1); con
+                varias cámaras a la vez debe ser False para que no se quiten el dispositivo
+        """
+        self.fuente = fuente
+        self.max_reintentos = max_reintentos
+        self.fps = fps
+        self.espera_maxima = espera_maxima
+        self.tiempo_real = tiempo_real
+        self.repetir = repetir
+        self.alternar = alternar
+        self.terminado = False
+
+        self.cap = None
+        self.conectada = False
+        self.estado = "Inicializando cámara..."
+        self.rondas_fallidas = 0
+
+        self._frame = None
+        self._secuencia = 0
+        self._marca_tiempo = 0.0
+        self._condicion = threading.Condition()
+
+        self._detener = threading.Event()
+        self._hilo = None
+
+    @property
+    def es_archivo(self):
+        return isinstance(self.fuente, str) and os.path.isfile(self.fuente)
+
+    def iniciar(self):
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name=f"camara-{self.fuente}", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        with self._condicion:
+            self._condicion.notify_all()
+        if self._hilo is not None:
+            self._hilo.join(timeout=2.0)
+            if self._hilo.is_alive():
+                # Sigue bloqueado en cap.read(): liberar ahora sería usar el dispositivo
+                # después de soltarlo; el propio hilo lo libera al salir del bucle
+                return
+            self._hilo = None
+        self._liberar()
+
+    def leer(self):
+        """
+        Devuelve (frame, secuencia, marca_tiempo) del último frame capturado sin bloquear.
+        Si aún no hay ningún frame devuelve (None, 0, 0.0). El frame no debe modificarse.
+        """
+        with self._condicion:
+            return self._frame, self._secuencia, self._marca_tiempo
+
+    def esperar_frame(self, ultima_secuencia=0, timeout=0.5):
+        """Espera un frame más nuevo que ultima_secuencia; devuelve (None, ...) si no llega a tiempo"""
+        with self._condicion:
+            self._condicion.wait_for(
+                lambda: self._secuencia > ultima_secuencia or self._detener.is_set(), timeout=timeout)
+            if self._secuencia <= ultima_secuencia:
+                return None, ultima_secuencia, self._marca_tiempo
+            return self._frame, self._secuencia, self._marca_tiempo
+
+    def _backend(self):
+        # Windows Media Foundation para cámaras en Windows; en otro caso el backend por defecto
+        if isinstance(self.fuente, int) and os.name == "nt":
+            return cv2.CAP_MSMF
+        return cv2.CAP_ANY
+
+    def _liberar(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        self.conectada = False
+
+    def _abrir(self):
+        """Intenta abrir la fuente con reintentos. Devuelve True si quedó lista."""
+        for attempt in range(self.max_reintentos):
+            if self._detener.is_set():
+                return False
+            try:
+                # Liberar cualquier instancia previa
+                self._liberar()
+
+                self.cap = cv2.VideoCapture(self.fuente, self._backend())
+                if not self.cap.isOpened():
+                    raise ValueError("No se puede abrir la cámara.")
+
+                if not self.es_archivo:
+                    # Configurar propiedades específicas para evitar errores MSMF
+                    self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
+                    self.cap.set(cv2.CAP_PROP_FPS, self.fps)  # Reducir FPS puede ayudar con la estabilidad
+                    # Buffer mínimo: este hilo ya descarta frames viejos
+                    self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+                # Verificar si podemos leer correctamente
+                ret, frame = False, None
+                for check_attempt in range(3):
+                    ret, frame = self.cap.read()
+                    if ret and frame is not None:
+                        break
+                    time.sleep(0.2)
+
+                if not ret or frame is None:
+                    raise ValueError("No se puede acceder al stream de la cámara.")
+
+                self._publicar(frame)
+                self.conectada = True
+                self.rondas_fallidas = 0
+                self.estado = "Cámara lista"
+                return True
+
+            except Exception as e:
+                self.estado = f"Error al inicializar cámara {self.fuente}: {e}"
+                print(f"Fallo al inicializar cámara {self.fuente}: {e}")
+
+                # Probar con la siguiente cámara
+                if self.alternar and isinstance(self.fuente, int):
+                    self.fuente = (self.fuente + 1) % 2  # Alternar entre 0 y 1
+
+                # Dar tiempo al sistema para liberar recursos
+                self._detener.wait(1.0)
+
+        self._liberar()
+        return False
+
+    def _publicar(self, frame):
+        with self._condicion:
+            self._frame = frame
+            self._secuencia += 1
+            self._marca_tiempo = time.time()
+            self._condicion.notify_all()
+
+    def _bucle(self):
+        errores = 0
+        intervalo_archivo = 0.0
+
+        while not self._detener.is_set():
+            if self.cap is None:
+                if not self._abrir():
+                    # Espera progresiva entre rondas de reconexión
+                    self.rondas_fallidas += 1
+                    espera = min(self.espera_maxima, 2 ** self.rondas_fallidas)
+                    self.estado = f"Cámara no disponible. Reintentando en {espera:.0f} s..."
+                    self._detener.wait(espera)
+                    continue
+                errores = 0
+                if self.es_archivo and self.tiempo_real:
+                    # Reproducir los archivos de video a su velocidad original
+                    fps_archivo = self.cap.get(cv2.CAP_PROP_FPS) or self.fps
+                    intervalo_archivo = 1.0 / fps_archivo
+
+            inicio = time.perf_counter()
+            ret, frame = self.cap.read()
+
+            if (not ret or frame is None) and self.es_archivo and not self.repetir:
+                self.estado = "Fin del video"
+                self.terminado = True
+                self._liberar()
+                break
+
+            if not ret or frame is None:
+                errores += 1
+                print(f"Error de captura #{errores} - ret: {ret}")
+                self.estado = f"Problema de captura: {errores}/3. Reintentando..."
+
+                # Si hay muchos errores consecutivos (o terminó el archivo), reabrir la fuente
+                if errores >= 3 or self.es_archivo:
+                    self.estado = "Reiniciando dispositivo de cámara..."
+                    self._liberar()
+                    if self.alternar and isinstance(self.fuente, int):
+                        self.fuente = (self.fuente + 1) % 2
+                    self._detener.wait(0.0 if self.es_archivo else 1.0)
+                else:
+                    self._detener.wait(0.1)
+                continue
+
+            errores = 0
+            self._publicar(frame)
+
+            if intervalo_archivo:
+                restante = intervalo_archivo - (time.perf_counter() - inicio)
+                if restante > 0:
+                    self._detener.wait(restante)
+
+        self._liberar()
@@ -0,0 +1,59 @@
+import threading
+from contextlib import contextmanager
+
+
+class CerrojoLecturaEscritura:
+    """
+    Cerrojo de lectores/escritor: varios hilos pueden leer a la vez y un escritor
+    tiene acceso exclusivo. El escritor puede volver a entrar y leer mientras
+    escribe. Un escritor en espera bloquea a los lectores nuevos, para que un flujo
+    continuo de lecturas (varias cámaras reconociendo) no lo deje esperando siempre.
+    Un lector no debe pedir la escritura ni volver a leer de forma anidada.
+    """
+
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._lectores = 0
+        self._escritor = None
+        self._profundidad = 0
+        self._escritores_esperando = 0
+
+    @contextmanager
+    def lectura(self):
+        yo = threading.get_ident()
+        with self._condicion:
+            propio = self._escritor == yo
+            if not propio:
+                self._condicion.wait_for(lambda: self._escritor is None and self._escritores_esperando == 0)
+                self._lectores += 1
+        try:
+            yield
+        finally:
+            if not propio:
+                with self._condicion:
+                    self._lectores -= 1
+                    if self._lectores == 0:
+                        self._condicion.notify_all()
+
+    @contextmanager
+    def escritura(self):
+        yo = threading.get_ident()
+        with self._condicion:
+            if self._escritor == yo:
+                self._profundidad += 1
+            else:
+                self._escritores_esperando += 1
+                try:
+                    self._condicion.wait_for(lambda: self._escritor is None and self._lectores == 0)
+                finally:
+                    self._escritores_esperando -= 1
+                self._escritor = yo
+                self._profundidad = 1
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._profundidad -= 1
+                if self._profundidad == 0:
+                    self._escritor = None
+                    self._condicion.notify_all()
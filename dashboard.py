@@ -5,18 +5,20 @@ import cv2
 from PIL import Image, ImageTk
 
 class UserDashboard:
-    def __init__(self, parent, logic, user_name, user_data):
+    def __init__(self, parent, logic, persona_id, user_name, user_data):
         """
         Inicializa la ventana de dashboard del usuario
 
         Args:
             parent: Ventana padre (root)
             logic: Instancia de FaceAppLogic
+            persona_id: Id de la persona detectada (clave primaria en personas)
             user_name: Nombre del usuario detectado
             user_data: Tupla con los datos del usuario (habilitado, fecha_registro, carnet_id)
         """
         self.parent = parent
         self.logic = logic
+        self.persona_id = persona_id
         self.user_name = user_name
         self.habilitado, self.fecha_registro, self.carnet_id = user_data
 
@@ -145,27 +147,14 @@ class UserDashboard:
                 messagebox.showwarning("Advertencia", "El nombre no puede estar vacío")
                 return
 
-            # Obtener el ID del usuario actual
-            self.logic.cursor.execute(
-                "SELECT id FROM personas WHERE nombre = ?", (self.user_name,)
-            )
-            result = self.logic.cursor.fetchone()
-
-            if not result:
+            if self.logic.obtener_info_persona(self.persona_id) is None:
                 messagebox.showerror("Error", "No se pudo encontrar el usuario en la base de datos")
                 return
 
-            user_id = result[0]
-
             # Actualizar en la base de datos
-            self.logic.cursor.execute(
-                "UPDATE personas SET nombre = ?, carnet_id = ? WHERE id = ?",
-                (nuevo_nombre, nuevo_carnet, user_id)
-            )
-            self.logic.com.commit()
+            self.logic.actualizar_persona(self.persona_id, nuevo_nombre, nuevo_carnet)
 
             # Si cambió el nombre, actualizar la variable local
-            old_name = self.user_name
             if nuevo_nombre != self.user_name:
                 self.user_name = nuevo_nombre
                 self.window.title(f"Dashboard - {self.user_name}")
@@ -179,10 +168,6 @@ class UserDashboard:
 
             self._setup_datos_tab()
 
-            # Re-entrenar el modelo si cambió el nombre
-            if nuevo_nombre != old_name:
-                self.logic.entrenar_modelo()
-
             messagebox.showinfo("Éxito", "Datos personales actualizados correctamente")
 
         except Exception as e:
@@ -251,11 +236,7 @@ class UserDashboard:
 
             # Actualizar en la base de datos
             nueva_fecha_str = nueva_fecha.strftime("%Y-%m-%d")
-            self.logic.cursor.execute(
-                "UPDATE personas SET fecha_registro = ?, habilitado = 1, expirado = 0 WHERE nombre = ?",
-                (nueva_fecha_str, self.user_name)
-            )
-            self.logic.com.commit()
+            self.logic.actualizar_fecha_registro(self.persona_id, nueva_fecha_str)
 
             # Actualizar datos locales
             self.fecha_registro = nueva_fecha_str
@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+# Parámetros del detector Haar usados en toda la aplicación
+SCALE_FACTOR = 1.1
+MIN_NEIGHBORS = 5
+MIN_SIZE = (30, 30)
+
+# Escala a la que se reduce el frame antes de pasar el detector (1.0 = resolución original)
+ESCALA_DETECCION = 0.5
+
+
+def detectar_rostros(cascada, gray, escala=ESCALA_DETECCION, roi=None,
+                     scale_factor=SCALE_FACTOR, min_neighbors=MIN_NEIGHBORS, min_size=MIN_SIZE):
+    """
+    Ejecuta el clasificador Haar sobre una versión reducida del frame (y opcionalmente
+    solo dentro de una región de interés) y devuelve las cajas en coordenadas del
+    frame original, listas para recortar el rostro a resolución completa.
+
+    Args:
+        cascada: cv2.CascadeClassifier (no compartir la misma instancia entre hilos)
+        gray: Frame en escala de grises a resolución original
+        escala: Factor de reducción del frame antes de detectar (0 < escala <= 1)
+        roi: Caja (x, y, w, h) donde buscar, o None para todo el frame
+        min_size: Tamaño mínimo del rostro en píxeles del frame original
+
+    Returns:
+        Array Nx4 de enteros con las cajas (x, y, w, h)
+    """
+    alto, ancho = gray.shape[:2]
+    x0, y0 = 0, 0
+    if roi is not None:
+        rx, ry, rw, rh = (int(v) for v in roi)
+        x0, y0 = max(0, rx), max(0, ry)
+        x1, y1 = min(ancho, rx + rw), min(alto, ry + rh)
+        if x1 <= x0 or y1 <= y0:
+            return np.empty((0, 4), dtype=np.int32)
+        gray = gray[y0:y1, x0:x1]
+
+    if escala < 1.0:
+        reducida = cv2.resize(gray, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+    else:
+        escala = 1.0
+        reducida = gray
+
+    # El tamaño mínimo se expresa en píxeles originales; reducirlo en la misma proporción
+    min_reducido = (max(1, int(round(min_size[0] * escala))), max(1, int(round(min_size[1] * escala))))
+    cajas = cascada.detectMultiScale(
+        reducida, scaleFactor=scale_factor, minNeighbors=min_neighbors, minSize=min_reducido
+    )
+    if len(cajas) == 0:
+        return np.empty((0, 4), dtype=np.int32)
+
+    # Volver a coordenadas del frame original
+    cajas = np.round(np.asarray(cajas, dtype=np.float64) / escala).astype(np.int32)
+    cajas[:, 0] += x0
+    cajas[:, 1] += y0
+    return cajas
+
+
+def roi_alrededor(cajas, forma, margen=0.5):
+    """
+    Región de interés que cubre todas las cajas ampliadas con un margen proporcional
+    a su tamaño, recortada al frame.
+
+    Args:
+        cajas: Cajas (x, y, w, h) de las detecciones previas
+        forma: gray.shape del frame
+        margen: Fracción del tamaño de cada caja que se añade por cada lado
+
+    Returns:
+        Caja (x, y, w, h) o None si no hay cajas
+    """
+    if len(cajas) == 0:
+        return None
+    alto, ancho = forma[:2]
+    x0, y0, x1, y1 = ancho, alto, 0, 0
+    for x, y, w, h in cajas:
+        mx, my = int(w * margen), int(h * margen)
+        x0, y0 = min(x0, x - mx), min(y0, y - my)
+        x1, y1 = max(x1, x + w + mx), max(y1, y + h + my)
+    x0, y0 = max(0, x0), max(0, y0)
+    x1, y1 = min(ancho, x1), min(alto, y1)
+    return x0, y0, x1 - x0, y1 - y0
@@ -0,0 +1,122 @@
+import sqlite3
+from datetime import datetime
+
+# Pragmas de rendimiento de cada conexión. WAL permite leer mientras otro hilo o
+# proceso escribe, y con synchronous=NORMAL un commit ya no espera al fsync del
+# archivo (solo en los checkpoints), que es lo que encarecía cada pequeña actualización.
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),       # Negativo: KiB (16 MB de caché de páginas)
+    ("mmap_size", 134217728),     # Leer el archivo mapeado en memoria (128 MB)
+    ("temp_store", "MEMORY"),
+)
+
+
+def configurar_conexion(com):
+    """Aplica PRAGMAS a una conexión abierta"""
+    for nombre, valor in PRAGMAS:
+        com.execute(f"PRAGMA {nombre} = {valor}")
+    return com
+
+
+def conectar(db_path, **kwargs):
+    """sqlite3.connect con los pragmas de rendimiento ya aplicados"""
+    return configurar_conexion(sqlite3.connect(db_path, **kwargs))
+
+
+def _crear_tablas(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS personas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            habilitado INTEGER DEFAULT 1,
+            fecha_registro TEXT,
+            expirado INTEGER DEFAULT 0,
+            carnet_id TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS imagenes_personas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            persona_id INTEGER NOT NULL,
+            encoding BLOB NOT NULL,
+            formato INTEGER DEFAULT 0,
+            FOREIGN KEY (persona_id) REFERENCES personas(id)
+        )
+    ''')
+
+
+def tiene_columna(cursor, tabla, columna):
+    """True si la tabla existe y tiene la columna (sin modificar la base de datos)"""
+    cursor.execute(f"PRAGMA table_info({tabla})")
+    return columna in [fila[1] for fila in cursor.fetchall()]
+
+
+def _agregar_columna_formato(cursor):
+    # Bases de datos antiguas: las filas existentes son float64 (formato 0)
+    if not tiene_columna(cursor, "imagenes_personas", "formato"):
+        cursor.execute("ALTER TABLE imagenes_personas ADD COLUMN formato INTEGER DEFAULT 0")
+
+
+def _indices_personas(cursor):
+    # Búsquedas por nombre desde la administración
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_personas_nombre ON personas(nombre)")
+    # Barrido de expiración (habilitado = 1 AND fecha_registro <= ?)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_personas_expiracion ON personas(habilitado, fecha_registro)")
+
+
+def _indice_imagenes_persona(cursor):
+    # Muestras de una persona (agregar/eliminar muestras, compactación, duplicados)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_imagenes_persona ON imagenes_personas(persona_id)")
+
+
+# Migraciones en orden: (versión, descripción, función). Son idempotentes para que
+# las bases de datos creadas antes de existir version_esquema pasen por todas.
+MIGRACIONES = (
+    (1, "Tablas personas e imagenes_personas", _crear_tablas),
+    (2, "Columna formato en imagenes_personas", _agregar_columna_formato),
+    (3, "Índices de nombre y expiración en personas", _indices_personas),
+    (4, "Índice de persona_id en imagenes_personas", _indice_imagenes_persona),
+)
+
+VERSION_ESQUEMA = MIGRACIONES[-1][0]
+
+
+def version_esquema(com):
+    """Última versión aplicada (0 si la base de datos nunca se migró)"""
+    com.execute('''
+        CREATE TABLE IF NOT EXISTS version_esquema (
+            version INTEGER PRIMARY KEY,
+            descripcion TEXT,
+            fecha TEXT
+        )
+    ''')
+    return com.execute("SELECT COALESCE(MAX(version), 0) FROM version_esquema").fetchone()[0]
+
+
+def migrar(com):
+    """
+    Aplica las migraciones pendientes, cada una en su propia transacción.
+
+    Returns:
+        Lista de versiones aplicadas
+    """
+    actual = version_esquema(com)
+    com.commit()
+    aplicadas = []
+    for version, descripcion, migracion in MIGRACIONES:
+        if version <= actual:
+            continue
+        cursor = com.cursor()
+        cursor.execute("BEGIN")
+        try:
+            migracion(cursor)
+            cursor.execute("INSERT INTO version_esquema (version, descripcion, fecha) VALUES (?, ?, ?)",
+                           (version, descripcion, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            com.commit()
+        except Exception:
+            com.rollback()
+            raise
+        aplicadas.append(version)
+    return aplicadas
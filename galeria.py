@@ -0,0 +1,110 @@
+import threading
+
+import numpy as np
+
+
+def vectores_correlacion(imagenes):
+    """
+    Histogramas de intensidad (256 bins) de un lote de imágenes, centrados y con
+    norma 1, de modo que el producto escalar entre dos filas es exactamente la
+    correlación de cv2.compareHist(HISTCMP_CORREL). La normalización NORM_MINMAX
+    de compare_faces no cambia la correlación, así que no hace falta aplicarla.
+
+    Args:
+        imagenes: Array N x alto x ancho uint8 (o una sola imagen)
+
+    Returns:
+        Matriz float32 N x 256
+    """
+    imagenes = np.asarray(imagenes, dtype=np.uint8)
+    if imagenes.ndim == 2:
+        imagenes = imagenes[np.newaxis]
+    n = len(imagenes)
+    desplazamiento = (np.arange(n, dtype=np.int64) * 256).reshape(n, 1)
+    conteos = np.bincount((imagenes.reshape(n, -1) + desplazamiento).ravel(), minlength=n * 256)
+    histogramas = conteos.reshape(n, 256).astype(np.float64)
+    histogramas -= histogramas.mean(axis=1, keepdims=True)
+    normas = np.linalg.norm(histogramas, axis=1, keepdims=True)
+    return (histogramas / np.maximum(normas, 1e-12)).astype(np.float32)
+
+
+class GaleriaHistogramas:
+    """
+    Histogramas de intensidad de todas las muestras registradas, precalculados para
+    comparar una sonda contra toda la galería (o parte de ella) en una sola
+    multiplicación matriz-vector. Se carga de la BD la primera vez que se usa y los
+    caminos de registro y borrado la mantienen con agregar() / quitar().
+    """
+
+    def __init__(self, cargar):
+        """
+        Args:
+            cargar: Función () -> (persona_ids, array N x 100 x 100 uint8) con todas las muestras
+        """
+        self._cargar = cargar
+        self._vectores = np.empty((0, 256), dtype=np.float32)
+        self._personas = np.empty(0, dtype=np.int64)
+        self._cargada = False
+        self._lock = threading.Lock()
+
+    def agregar(self, persona_id, imagenes):
+        with self._lock:
+            if not self._cargada or len(imagenes) == 0:
+                return
+            self._vectores = np.vstack([self._vectores, vectores_correlacion(imagenes)])
+            self._personas = np.concatenate(
+                [self._personas, np.full(len(imagenes), int(persona_id), dtype=np.int64)])
+
+    def quitar(self, persona_id):
+        with self._lock:
+            if not self._cargada:
+                return
+            conservar = self._personas != int(persona_id)
+            self._vectores = self._vectores[conservar]
+            self._personas = self._personas[conservar]
+
+    def invalidar(self):
+        """Fuerza a recargar la galería desde la BD en el próximo uso"""
+        with self._lock:
+            self._cargada = False
+
+    def comparar(self, sonda, ids=None):
+        """
+        Correlación de la sonda con cada persona (la mejor de sus muestras).
+
+        Args:
+            sonda: Imagen 100x100 uint8 en escala de grises
+            ids: Ids de persona a comparar, o None para toda la galería
+
+        Returns:
+            Tupla (persona_ids, correlaciones) como arrays ordenados de mayor a menor correlación
+        """
+        with self._lock:
+            self._cargar_si_necesario()
+            vectores, personas = self._vectores, self._personas
+
+        if ids is not None:
+            seleccion = np.isin(personas, np.asarray(list(ids), dtype=np.int64))
+            vectores, personas = vectores[seleccion], personas[seleccion]
+        if len(personas) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        correlaciones = vectores @ vectores_correlacion(sonda)[0]
+
+        # Quedarse con la mejor muestra de cada persona
+        unicas, indices = np.unique(personas, return_inverse=True)
+        mejores = np.full(len(unicas), -np.inf, dtype=np.float32)
+        np.maximum.at(mejores, indices, correlaciones)
+        orden = np.argsort(mejores)[::-1]
+        return unicas[orden], mejores[orden]
+
+    def _cargar_si_necesario(self):
+        if self._cargada:
+            return
+        personas, imagenes = self._cargar()
+        if len(imagenes):
+            self._vectores = vectores_correlacion(imagenes)
+        else:
+            self._vectores = np.empty((0, 256), dtype=np.float32)
+        self._personas = np.asarray(personas, dtype=np.int64)
+        self._cargada = True
@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+import esquema
+from logic import DIAS_SUSCRIPCION, NOMBRES_FORMATO, FaceAppLogic, codificar_rostro
+
+NOMBRES = ["Ana", "Luis", "María", "José", "Carmen", "Pedro", "Lucía", "Jorge", "Elena", "Andrés",
+           "Sofía", "Miguel", "Laura", "Carlos", "Isabel", "Diego", "Paula", "Javier", "Rosa", "Pablo"]
+APELLIDOS = ["García", "Martínez", "López", "Sánchez", "Pérez", "Gómez", "Martín", "Jiménez", "Ruiz",
+             "Hernández", "Díaz", "Moreno", "Álvarez", "Romero", "Cruz", "Navarro", "Torres", "Ramos"]
+
+
+def perturbar(rostro, rng):
+    """Variante de una muestra: ruido, brillo, desplazamiento y desenfoque aleatorios"""
+    variante = rostro.astype(np.int16) + rng.integers(-15, 16, rostro.shape) + int(rng.integers(-25, 26))
+    variante = np.clip(variante, 0, 255).astype(np.uint8)
+    dx, dy = (int(v) for v in rng.integers(-3, 4, 2))
+    variante = cv2.warpAffine(variante, np.float32([[1, 0, dx], [0, 1, dy]]), variante.shape[::-1],
+                              borderMode=cv2.BORDER_REPLICATE)
+    if rng.random() < 0.5:
+        variante = cv2.GaussianBlur(variante, (3, 3), 0)
+    return variante
+
+
+def deformar(rostro, rng):
+    """Identidad sintética a partir de una muestra real: rotación, escala, espejo y gamma"""
+    matriz = cv2.getRotationMatrix2D((50, 50), float(rng.uniform(-12, 12)), float(rng.uniform(0.85, 1.15)))
+    base = cv2.warpAffine(rostro, matriz, rostro.shape[::-1], borderMode=cv2.BORDER_REFLECT)
+    if rng.random() < 0.5:
+        base = cv2.flip(base, 1)
+    gamma = rng.uniform(0.6, 1.6)
+    return (255 * (base / 255.0) ** gamma).astype(np.uint8)
+
+
+def generar_galeria(rostros, cantidad, rng, por_persona=10):
+    """
+    Galería sintética: cada persona es una muestra real deformada (rotación, escala,
+    espejo y gamma) y sus muestras son variantes perturbadas de esa base.
+
+    Returns:
+        (muestras, etiquetas)
+    """
+    muestras = []
+    for inicio in range(0, cantidad, por_persona):
+        base = deformar(rostros[int(rng.integers(len(rostros)))], rng)
+        muestras.extend(perturbar(base, rng) for _ in range(min(por_persona, cantidad - inicio)))
+    return muestras, np.arange(cantidad, dtype=np.int32) // por_persona
+
+
+def generar_escenas(rostros, cantidad, tamano=(640, 480), semilla=0):
+    """
+    Genera frames sintéticos pegando muestras de la base de datos (ampliadas a
+    distintos tamaños) sobre un fondo con ruido.
+
+    Returns:
+        Lista de (gray, cajas_reales)
+    """
+    rng = np.random.default_rng(semilla)
+    ancho, alto = tamano
+    escenas = []
+    for _ in range(cantidad):
+        gray = rng.integers(60, 180, size=(alto, ancho), dtype=np.uint8)
+        gray = cv2.GaussianBlur(gray, (0, 0), 3)
+        lado = int(rng.integers(60, min(alto, ancho) // 2))
+        x = int(rng.integers(0, ancho - lado))
+        y = int(rng.integers(0, alto - lado))
+        rostro = rostros[int(rng.integers(len(rostros)))]
+        gray[y:y + lado, x:x + lado] = cv2.resize(rostro, (lado, lado))
+        escenas.append((gray, [(x, y, lado, lado)]))
+    return escenas
+
+
+def generar_grupo(rostros, cantidad, lado=120, tamano=(1280, 720), semilla=0):
+    """Frame con varios rostros en cuadrícula, como un grupo frente al torniquete"""
+    rng = np.random.default_rng(semilla)
+    ancho, alto = tamano
+    gray = np.full((alto, ancho), 128, dtype=np.uint8)
+    cajas = []
+    columnas = ancho // lado
+    for indice in range(cantidad):
+        x = (indice % columnas) * lado
+        y = (indice // columnas) * lado
+        rostro = rostros[int(rng.integers(len(rostros)))]
+        gray[y:y + lado, x:x + lado] = cv2.resize(rostro, (lado, lado))
+        cajas.append((x, y, lado, lado))
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR), cajas
+
+
+def generar_nombres(cantidad, rng, fraccion_repetidos=0.0):
+    """Nombres completos únicos salvo una fracción que repite uno anterior (homónimos)"""
+    nombres = []
+    for i in range(cantidad):
+        if nombres and rng.random() < fraccion_repetidos:
+            nombres.append(nombres[int(rng.integers(len(nombres)))])
+        else:
+            nombre = f"{NOMBRES[int(rng.integers(len(NOMBRES)))]} {APELLIDOS[int(rng.integers(len(APELLIDOS)))]}"
+            nombres.append(f"{nombre} {i}")
+    return nombres
+
+
+def generar_base_datos(ruta, rostros, personas, muestras, rng, fraccion_habilitados=1.0,
+                       fraccion_vencidos=0.0, fraccion_repetidos=0.0, formato=NOMBRES_FORMATO["uint8"],
+                       lote=1000):
+    """
+    Llena una base de datos (con el esquema de la aplicación) con personas sintéticas.
+
+    Args:
+        ruta: Archivo de la base de datos; se crea si no existe
+        rostros: Muestras reales 100x100 uint8 a partir de las que se deforman las identidades
+        personas: Número de personas
+        muestras: Muestras por persona
+        rng: Generador aleatorio (np.random.Generator)
+        fraccion_habilitados: Fracción de personas con habilitado = 1
+        fraccion_vencidos: Fracción con fecha_registro de hace más de DIAS_SUSCRIPCION días
+            (siguen habilitadas: el barrido de expiración tiene trabajo pendiente)
+        fraccion_repetidos: Fracción de nombres que repiten el de otra persona
+        formato: Formato de las muestras (ver logic.NOMBRES_FORMATO)
+        lote: Personas por transacción
+
+    Returns:
+        Lista con el id de cada persona creada
+    """
+    com = esquema.conectar(ruta)
+    esquema.migrar(com)
+    hoy = datetime.now()
+    nombres = generar_nombres(personas, rng, fraccion_repetidos)
+    ids = []
+    try:
+        for inicio in range(0, personas, lote):
+            for indice in range(inicio, min(inicio + lote, personas)):
+                if rng.random() < fraccion_vencidos:
+                    dias = int(rng.integers(DIAS_SUSCRIPCION + 1, DIAS_SUSCRIPCION + 90))
+                else:
+                    dias = int(rng.integers(0, DIAS_SUSCRIPCION))
+                cursor = com.execute(
+                    "INSERT INTO personas (nombre, habilitado, fecha_registro, carnet_id) VALUES (?, ?, ?, ?)",
+                    (nombres[indice], int(rng.random() < fraccion_habilitados),
+                     (hoy - timedelta(days=dias)).strftime("%Y-%m-%d"), f"{indice + 1:08d}"))
+                persona_id = cursor.lastrowid
+                ids.append(persona_id)
+
+                base = deformar(rostros[int(rng.integers(len(rostros)))], rng)
+                com.executemany(
+                    "INSERT INTO imagenes_personas (persona_id, encoding, formato) VALUES (?, ?, ?)",
+                    [(persona_id, codificar_rostro(perturbar(base, rng), formato), formato)
+                     for _ in range(muestras)])
+            com.commit()
+    finally:
+        com.close()
+    return ids
+
+
+def generar_video(ruta, rostros, etiquetas, frames, rng, tamano=(640, 480), rostros_por_frame=1, fps=25,
+                  lado=(90, 200)):
+    """
+    Graba un video con rostros que se desplazan y rebotan por el frame sobre un
+    fondo con ruido, y guarda junto a él (misma ruta con extensión .json) la caja
+    real y el id de persona de cada rostro en cada frame.
+
+    Args:
+        ruta: Archivo de video (.avi, MJPG)
+        rostros: Rostros 100x100 uint8 a componer
+        etiquetas: Id de persona de cada rostro
+        frames: Número de frames
+        rng: Generador aleatorio
+        tamano: (ancho, alto) del video
+        rostros_por_frame: Rostros simultáneos en escena
+        fps: Frames por segundo del archivo
+        lado: Rango (mínimo, máximo) del lado de los rostros en píxeles
+
+    Returns:
+        Ruta del archivo JSON con las posiciones
+    """
+    ancho, alto = tamano
+    fondo = cv2.GaussianBlur(rng.integers(40, 200, size=(alto, ancho), dtype=np.uint8), (0, 0), 5)
+
+    pistas = []
+    for _ in range(rostros_por_frame):
+        indice = int(rng.integers(len(rostros)))
+        tamano_rostro = int(rng.integers(lado[0], min(lado[1], alto, ancho) + 1))
+        pistas.append({
+            "persona_id": int(etiquetas[indice]),
+            "rostro": cv2.resize(rostros[indice], (tamano_rostro, tamano_rostro)),
+            "posicion": np.array([rng.uniform(0, ancho - tamano_rostro), rng.uniform(0, alto - tamano_rostro)]),
+            "velocidad": rng.uniform(-4, 4, 2),
+        })
+
+    escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*"MJPG"), fps, (ancho, alto))
+    if not escritor.isOpened():
+        raise RuntimeError(f"No se pudo crear el video {ruta}")
+    verdad = []
+    try:
+        for _ in range(frames):
+            gray = np.clip(fondo.astype(np.int16) + rng.integers(-4, 5, fondo.shape), 0, 255).astype(np.uint8)
+            cajas = []
+            for pista in pistas:
+                lado_pista = pista["rostro"].shape[0]
+                limite = np.array([ancho - lado_pista, alto - lado_pista], dtype=np.float64)
+                pista["posicion"] += pista["velocidad"]
+                # Rebotar en los bordes
+                for eje in range(2):
+                    if not 0 <= pista["posicion"][eje] <= limite[eje]:
+                        pista["velocidad"][eje] *= -1
+                        pista["posicion"][eje] = np.clip(pista["posicion"][eje], 0, limite[eje])
+                x, y = (int(v) for v in pista["posicion"])
+                gray[y:y + lado_pista, x:x + lado_pista] = pista["rostro"]
+                cajas.append({"persona_id": pista["persona_id"], "caja": [x, y, lado_pista, lado_pista]})
+            escritor.write(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+            verdad.append(cajas)
+    finally:
+        escritor.release()
+
+    ruta_json = os.path.splitext(ruta)[0] + ".json"
+    with open(ruta_json, "w", encoding="utf-8") as archivo:
+        json.dump({"fps": fps, "tamano": [ancho, alto], "frames": verdad}, archivo)
+    return ruta_json
+
+
+def _cargar_muestras(ruta):
+    # Solo lectura: la BD de origen no se migra ni cambia de modo de diario
+    logic = FaceAppLogic(ruta, entrenar=False, solo_lectura=True)
+    try:
+        return logic.cargar_rostros()
+    finally:
+        logic.cerrar()
+
+
+def comando_galeria(args):
+    """Crea una base de datos con personas y muestras sintéticas"""
+    if os.path.exists(args.salida):
+        if not args.sobrescribir:
+            raise SystemExit(f"{args.salida} ya existe (use --sobrescribir para reemplazarla)")
+        for sufijo in ("", "-wal", "-shm"):
+            if os.path.exists(args.salida + sufijo):
+                os.remove(args.salida + sufijo)
+
+    _, rostros = _cargar_muestras(args.origen)
+    if len(rostros) == 0:
+        raise SystemExit(f"{args.origen} no tiene muestras de las que partir")
+    rng = np.random.default_rng(args.semilla)
+    ids = generar_base_datos(args.salida, rostros, args.personas, args.muestras, rng,
+                             fraccion_habilitados=args.habilitados, fraccion_vencidos=args.vencidos,
+                             fraccion_repetidos=args.repetidos, formato=NOMBRES_FORMATO[args.formato])
+    print(f"{len(ids)} personas con {args.muestras} muestras cada una en {args.salida} "
+          f"({os.path.getsize(args.salida):,} bytes)")
+
+
+def comando_video(args):
+    """Graba un video sintético con rostros de la base de datos en posiciones conocidas"""
+    ids, rostros = _cargar_muestras(args.db)
+    if len(rostros) == 0:
+        raise SystemExit(f"{args.db} no tiene muestras")
+    rng = np.random.default_rng(args.semilla)
+    ruta_json = generar_video(args.salida, rostros, ids, args.frames, rng, (args.ancho, args.alto),
+                              args.rostros, args.fps)
+    print(f"Video {args.salida} ({args.frames} frames) y posiciones reales en {ruta_json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Datos sintéticos para pruebas de carga y benchmarks")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    parser_galeria = subparsers.add_parser("galeria", help="Base de datos con N personas x M muestras")
+    parser_galeria.add_argument("--salida", required=True, help="Base de datos a crear")
+    parser_galeria.add_argument("--origen", default="rostrosv2.db",
+                                help="Base de datos con rostros reales de los que derivar las identidades")
+    parser_galeria.add_argument("--personas", type=int, default=1000)
+    parser_galeria.add_argument("--muestras", type=int, default=10, help="Muestras por persona")
+    parser_galeria.add_argument("--habilitados", type=float, default=0.9, help="Fracción de personas habilitadas")
+    parser_galeria.add_argument("--vencidos", type=float, default=0.1,
+                                help=f"Fracción con la suscripción vencida (más de {DIAS_SUSCRIPCION} días)")
+    parser_galeria.add_argument("--repetidos", type=float, default=0.02, help="Fracción de nombres repetidos")
+    parser_galeria.add_argument("--formato", choices=sorted(NOMBRES_FORMATO), default="uint8")
+    parser_galeria.add_argument("--semilla", type=int, default=0)
+    parser_galeria.add_argument("--sobrescribir", action="store_true", help="Reemplazar la salida si existe")
+    parser_galeria.set_defaults(funcion=comando_galeria)
+
+    parser_video = subparsers.add_parser("video", help="Video con rostros en posiciones conocidas")
+    parser_video.add_argument("--salida", required=True, help="Archivo de video (.avi)")
+    parser_video.add_argument("--db", default="rostrosv2.db", help="Base de datos de la que tomar los rostros")
+    parser_video.add_argument("--frames", type=int, default=300)
+    parser_video.add_argument("--rostros", type=int, default=1, help="Rostros simultáneos por frame")
+    parser_video.add_argument("--ancho", type=int, default=640)
+    parser_video.add_argument("--alto", type=int, default=480)
+    parser_video.add_argument("--fps", type=int, default=25)
+    parser_video.add_argument("--semilla", type=int, default=0)
+    parser_video.set_defaults(funcion=comando_video)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
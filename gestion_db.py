@@ -0,0 +1,160 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import cv2
+import numpy as np
+
+import esquema
+from logic import BACKEND_NUMPY, FaceAppLogic, NOMBRES_FORMATO, decodificar_rostro
+
+
+def migrar(args):
+    """Convierte las muestras de la base de datos al formato compacto indicado"""
+    formato = NOMBRES_FORMATO[args.formato]
+    tamano_inicial = os.path.getsize(args.db)
+
+    logic = FaceAppLogic(args.db, entrenar=False)
+    try:
+        filas, bytes_antes, bytes_despues = logic.migrar_formato_rostros(formato)
+    finally:
+        logic.cerrar()
+
+    print(f"Muestras migradas a '{args.formato}': {filas}")
+    if filas:
+        print(f"Tamaño de las muestras: {bytes_antes:,} -> {bytes_despues:,} bytes "
+              f"({bytes_antes / max(bytes_despues, 1):.1f}x)")
+
+    if args.vacuum:
+        # VACUUM reescribe el archivo para liberar realmente el espacio
+        com = sqlite3.connect(args.db)
+        com.execute("VACUUM")
+        com.close()
+        print(f"Tamaño del archivo: {tamano_inicial:,} -> {os.path.getsize(args.db):,} bytes")
+
+
+def _medir_prediccion(ids, rostros, consultas):
+    """Milisegundos medios de predict de un modelo LBPH entrenado con las muestras dadas"""
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.train(rostros, np.array(ids, dtype=np.int32))
+    inicio = time.perf_counter()
+    for consulta in consultas:
+        recognizer.predict(consulta)
+    return (time.perf_counter() - inicio) * 1000 / max(len(consultas), 1)
+
+
+def compactar(args):
+    """Conserva por persona k muestras diversas y elimina las casi idénticas"""
+    # La simulación planifica sin migrar la BD ni cambiar su modo de diario
+    logic = FaceAppLogic(args.db, entrenar=False, solo_lectura=args.dry_run)
+    try:
+        plan = logic.planificar_compactacion(args.k)
+        print(f"Personas con más de {args.k} muestras: {plan['personas']}")
+        print(f"Muestras: {plan['muestras_antes']} -> {plan['muestras_despues']}")
+        print(f"Bytes de muestras: {plan['bytes_antes']:,} -> "
+              f"{plan['bytes_antes'] - plan['bytes_eliminados']:,} ({plan['bytes_eliminados']:,} menos)")
+
+        # Tiempo de predict con la galería completa frente a la compactada
+        muestras = []
+        for imagen_id, persona_id, encoding, formato in logic.repo.consultar(
+                f"SELECT i.id, p.id, i.encoding, {logic.columna_formato} FROM personas p "
+                "JOIN imagenes_personas i ON p.id = i.persona_id"):
+            rostro = decodificar_rostro(encoding, formato)
+            if rostro is not None:
+                muestras.append((imagen_id, persona_id, rostro))
+        eliminar = set(plan["eliminar"])
+        conservadas = [m for m in muestras if m[0] not in eliminar]
+        if conservadas and len(conservadas) < len(muestras):
+            consultas = [m[2] for m in muestras[:args.consultas]]
+            ms_antes = _medir_prediccion([m[1] for m in muestras], [m[2] for m in muestras], consultas)
+            ms_despues = _medir_prediccion([m[1] for m in conservadas], [m[2] for m in conservadas], consultas)
+            print(f"Predicción: {ms_antes:.2f} ms -> {ms_despues:.2f} ms por rostro")
+
+        if args.dry_run:
+            print("Simulación (--dry-run): no se modificó la base de datos")
+            return
+        eliminadas = logic.aplicar_compactacion(plan)
+        print(f"Muestras eliminadas: {eliminadas}")
+    finally:
+        logic.cerrar()
+
+
+def indice(args):
+    """Reconstruye desde imagenes_personas el modelo numpy con su índice aproximado y lo guarda"""
+    inicio = time.perf_counter()
+    logic = FaceAppLogic(args.db, backend=BACKEND_NUMPY, indice_ann=True, entrenar=False)
+    try:
+        logic.entrenar_modelo()
+        indice_ann = logic.recognizer.indice
+        if args.forzar and logic.trained and not indice_ann.construido:
+            indice_ann.construir(logic.recognizer.histogramas)
+        logic.guardar_modelo()
+    finally:
+        logic.cerrar()
+
+    print(f"Muestras en el modelo: {logic.total_muestras}")
+    if indice_ann.construido:
+        print(f"Índice: {len(indice_ann.centroides)} listas, {indice_ann.componentes.shape[1]} dimensiones")
+    else:
+        print(f"Índice no construido: la galería tiene menos de {indice_ann.minimo_muestras} muestras "
+              f"(use --forzar para construirlo igualmente)")
+    print(f"Modelo guardado en {logic.ruta_modelo} en {time.perf_counter() - inicio:.1f} s")
+
+
+def actualizar_esquema(args):
+    """Aplica las migraciones de esquema pendientes y muestra la configuración de SQLite"""
+    com = esquema.conectar(args.db)
+    try:
+        version = esquema.version_esquema(com)
+        aplicadas = esquema.migrar(com)
+        print(f"Versión del esquema: {version} -> {esquema.VERSION_ESQUEMA}")
+        for numero, descripcion, _ in esquema.MIGRACIONES:
+            if numero in aplicadas:
+                print(f"  Aplicada {numero}: {descripcion}")
+        for nombre, _ in esquema.PRAGMAS:
+            print(f"  {nombre} = {com.execute(f'PRAGMA {nombre}').fetchone()[0]}")
+        indices = com.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+        print(f"  Índices: {', '.join(fila[0] for fila in indices)}")
+    finally:
+        com.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Herramientas de mantenimiento de la base de datos de rostros")
+    parser.add_argument("--db", default="rostrosv2.db", help="Ruta de la base de datos SQLite")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    parser_migrar = subparsers.add_parser(
+        "migrar", help="Convierte las muestras float64 antiguas a un formato compacto")
+    parser_migrar.add_argument("--formato", choices=sorted(NOMBRES_FORMATO), default="uint8",
+                               help="Formato de destino de las muestras (por defecto uint8)")
+    parser_migrar.add_argument("--vacuum", action="store_true",
+                               help="Compacta el archivo de la base de datos al terminar")
+    parser_migrar.set_defaults(funcion=migrar)
+
+    parser_esquema = subparsers.add_parser(
+        "esquema", help="Aplica las migraciones de esquema pendientes (índices, WAL)")
+    parser_esquema.set_defaults(funcion=actualizar_esquema)
+
+    parser_compactar = subparsers.add_parser(
+        "compactar", help="Conserva k muestras diversas por persona y elimina las redundantes")
+    parser_compactar.add_argument("--k", type=int, default=5, help="Muestras a conservar por persona")
+    parser_compactar.add_argument("--dry-run", action="store_true",
+                                  help="Solo informar de lo que se eliminaría")
+    parser_compactar.add_argument("--consultas", type=int, default=200,
+                                  help="Rostros usados para medir el tiempo de predicción")
+    parser_compactar.set_defaults(funcion=compactar)
+
+    parser_indice = subparsers.add_parser(
+        "indice", help="Reconstruye y guarda el modelo numpy con el índice aproximado")
+    parser_indice.add_argument("--forzar", action="store_true",
+                               help="Construir el índice aunque la galería sea pequeña")
+    parser_indice.set_defaults(funcion=indice)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
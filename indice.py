@@ -0,0 +1,200 @@
+import numpy as np
+
+
+def _distancias_cuadradas(vectores, centroides):
+    """Distancia euclídea al cuadrado de cada vector a cada centroide (N x K)"""
+    return (np.einsum("ij,ij->i", vectores, vectores)[:, np.newaxis]
+            - 2.0 * vectores @ centroides.T
+            + np.einsum("ij,ij->i", centroides, centroides)[np.newaxis, :])
+
+
+def _crecer(arreglo, usados, capacidad):
+    """Copia las primeras `usados` filas en un array nuevo con la capacidad indicada"""
+    nuevo = np.empty((capacidad,) + arreglo.shape[1:], dtype=arreglo.dtype)
+    nuevo[:usados] = arreglo[:usados]
+    return nuevo
+
+
+def kmeans(vectores, k, iteraciones=15, semilla=0):
+    """k-means con inicialización k-means++ sobre los vectores proyectados"""
+    rng = np.random.default_rng(semilla)
+    n = len(vectores)
+    centroides = np.empty((k, vectores.shape[1]), dtype=vectores.dtype)
+    centroides[0] = vectores[rng.integers(n)]
+    minimas = _distancias_cuadradas(vectores, centroides[:1])[:, 0]
+    for i in range(1, k):
+        probabilidades = np.maximum(minimas, 0)
+        total = probabilidades.sum()
+        elegido = rng.choice(n, p=probabilidades / total) if total > 0 else rng.integers(n)
+        centroides[i] = vectores[elegido]
+        minimas = np.minimum(minimas, _distancias_cuadradas(vectores, centroides[i:i + 1])[:, 0])
+
+    for _ in range(iteraciones):
+        asignacion = np.argmin(_distancias_cuadradas(vectores, centroides), axis=1)
+        conteos = np.bincount(asignacion, minlength=k)
+        sumas = np.zeros_like(centroides)
+        np.add.at(sumas, asignacion, vectores)
+        ocupados = conteos > 0
+        centroides[ocupados] = sumas[ocupados] / conteos[ocupados, np.newaxis]
+    return centroides
+
+
+class IndiceIVF:
+    """
+    Índice aproximado para galerías grandes: proyecta los histogramas LBP (tras
+    una raíz cuadrada, que aproxima chi-cuadrado con distancia euclídea) a pocas
+    dimensiones con PCA y los reparte en listas invertidas con un cuantizador k-means.
+    buscar() solo recorre las nprobe listas más cercanas y devuelve los k candidatos
+    que ReconocedorLBP vuelve a ordenar con la distancia chi-cuadrado exacta.
+    Las proyecciones y cada lista crecen al doble cuando se llenan, así que añadir
+    las muestras de un registro cuesta lo que esas muestras y no lo que la galería.
+    """
+
+    def __init__(self, dimensiones=64, listas=None, nprobe=8, candidatos=100,
+                 muestras_entrenamiento=5000, minimo_muestras=1000):
+        """
+        Args:
+            dimensiones: Componentes PCA de la proyección
+            listas: Número de listas invertidas; por defecto ~2*sqrt(N)
+            nprobe: Listas más cercanas que se recorren en cada búsqueda
+            candidatos: Muestras que se devuelven para el reordenamiento exacto
+            muestras_entrenamiento: Máximo de muestras usadas para ajustar PCA y k-means
+            minimo_muestras: Por debajo de este tamaño la búsqueda exhaustiva es suficiente
+        """
+        self.dimensiones = dimensiones
+        self.listas = listas
+        self.nprobe = nprobe
+        self.candidatos = candidatos
+        self.muestras_entrenamiento = muestras_entrenamiento
+        self.minimo_muestras = minimo_muestras
+
+        self.media = None
+        self.componentes = None
+        self.centroides = None
+        self._asignacion = np.empty(0, dtype=np.int32)
+        self._proyecciones = np.empty((0, 0), dtype=np.float32)
+        self._cantidad = 0
+        self._listas = []  # Filas de cada lista, con capacidad de sobra al final
+        self._longitudes = np.empty(0, dtype=np.int64)  # Filas ocupadas de cada lista
+        self.tamano_construccion = 0
+
+    @property
+    def construido(self):
+        return self.centroides is not None
+
+    def proyectar(self, histogramas):
+        raices = np.sqrt(np.atleast_2d(histogramas).astype(np.float32))
+        return (raices - self.media) @ self.componentes
+
+    def construir(self, histogramas, semilla=0):
+        """Ajusta PCA y el cuantizador con los histogramas y reparte todas las filas"""
+        n = len(histogramas)
+        rng = np.random.default_rng(semilla)
+        muestra = histogramas
+        if n > self.muestras_entrenamiento:
+            muestra = histogramas[np.sort(rng.choice(n, self.muestras_entrenamiento, replace=False))]
+        raices = np.sqrt(muestra.astype(np.float32))
+        self.media = raices.mean(axis=0)
+
+        # PCA con SVD aleatorizada: evita descomponer la matriz completa de 16384 columnas
+        centradas = raices - self.media
+        rango = min(self.dimensiones, *centradas.shape)
+        base = centradas @ rng.standard_normal((centradas.shape[1], rango + 10)).astype(np.float32)
+        for _ in range(2):
+            base, _ = np.linalg.qr(base)
+            base = centradas @ (centradas.T @ base)
+        base, _ = np.linalg.qr(base)
+        _, _, vt = np.linalg.svd(base.T @ centradas, full_matrices=False)
+        self.componentes = np.ascontiguousarray(vt[:rango].T, dtype=np.float32)
+
+        proyeccion_muestra = centradas @ self.componentes
+        listas = self.listas or max(1, int(2 * np.sqrt(n)))
+        listas = min(listas, len(muestra))
+        self.centroides = kmeans(proyeccion_muestra, listas, semilla=semilla).astype(np.float32)
+
+        self._asignacion = np.empty(0, dtype=np.int32)
+        self._proyecciones = np.empty((0, self.componentes.shape[1]), dtype=np.float32)
+        self._cantidad = 0
+        self._listas = [np.empty(0, dtype=np.int64) for _ in range(len(self.centroides))]
+        self._longitudes = np.zeros(len(self.centroides), dtype=np.int64)
+        self.agregar(histogramas)
+        self.tamano_construccion = n
+
+    def agregar(self, histogramas):
+        """Asigna filas nuevas (al final de la galería) a su lista más cercana"""
+        if len(histogramas) == 0:
+            return
+        proyecciones = np.vstack([self.proyectar(histogramas[i:i + 4096])
+                                  for i in range(0, len(histogramas), 4096)])
+        asignacion = np.argmin(_distancias_cuadradas(proyecciones, self.centroides), axis=1).astype(np.int32)
+
+        inicio, fin = self._cantidad, self._cantidad + len(proyecciones)
+        if fin > len(self._asignacion):
+            capacidad = max(fin, 2 * len(self._asignacion), 64)
+            self._proyecciones = _crecer(self._proyecciones, inicio, capacidad)
+            self._asignacion = _crecer(self._asignacion, inicio, capacidad)
+        self._proyecciones[inicio:fin] = proyecciones
+        self._asignacion[inicio:fin] = asignacion
+        self._cantidad = fin
+
+        # Añadir las filas nuevas al final de su lista sin tocar las ya repartidas
+        orden = np.argsort(asignacion, kind="stable")
+        listas, cortes = np.unique(asignacion[orden], return_index=True)
+        for lista, filas in zip(listas, np.split(orden + inicio, cortes[1:])):
+            self._anadir_a_lista(int(lista), filas)
+
+    def _anadir_a_lista(self, lista, filas):
+        ocupadas = self._longitudes[lista]
+        fin = ocupadas + len(filas)
+        if fin > len(self._listas[lista]):
+            self._listas[lista] = _crecer(self._listas[lista], ocupadas, max(fin, 2 * len(self._listas[lista]), 16))
+        self._listas[lista][ocupadas:fin] = filas
+        self._longitudes[lista] = fin
+
+    def necesita_reconstruir(self, total):
+        """Los centroides dejan de representar la galería cuando esta dobla su tamaño"""
+        return not self.construido or total > 2 * max(self.tamano_construccion, 1)
+
+    def buscar(self, consulta, candidatos=None, nprobe=None):
+        """
+        Índices de las filas candidatas más cercanas a la consulta (histograma LBP).
+        Puede devolver un array vacío si las listas recorridas están vacías.
+        """
+        candidatos = candidatos or self.candidatos
+        nprobe = min(nprobe or self.nprobe, len(self.centroides))
+        proyeccion = self.proyectar(consulta)
+        cercanas = np.argsort(_distancias_cuadradas(proyeccion, self.centroides)[0])[:nprobe]
+        filas = np.concatenate([self._listas[lista][:self._longitudes[lista]] for lista in cercanas])
+        if len(filas) <= candidatos:
+            return filas
+        distancias = _distancias_cuadradas(self._proyecciones[filas], proyeccion)[:, 0]
+        return filas[np.argpartition(distancias, candidatos)[:candidatos]]
+
+    def a_diccionario(self):
+        """Arrays para guardar el índice junto al modelo"""
+        return {
+            "indice_media": self.media,
+            "indice_componentes": self.componentes,
+            "indice_centroides": self.centroides,
+            "indice_asignacion": self._asignacion[:self._cantidad],
+            "indice_proyecciones": self._proyecciones[:self._cantidad],
+            "indice_tamano": np.array([self.tamano_construccion]),
+        }
+
+    def desde_diccionario(self, datos):
+        self.media = datos["indice_media"]
+        self.componentes = datos["indice_componentes"]
+        self.centroides = datos["indice_centroides"]
+        self._asignacion = datos["indice_asignacion"].astype(np.int32)
+        self._proyecciones = datos["indice_proyecciones"].astype(np.float32)
+        self._cantidad = len(self._asignacion)
+        self.tamano_construccion = int(datos["indice_tamano"][0])
+        self._reconstruir_listas()
+
+    def _reconstruir_listas(self):
+        """Reparte todas las filas en sus listas (solo al cargar un índice guardado)"""
+        asignacion = self._asignacion[:self._cantidad]
+        orden = np.argsort(asignacion, kind="stable").astype(np.int64)
+        limites = np.searchsorted(asignacion[orden], np.arange(len(self.centroides) + 1))
+        self._listas = [orden[limites[i]:limites[i + 1]] for i in range(len(self.centroides))]
+        self._longitudes = np.diff(limites).astype(np.int64)
@@ -0,0 +1,274 @@
+import numpy as np
+
+# Parámetros por defecto de cv2.face.LBPHFaceRecognizer_create()
+RADIO = 1
+VECINOS = 8
+GRID_X = 8
+GRID_Y = 8
+
+# Filas que se comparan a la vez en la búsqueda exacta (limita la memoria temporal)
+TAMANO_BLOQUE = 1024
+
+
+def _pesos_vecinos(radio, vecinos):
+    """Desplazamientos y pesos de interpolación bilineal de cada vecino, como en OpenCV"""
+    pesos = []
+    for n in range(vecinos):
+        # Ángulo en doble precisión y resultado convertido a float32, como en OpenCV
+        x = np.float32(radio * np.cos(2.0 * np.pi * n / float(vecinos)))
+        y = np.float32(-radio * np.sin(2.0 * np.pi * n / float(vecinos)))
+        fx, fy = int(np.floor(x)), int(np.floor(y))
+        cx, cy = int(np.ceil(x)), int(np.ceil(y))
+        ty = np.float32(y - fy)
+        tx = np.float32(x - fx)
+        uno = np.float32(1)
+        w1 = (uno - tx) * (uno - ty)
+        w2 = tx * (uno - ty)
+        w3 = (uno - tx) * ty
+        w4 = tx * ty
+        pesos.append((fx, fy, cx, cy, w1, w2, w3, w4))
+    return pesos
+
+
+def codigos_lbp(imagenes, radio=RADIO, vecinos=VECINOS):
+    """
+    LBP circular extendido de un lote de imágenes (N x alto x ancho, uint8).
+    Reproduce elbp() de OpenCV: interpolación bilineal en float32 y bit a 1 si el
+    vecino es mayor que el centro o prácticamente igual.
+
+    Returns:
+        Array N x (alto - 2*radio) x (ancho - 2*radio) con los códigos (int32)
+    """
+    imagenes = np.asarray(imagenes)
+    if imagenes.ndim == 2:
+        imagenes = imagenes[np.newaxis]
+    n, alto, ancho = imagenes.shape
+    fuente = imagenes.astype(np.float32)
+    centro = fuente[:, radio:alto - radio, radio:ancho - radio]
+    codigos = np.zeros(centro.shape, dtype=np.int32)
+    epsilon = np.finfo(np.float32).eps
+
+    def vecino(dy, dx):
+        return fuente[:, radio + dy:alto - radio + dy, radio + dx:ancho - radio + dx]
+
+    for bit, (fx, fy, cx, cy, w1, w2, w3, w4) in enumerate(_pesos_vecinos(radio, vecinos)):
+        t = w1 * vecino(fy, fx) + w2 * vecino(fy, cx) + w3 * vecino(cy, fx) + w4 * vecino(cy, cx)
+        activo = (t > centro) | (np.abs(t - centro) < epsilon)
+        codigos |= activo.astype(np.int32) << bit
+    return codigos
+
+
+def histogramas_lbp(imagenes, radio=RADIO, vecinos=VECINOS, grid_x=GRID_X, grid_y=GRID_Y):
+    """
+    Histogramas espaciales LBP de un lote de imágenes, idénticos a los que guarda
+    el reconocedor LBPH de OpenCV (cada celda normalizada por su número de píxeles).
+
+    Returns:
+        Matriz float32 N x (grid_x * grid_y * 2^vecinos)
+    """
+    codigos = codigos_lbp(imagenes, radio, vecinos)
+    n, alto, ancho = codigos.shape
+    patrones = 2 ** vecinos
+    ancho_celda = ancho // grid_x
+    alto_celda = alto // grid_y
+
+    # Recortar a celdas completas y agrupar: N x grid_y x grid_x x píxeles de la celda
+    celdas = codigos[:, :grid_y * alto_celda, :grid_x * ancho_celda]
+    celdas = celdas.reshape(n, grid_y, alto_celda, grid_x, ancho_celda).transpose(0, 1, 3, 2, 4)
+    celdas = celdas.reshape(n, grid_y * grid_x, alto_celda * ancho_celda)
+
+    # Contar todas las celdas a la vez desplazando cada una a su propio rango de bins
+    desplazamiento = (np.arange(n * grid_y * grid_x, dtype=np.int64) * patrones).reshape(n, -1, 1)
+    conteos = np.bincount((celdas + desplazamiento).ravel(), minlength=n * grid_y * grid_x * patrones)
+    # OpenCV divide multiplicando por el inverso del número de píxeles en float32
+    escala = np.float32(1.0 / (alto_celda * ancho_celda))
+    return conteos.reshape(n, grid_y * grid_x * patrones).astype(np.float32) * escala
+
+
+def distancias_chi2(histogramas, sumas, consulta):
+    """
+    Distancia chi-cuadrado alternativa de OpenCV (HISTCMP_CHISQR_ALT) entre la
+    consulta y cada fila, en una sola operación vectorizada.
+
+    Solo se recorren los bins donde la consulta no es cero: en el resto el término
+    (a - 0)^2 / (a + 0) vale a, y su suma es la suma de la fila menos los bins ya usados.
+
+    Args:
+        histogramas: Matriz float32 N x D
+        sumas: Suma de cada fila (float64, precalculada)
+        consulta: Vector float32 de longitud D
+
+    Returns:
+        Vector float64 con N distancias
+    """
+    activos = np.flatnonzero(consulta)
+    q = consulta[activos]
+    distancias = np.empty(len(histogramas), dtype=np.float64)
+    for inicio in range(0, len(histogramas), TAMANO_BLOQUE):
+        bloque = histogramas[inicio:inicio + TAMANO_BLOQUE, activos]
+        # Resta y suma en float32 y el cociente en float64, igual que compareHist
+        diferencia = (bloque - q).astype(np.float64)
+        suma = (bloque + q).astype(np.float64)
+        distancias[inicio:inicio + TAMANO_BLOQUE] = (
+            (diferencia * diferencia / suma).sum(axis=1)
+            + sumas[inicio:inicio + TAMANO_BLOQUE] - bloque.sum(axis=1, dtype=np.float64))
+    return 2.0 * distancias
+
+
+def seleccionar_representativas(histogramas, k):
+    """
+    Elige k muestras diversas de una persona: empieza por el medoide (la muestra
+    más central) y añade cada vez la más alejada de las ya elegidas (k-center voraz),
+    de modo que las capturas casi idénticas se descartan primero.
+
+    Args:
+        histogramas: Matriz float32 N x D con los histogramas LBP de la persona
+        k: Número de muestras a conservar
+
+    Returns:
+        Índices (ordenados) de las muestras a conservar
+    """
+    n = len(histogramas)
+    if n <= k:
+        return np.arange(n)
+    sumas = histogramas.sum(axis=1, dtype=np.float64)
+    distancias = np.vstack([distancias_chi2(histogramas, sumas, fila) for fila in histogramas])
+
+    elegidas = [int(np.argmin(distancias.sum(axis=1)))]
+    minimas = distancias[elegidas[0]].copy()
+    while len(elegidas) < k:
+        siguiente = int(np.argmax(minimas))
+        elegidas.append(siguiente)
+        minimas = np.minimum(minimas, distancias[siguiente])
+    return np.sort(np.array(elegidas))
+
+
+class ReconocedorLBP:
+    """
+    Reconocedor LBPH en NumPy con la misma interfaz que usa FaceAppLogic del de
+    OpenCV (train, update, predict, write, read). Todos los histogramas de las
+    muestras se guardan en una matriz float32 contigua y la búsqueda del vecino
+    más cercano es una sola operación vectorizada. Opcionalmente usa un índice
+    aproximado (p. ej. indice.IndiceIVF) que propone los candidatos.
+    """
+
+    def __init__(self, radio=RADIO, vecinos=VECINOS, grid_x=GRID_X, grid_y=GRID_Y, indice=None):
+        """
+        Args:
+            indice: Índice aproximado con construir/agregar/buscar; se usa cuando la
+                galería alcanza su minimo_muestras
+        """
+        self.indice = indice
+        self.radio = radio
+        self.vecinos = vecinos
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+
+        dimension = grid_x * grid_y * 2 ** vecinos
+        self._histogramas = np.empty((0, dimension), dtype=np.float32)
+        self._sumas = np.empty(0, dtype=np.float64)
+        self._etiquetas = np.empty(0, dtype=np.int32)
+        self._cantidad = 0
+
+    @property
+    def histogramas(self):
+        return self._histogramas[:self._cantidad]
+
+    def getLabels(self):
+        return self._etiquetas[:self._cantidad].reshape(-1, 1)
+
+    def calcular_histogramas(self, imagenes):
+        return histogramas_lbp(np.asarray(imagenes, dtype=np.uint8), self.radio, self.vecinos,
+                               self.grid_x, self.grid_y)
+
+    def train(self, imagenes, etiquetas):
+        self._cantidad = 0
+        self._histogramas = self._histogramas[:0]
+        if self.indice is not None:
+            self.indice.centroides = None
+        self.update(imagenes, etiquetas)
+
+    def update(self, imagenes, etiquetas):
+        if len(imagenes) == 0:
+            return
+        nuevos = self.calcular_histogramas(imagenes)
+        etiquetas = np.asarray(etiquetas, dtype=np.int32).ravel()
+        fin = self._cantidad + len(nuevos)
+
+        # Crecer la matriz contigua al doble cuando se llena, como una lista
+        if fin > len(self._histogramas):
+            capacidad = max(fin, 2 * len(self._histogramas), 64)
+            self._histogramas = self._redimensionar(self._histogramas, capacidad)
+            self._sumas = self._redimensionar(self._sumas, capacidad)
+            self._etiquetas = self._redimensionar(self._etiquetas, capacidad)
+
+        self._histogramas[self._cantidad:fin] = nuevos
+        self._sumas[self._cantidad:fin] = nuevos.sum(axis=1, dtype=np.float64)
+        self._etiquetas[self._cantidad:fin] = etiquetas
+        self._cantidad = fin
+        self._actualizar_indice(len(nuevos))
+
+    def predict(self, imagen):
+        """Devuelve (etiqueta, distancia) de la muestra más cercana, o (-1, max float) si no hay"""
+        if self._cantidad == 0:
+            return -1, float(np.finfo(np.float64).max)
+        consulta = self.calcular_histogramas(imagen)[0]
+        return self.predecir_histograma(consulta)
+
+    def predecir_histograma(self, consulta):
+        filas = None
+        if self.indice is not None and self.indice.construido:
+            # Candidatos del índice aproximado, reordenados después con la distancia exacta
+            filas = np.sort(self.indice.buscar(consulta))
+            if len(filas) == 0:
+                # Las listas recorridas estaban vacías: búsqueda exhaustiva
+                filas = None
+
+        if filas is None:
+            distancias = distancias_chi2(self.histogramas, self._sumas[:self._cantidad], consulta)
+            etiquetas = self._etiquetas[:self._cantidad]
+        else:
+            distancias = distancias_chi2(self._histogramas[filas], self._sumas[filas], consulta)
+            etiquetas = self._etiquetas[filas]
+
+        # argmin devuelve la primera muestra en caso de empate, igual que OpenCV
+        mejor = int(np.argmin(distancias))
+        return int(etiquetas[mejor]), float(distancias[mejor])
+
+    def write(self, ruta):
+        arrays = {}
+        if self.indice is not None and self.indice.construido:
+            arrays = self.indice.a_diccionario()
+        with open(ruta, "wb") as f:
+            np.savez(f, histogramas=self.histogramas, etiquetas=self._etiquetas[:self._cantidad],
+                     parametros=np.array([self.radio, self.vecinos, self.grid_x, self.grid_y]), **arrays)
+
+    def read(self, ruta):
+        with open(ruta, "rb") as f:
+            datos = np.load(f)
+            self.radio, self.vecinos, self.grid_x, self.grid_y = (int(v) for v in datos["parametros"])
+            self._histogramas = np.ascontiguousarray(datos["histogramas"], dtype=np.float32)
+            self._etiquetas = datos["etiquetas"].astype(np.int32)
+            if self.indice is not None:
+                if "indice_centroides" in datos.files:
+                    self.indice.desde_diccionario(datos)
+                else:
+                    self.indice.centroides = None
+        self._cantidad = len(self._histogramas)
+        self._sumas = self._histogramas.sum(axis=1, dtype=np.float64)
+        if self.indice is not None and not self.indice.construido:
+            self._actualizar_indice(self._cantidad)
+
+    def _actualizar_indice(self, nuevas):
+        """Añade las últimas filas al índice, o lo (re)construye si la galería creció mucho"""
+        if self.indice is None or self._cantidad < self.indice.minimo_muestras:
+            return
+        if self.indice.necesita_reconstruir(self._cantidad):
+            self.indice.construir(self.histogramas)
+        else:
+            self.indice.agregar(self.histogramas[self._cantidad - nuevas:])
+
+    def _redimensionar(self, arreglo, capacidad):
+        nuevo = np.empty((capacidad,) + arreglo.shape[1:], dtype=arreglo.dtype)
+        nuevo[:self._cantidad] = arreglo[:self._cantidad]
+        return nuevo
@@ -1,94 +1,653 @@
+import json
+import os
 import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import cv2
-from datetime import datetime
+from datetime import datetime, timedelta
+from cache_personas import PersonaCache
+from cerrojo import CerrojoLecturaEscritura
+from deteccion import ESCALA_DETECCION, detectar_rostros
+from esquema import migrar, tiene_columna
+from galeria import GaleriaHistogramas
+from indice import IndiceIVF
+from lbp import ReconocedorLBP, histogramas_lbp, seleccionar_representativas
+from repositorio import RepositorioSQLite
+
+# Formatos de almacenamiento de las muestras (columna imagenes_personas.formato)
+FORMATO_FLOAT64 = 0  # Formato original: 100x100 float64 (80.000 bytes por muestra)
+FORMATO_UINT8 = 1  # 100x100 uint8 sin comprimir (10.000 bytes por muestra)
+FORMATO_ZLIB = 2  # 100x100 uint8 comprimido con zlib
+FORMATO_PNG = 3  # PNG en escala de grises (sin pérdida)
+FORMATO_POR_DEFECTO = FORMATO_UINT8
+
+NOMBRES_FORMATO = {
+    "float64": FORMATO_FLOAT64,
+    "uint8": FORMATO_UINT8,
+    "zlib": FORMATO_ZLIB,
+    "png": FORMATO_PNG,
+}
+
+TAMANO_ROSTRO = (100, 100)
+
+# Implementaciones del reconocedor LBPH disponibles
+BACKEND_OPENCV = "opencv"  # cv2.face.LBPHFaceRecognizer (búsqueda lineal en C++)
+BACKEND_NUMPY = "numpy"  # lbp.ReconocedorLBP (matriz de histogramas y búsqueda vectorizada)
+BACKENDS = (BACKEND_OPENCV, BACKEND_NUMPY)
+
+# Días de acceso que otorga cada registro o renovación
+DIAS_SUSCRIPCION = 30
+
+
+def codificar_rostro(face_img, formato=FORMATO_POR_DEFECTO):
+    """Codifica un rostro 100x100 en escala de grises como BLOB en el formato indicado"""
+    face_img = np.ascontiguousarray(face_img, dtype=np.uint8)
+    if formato == FORMATO_FLOAT64:
+        return face_img.astype(np.float64).tobytes()
+    if formato == FORMATO_UINT8:
+        return face_img.tobytes()
+    if formato == FORMATO_ZLIB:
+        return zlib.compress(face_img.tobytes())
+    if formato == FORMATO_PNG:
+        ok, buffer = cv2.imencode(".png", face_img)
+        if not ok:
+            raise ValueError("No se pudo codificar el rostro como PNG")
+        return buffer.tobytes()
+    raise ValueError(f"Formato de rostro desconocido: {formato}")
+
+
+def decodificar_rostro(blob, formato=FORMATO_FLOAT64):
+    """
+    Decodifica un BLOB de imagenes_personas a una imagen 100x100 uint8.
+    Devuelve None si el contenido no tiene el tamaño esperado.
+    """
+    if formato == FORMATO_FLOAT64:
+        datos = np.frombuffer(blob, dtype=np.float64)
+        if datos.size != 10000:
+            return None
+        return datos.reshape(TAMANO_ROSTRO).astype(np.uint8)
+    if formato == FORMATO_UINT8:
+        datos = np.frombuffer(blob, dtype=np.uint8)
+    elif formato == FORMATO_ZLIB:
+        datos = np.frombuffer(zlib.decompress(blob), dtype=np.uint8)
+    elif formato == FORMATO_PNG:
+        datos = cv2.imdecode(np.frombuffer(blob, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if datos is None:
+            return None
+    else:
+        raise ValueError(f"Formato de rostro desconocido: {formato}")
+    if datos.size != 10000:
+        return None
+    return datos.reshape(TAMANO_ROSTRO)
+
+
+def _acumular_huella(crc, imagen_id, persona_id, encoding, formato):
+    """CRC32 acumulado de una fila de muestras: identidad, formato y contenido del BLOB"""
+    crc = zlib.crc32(f"{imagen_id}:{persona_id}:{formato}:".encode("ascii"), crc)
+    return zlib.crc32(encoding, crc)
+
+
+def expirar_suscripciones(com, hoy=None):
+    """
+    Deshabilita en una sola sentencia a las personas cuya suscripción venció.
+    Una suscripción vence cuando pasaron DIAS_SUSCRIPCION días desde fecha_registro,
+    así que basta comparar la fecha (ISO, ordenable como texto) con un límite fijo,
+    lo que permite usar el índice idx_personas_expiracion.
+
+    Returns:
+        Número de personas expiradas en esta pasada
+    """
+    hoy = hoy or datetime.now()
+    limite = (hoy - timedelta(days=DIAS_SUSCRIPCION)).strftime("%Y-%m-%d")
+    cursor = com.execute(
+        "UPDATE personas SET habilitado = 0, expirado = 1 "
+        "WHERE habilitado = 1 AND fecha_registro <= ? AND expirado = 0",
+        (limite,)
+    )
+    com.commit()
+    return cursor.rowcount
+
+
+class TareaExpiracion:
+    """
+    Ejecuta el barrido de expiración en segundo plano cada cierto intervalo y justo
+    después de medianoche, a través del hilo escritor del repositorio.
+    """
+
+    def __init__(self, repositorio, intervalo=60, al_expirar=None):
+        """
+        Args:
+            repositorio: RepositorioSQLite de la aplicación (FaceAppLogic.repo)
+            intervalo: Segundos entre barridos
+            al_expirar: Función opcional (expirados) llamada desde el hilo cuando expira alguien
+        """
+        self.repositorio = repositorio
+        self.intervalo = intervalo
+        self.al_expirar = al_expirar
+        self._expirados_pendientes = 0
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="tarea-expiracion", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=2.0)
+            self._hilo = None
+
+    def obtener_expirados(self):
+        """Devuelve cuántas personas expiraron desde la última consulta"""
+        with self._lock:
+            expirados = self._expirados_pendientes
+            self._expirados_pendientes = 0
+        return expirados
+
+    def _segundos_hasta_proxima(self):
+        ahora = datetime.now()
+        medianoche = (ahora + timedelta(days=1)).replace(hour=0, minute=0, second=1, microsecond=0)
+        return min(self.intervalo, (medianoche - ahora).total_seconds())
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                expirados = self.repositorio.escribir(expirar_suscripciones)
+                if expirados:
+                    with self._lock:
+                        self._expirados_pendientes += expirados
+                    if self.al_expirar is not None:
+                        self.al_expirar(expirados)
+            except sqlite3.Error as e:
+                print(f"Error en el barrido de expiración: {e}")
+            self._detener.wait(self._segundos_hasta_proxima())
+
+
+class TareaSincronizacion:
+    """
+    Comprueba cada pocos segundos si otro proceso escribió en la BD (la interfaz de
+    administración mientras corre el servicio o el servidor) y pone al día el modelo
+    con FaceAppLogic.sincronizar_modelo. El estado de las personas ya lo recarga la
+    propia caché al detectar el cambio.
+    """
+
+    def __init__(self, logic, intervalo=2.0):
+        """
+        Args:
+            logic: FaceAppLogic a mantener al día
+            intervalo: Segundos entre comprobaciones
+        """
+        self.logic = logic
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="tarea-sincronizacion", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=2.0)
+            self._hilo = None
+
+    def _bucle(self):
+        try:
+            while not self._detener.wait(self.intervalo):
+                try:
+                    self.logic.sincronizar_modelo()
+                except sqlite3.Error as e:
+                    print(f"Error al sincronizar el modelo con la BD: {e}")
+        finally:
+            self.logic.repo.liberar_hilo()
+
 
 class FaceAppLogic:
-    def __init__(self, db_path="rostrosv2.db"):
-        self.com = sqlite3.connect(db_path)
-        self.cursor = self.com.cursor()
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        # Crear el reconocedor LBPH
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()
+    def __init__(self, db_path="rostrosv2.db", umbral_reentrenamiento=0.3,
+                 formato_muestras=FORMATO_POR_DEFECTO, entrenar=True,
+                 backend=BACKEND_OPENCV, indice_ann=False, solo_lectura=False):
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend de reconocimiento desconocido: {backend}")
+        self.db_path = db_path
+        # Implementación del reconocedor; indice_ann solo se usa con el backend numpy
+        self.backend = backend
+        self.indice_ann = indice_ann and backend == BACKEND_NUMPY
+        # Conexiones de lectura por hilo y un único hilo escritor: seguro desde el pipeline.
+        # En solo lectura (simulaciones, benchmarks) no se migra la BD ni se guarda el modelo
+        self.solo_lectura = solo_lectura
+        self.repo = RepositorioSQLite(db_path, solo_lectura=solo_lectura)
+        self.ruta_cascada = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self.face_cascade = cv2.CascadeClassifier(self.ruta_cascada)
+        self.lock_cascada = threading.Lock()  # detectMultiScale no es seguro entre hilos
+        self.escala_deteccion = ESCALA_DETECCION
+        # Protege el reconocedor y su estado: las predicciones (de todas las cámaras)
+        # leen a la vez y solo entrenar, actualizar o eliminar muestras es exclusivo
+        self.lock = CerrojoLecturaEscritura()
+        # Estado de las personas en memoria para el bucle de video
+        self.cache_personas = PersonaCache(self._consultar, DIAS_SUSCRIPCION, version=self.repo.version_datos)
+        # Histogramas de intensidad de la galería para compare_faces_many
+        self.galeria_histogramas = GaleriaHistogramas(self._cargar_galeria)
+        # Crear el reconocedor LBPH. Las etiquetas del modelo son directamente personas.id
+        self.recognizer = self._crear_reconocedor()
         self.trained = False
-        self.label_map = {}
-        self.crear_tabla()
-        self.entrenar_modelo()
+
+        # Estado para el mantenimiento incremental del modelo
+        self.muestras_persona = {}  # persona_id -> número de muestras en el modelo
+        self.etiquetas_eliminadas = set()  # Lápidas: ids de personas borradas aún en el modelo
+        self.total_muestras = 0
+        self.muestras_obsoletas = 0
+        self.id_maximo_modelo = 0  # Mayor id de imagenes_personas ya incluido en el modelo
+        self._version_modelo = None  # data_version de la BD vista por la última sincronización
+        # Fracción de muestras obsoletas a partir de la cual se reentrena desde cero
+        self.umbral_reentrenamiento = umbral_reentrenamiento
+        # Formato en el que se guardan las nuevas muestras
+        self.formato_muestras = formato_muestras
+
+        # Modelo persistido junto a la base de datos para arrancar sin reentrenar
+        base = os.path.splitext(db_path)[0]
+        if backend == BACKEND_NUMPY:
+            self.ruta_modelo = base + "_modelo.npz"
+            self.ruta_modelo_tmp = base + "_modelo.tmp.npz"
+        else:
+            self.ruta_modelo = base + "_modelo.yml.gz"
+            self.ruta_modelo_tmp = base + "_modelo.tmp.yml.gz"
+        self.ruta_meta_modelo = base + "_modelo.json"
+        self.modelo_modificado = False
+        self.hilo_entrenamiento = None
+        # Pool para predecir en paralelo los rostros de un mismo frame (predict libera el GIL)
+        self.hilos_reconocimiento = min(8, os.cpu_count() or 1)
+        self._pool_reconocimiento = None
+        # Varios lectores pueden pedir el pool a la vez: crearlo una sola vez
+        self._lock_pool = threading.Lock()
+
+        if not solo_lectura:
+            self.crear_tabla()
+        # Las BD antiguas sin migrar no tienen la columna formato: sus muestras son float64
+        self.columna_formato = "formato" if tiene_columna(
+            self.repo.cursor(), "imagenes_personas", "formato") else str(FORMATO_FLOAT64)
+        if entrenar and not self.cargar_modelo_guardado():
+            # El modelo guardado no existe o no coincide con la BD: reconstruir sin bloquear
+            self.entrenar_en_segundo_plano()
 
     def crear_tabla(self):
-        # Tabla principal para personas
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS personas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT NOT NULL,
-                habilitado INTEGER DEFAULT 1,
-                fecha_registro TEXT,
-                expirado INTEGER DEFAULT 0,
-                carnet_id TEXT
-            )
-        ''')
-
-        # Tabla para almacenar múltiples imágenes por persona
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS imagenes_personas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                persona_id INTEGER NOT NULL,
-                encoding BLOB NOT NULL,
-                FOREIGN KEY (persona_id) REFERENCES personas(id)
-            )
-        ''')
+        """Crea las tablas o pone al día el esquema de una base de datos existente"""
+        self.repo.escribir(migrar)
 
-        self.com.commit()
+    def cargar_rostros(self, cursor=None, lote=256):
+        """
+        Carga todas las muestras leyendo el cursor por bloques y decodificando cada
+        una directamente en su fila de un array preasignado, de modo que en memoria
+        solo existe una copia de la galería.
 
-    def cargar_rostros(self):
-        # Consulta para obtener todas las imágenes con su correspondiente nombre de persona
-        self.cursor.execute('''
-            SELECT p.nombre, i.encoding 
-            FROM personas p 
-            JOIN imagenes_personas i ON p.id = i.persona_id
-        ''')
+        Args:
+            cursor: Cursor a usar; por defecto, la conexión de lectura del hilo que llama
+            lote: Filas que se piden a SQLite en cada fetchmany
 
-        datos = self.cursor.fetchall()
-        nombres = []
-        encodings = []
+        Returns:
+            Tupla (ids, imagenes): array int32 N con el id de persona de cada muestra
+            y array uint8 contiguo N x 100 x 100
+        """
+        ids, imagenes, _ = self._cargar_rostros(cursor, lote)
+        return ids, imagenes
 
-        for nombre, encoding_blob in datos:
-            try:
-                encoding = np.frombuffer(encoding_blob, dtype=np.float64)
-                if len(encoding) != 10000:  # Validar que el encoding tenga el tamaño correcto
-                    continue
-                nombres.append(nombre)
-                encodings.append(encoding)
-            except Exception as e:
-                print(f"Error al procesar encoding: {e}")
-                continue
+    def _cargar_rostros(self, cursor=None, lote=256):
+        """cargar_rostros más la huella de exactamente las filas leídas (misma transacción)"""
+        cursor = cursor or self.repo.cursor()
+        consulta = "FROM personas p JOIN imagenes_personas i ON p.id = i.persona_id"
 
-        return nombres, encodings
+        # Conteo y lectura dentro de la misma transacción para que vean los mismos datos
+        cursor.execute("BEGIN")
+        try:
+            capacidad = cursor.execute(f"SELECT COUNT(*) {consulta}").fetchone()[0]
+            ids = np.empty(capacidad, dtype=np.int32)
+            imagenes = np.empty((capacidad,) + TAMANO_ROSTRO, dtype=np.uint8)
+            n = 0
+            leidas, max_id, crc = 0, 0, 0
+
+            cursor.execute(f"SELECT i.id, p.id, i.encoding, {self.columna_formato} {consulta} ORDER BY i.id")
+            while True:
+                filas = cursor.fetchmany(lote)
+                if not filas:
+                    break
+                for imagen_id, persona_id, encoding_blob, formato in filas:
+                    leidas += 1
+                    max_id = imagen_id
+                    crc = _acumular_huella(crc, imagen_id, persona_id, encoding_blob, formato)
+                    try:
+                        rostro = decodificar_rostro(encoding_blob, formato)
+                    except Exception as e:
+                        print(f"Error al procesar encoding: {e}")
+                        continue
+                    if rostro is None:  # El encoding no tiene el tamaño correcto
+                        continue
+                    ids[n] = persona_id
+                    imagenes[n] = rostro
+                    n += 1
+        finally:
+            cursor.execute("COMMIT")
+
+        # Las filas inválidas dejan hueco al final: devolver vistas sin copiar
+        return ids[:n], imagenes[:n], self._huella(leidas, max_id, crc)
+
+    def _construir_modelo(self, cursor):
+        """
+        Entrena un reconocedor nuevo con los rostros de la BD sin modificar el estado actual.
+
+        Returns:
+            Tupla (recognizer, estado) donde estado es el diccionario que aplica _aplicar_modelo
+        """
+        ids, encodings, huella = self._cargar_rostros(cursor)
+
+        # Tras un entrenamiento completo no hay lápidas ni muestras obsoletas. La huella
+        # describe exactamente las filas leídas, aunque alguien escriba mientras tanto
+        estado = {
+            "trained": False,
+            "muestras_persona": {},
+            "etiquetas_eliminadas": set(),
+            "total_muestras": 0,
+            "muestras_obsoletas": 0,
+            "huella": huella,
+            "id_maximo": huella["max_id"],
+        }
+        recognizer = self._crear_reconocedor()
 
-    def entrenar_modelo(self):
-        """Entrena el reconocedor con los rostros almacenados en la BD"""
-        nombres, encodings = self.cargar_rostros()
         if len(encodings) == 0:
+            return recognizer, estado
+
+        # Los encodings ya vienen decodificados en un array N x 100 x 100 uint8 y la etiqueta es el id
+        personas, cantidades = np.unique(ids, return_counts=True)
+        estado["muestras_persona"] = dict(zip(personas.tolist(), cantidades.tolist()))
+
+        recognizer.train(encodings, ids)
+        estado["trained"] = True
+        estado["total_muestras"] = len(encodings)
+        return recognizer, estado
+
+    def _aplicar_modelo(self, recognizer, estado):
+        """Sustituye el reconocedor y su estado incremental por los indicados"""
+        with self.lock.escritura():
             self.trained = False
+            self.recognizer = recognizer
+            self.muestras_persona = estado["muestras_persona"]
+            self.etiquetas_eliminadas = estado["etiquetas_eliminadas"]
+            self.total_muestras = estado["total_muestras"]
+            self.muestras_obsoletas = estado["muestras_obsoletas"]
+            self.id_maximo_modelo = estado["id_maximo"]
+            # Se marca como entrenado al final para que reconocer_rostro no vea un estado a medias
+            self.trained = estado["trained"]
+
+    def entrenar_modelo(self):
+        """Entrena el reconocedor desde cero con los rostros almacenados en la BD"""
+        self._esperar_entrenamiento()
+        recognizer, estado = self._construir_modelo(self.repo.cursor())
+        self._aplicar_modelo(recognizer, estado)
+        self.modelo_modificado = True
+
+    def entrenar_en_segundo_plano(self):
+        """Reconstruye el modelo en un hilo aparte con su propia conexión y lo guarda al terminar"""
+        def tarea():
+            try:
+                cursor = self.repo.cursor()
+                recognizer, estado = self._construir_modelo(cursor)
+            except Exception as e:
+                print(f"Error al entrenar el modelo en segundo plano: {e}")
+                return
+            finally:
+                self.repo.liberar_hilo()
+
+            self._aplicar_modelo(recognizer, estado)
+            self._escribir_modelo(estado["huella"])
+
+        self.hilo_entrenamiento = threading.Thread(target=tarea, daemon=True)
+        self.hilo_entrenamiento.start()
+
+    def _esperar_entrenamiento(self):
+        """Espera a que termine el entrenamiento en segundo plano antes de modificar el modelo"""
+        hilo = self.hilo_entrenamiento
+        if hilo is not None and hilo is not threading.current_thread():
+            hilo.join()
+        self.hilo_entrenamiento = None
+
+    def _huella(self, filas, max_id, crc):
+        return {"filas": filas, "max_id": max_id, "crc32": crc, "etiquetas": "persona_id",
+                "backend": self.backend, "indice": self.indice_ann}
+
+    def _calcular_huella(self, cursor=None, lote=256):
+        """
+        Huella del contenido de la BD que determina el modelo: número de muestras, id
+        máximo y un CRC32 de las mismas filas que lee cargar_rostros, BLOB incluido,
+        para que una muestra recodificada con el mismo tamaño también invalide el
+        modelo guardado. Los nombres no forman parte de la huella porque el modelo se
+        etiqueta por id.
+        """
+        cursor = cursor or self.repo.cursor()
+        filas, max_id, crc = 0, 0, 0
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute(f"SELECT i.id, p.id, i.encoding, {self.columna_formato} FROM personas p "
+                           "JOIN imagenes_personas i ON p.id = i.persona_id ORDER BY i.id")
+            while True:
+                bloque = cursor.fetchmany(lote)
+                if not bloque:
+                    break
+                for imagen_id, persona_id, encoding, formato in bloque:
+                    filas += 1
+                    max_id = imagen_id
+                    crc = _acumular_huella(crc, imagen_id, persona_id, encoding, formato)
+        finally:
+            cursor.execute("COMMIT")
+        return self._huella(filas, max_id, crc)
+
+    def guardar_modelo(self):
+        """Guarda el modelo actual en disco junto con la huella de la BD"""
+        self._esperar_entrenamiento()
+        self._escribir_modelo(self._calcular_huella())
+
+    def _escribir_modelo(self, huella):
+        if self.solo_lectura:
+            return
+        if not self.trained:
+            # Sin modelo entrenado no hay nada que persistir
+            for ruta in (self.ruta_modelo, self.ruta_meta_modelo):
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+            self.modelo_modificado = False
+            return
+
+        meta = {
+            "huella": huella,
+            "muestras_persona": [[pid, n] for pid, n in self.muestras_persona.items()],
+            "etiquetas_eliminadas": sorted(self.etiquetas_eliminadas),
+            "total_muestras": self.total_muestras,
+            "muestras_obsoletas": self.muestras_obsoletas,
+        }
+
+        try:
+            # Escribir en archivos temporales y renombrar para no dejar un modelo a medias
+            ruta_tmp = self.ruta_modelo_tmp
+            self.recognizer.write(ruta_tmp)
+            with open(self.ruta_meta_modelo + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(ruta_tmp, self.ruta_modelo)
+            os.replace(self.ruta_meta_modelo + ".tmp", self.ruta_meta_modelo)
+            self.modelo_modificado = False
+        except Exception as e:
+            print(f"No se pudo guardar el modelo: {e}")
+
+    def cargar_modelo_guardado(self):
+        """
+        Carga el modelo guardado si su huella coincide con el contenido actual de la BD.
+        Devuelve True si el modelo quedó listo para usarse.
+        """
+        if not (os.path.exists(self.ruta_modelo) and os.path.exists(self.ruta_meta_modelo)):
+            return False
+
+        try:
+            with open(self.ruta_meta_modelo, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("huella") != self._calcular_huella():
+                return False
+
+            recognizer = self._crear_reconocedor()
+            recognizer.read(self.ruta_modelo)
+        except Exception as e:
+            print(f"No se pudo cargar el modelo guardado: {e}")
+            return False
+
+        estado = {
+            "trained": True,
+            "muestras_persona": {pid: n for pid, n in meta["muestras_persona"]},
+            "etiquetas_eliminadas": set(meta["etiquetas_eliminadas"]),
+            "total_muestras": meta["total_muestras"],
+            "muestras_obsoletas": meta["muestras_obsoletas"],
+            "id_maximo": meta["huella"]["max_id"],
+        }
+        self._aplicar_modelo(recognizer, estado)
+        return True
+
+    def _crear_reconocedor(self):
+        """Reconocedor vacío del backend configurado; ambos exponen train/update/predict/write/read"""
+        if self.backend == BACKEND_NUMPY:
+            # El índice aproximado se construye solo cuando la galería es grande
+            indice = IndiceIVF() if self.indice_ann else None
+            return ReconocedorLBP(indice=indice)
+        return cv2.face.LBPHFaceRecognizer_create()
+
+    def _preparar_rostro(self, face_img):
+        """Convierte un recorte de rostro a escala de grises 100x100 (uint8)"""
+        if len(face_img.shape) > 2:
+            face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(face_img, TAMANO_ROSTRO)
+
+    def _agregar_al_modelo(self, persona_id, faces, ids_imagenes):
+        """
+        Añade las muestras de una persona al modelo usando update() en lugar de
+        reentrenar todo el reconocedor. ids_imagenes son los ids de imagenes_personas
+        de cada rostro, para no añadir las filas que un entrenamiento en segundo plano
+        ya leyó de la BD.
+        """
+        if not faces:
             return
 
-        # Convertir encodings a imágenes para entrenar
-        faces = []
-        labels = []
-        label_dict = {}
+        self._esperar_entrenamiento()
+        with self.lock.escritura():
+            # Los ids crecen siempre (AUTOINCREMENT y un único escritor): las filas con
+            # id <= id_maximo_modelo ya están en el modelo
+            faces = [face for face, imagen_id in zip(faces, ids_imagenes) if imagen_id > self.id_maximo_modelo]
+            if not faces:
+                return
+            self.modelo_modificado = True
+
+            # Sin modelo previo no hay nada que actualizar: el primer entrenamiento es completo
+            if not self.trained:
+                self.entrenar_modelo()
+                return
 
-        for i, (nombre, encoding) in enumerate(zip(nombres, encodings)):
-            face_img = encoding.reshape(100, 100).astype(np.uint8)
-            if nombre not in label_dict:
-                label_dict[nombre] = len(label_dict)
-            label = label_dict[nombre]
-            faces.append(face_img)
-            labels.append(label)
+            self.recognizer.update(faces, np.full(len(faces), persona_id, dtype=np.int32))
+            self.muestras_persona[persona_id] = self.muestras_persona.get(persona_id, 0) + len(faces)
+            self.total_muestras += len(faces)
+            self.id_maximo_modelo = max(self.id_maximo_modelo, max(ids_imagenes))
+
+    def _eliminar_del_modelo(self, persona_id):
+        """
+        Marca las muestras de una persona como obsoletas (lápida) y solo reentrena
+        cuando la fracción de muestras obsoletas supera el umbral configurado
+        """
+        self._esperar_entrenamiento()
+        with self.lock.escritura():
+            muestras = self.muestras_persona.pop(persona_id, 0)
+            if not muestras:
+                return
 
-        if len(faces) > 0:
-            self.recognizer.train(faces, np.array(labels))
-            self.trained = True
-            self.label_map = {v: k for k, v in label_dict.items()}
+            self.modelo_modificado = True
+            self.muestras_obsoletas += muestras
+            self.etiquetas_eliminadas.add(persona_id)
+            self._compactar_si_necesario()
+
+    def _compactar_si_necesario(self):
+        """Reentrena desde cero si hay demasiadas muestras obsoletas en el modelo"""
+        if self.total_muestras == 0:
+            return
+        if self.muestras_obsoletas / self.total_muestras > self.umbral_reentrenamiento:
+            self.entrenar_modelo()
+
+    def sincronizar_modelo(self):
+        """
+        Incorpora al modelo las muestras que otro proceso añadió o borró en la BD. Las
+        altas se añaden con update(), las personas borradas se marcan como lápidas y
+        cualquier otro cambio (compactación, muestras sueltas borradas) reconstruye el
+        modelo en segundo plano.
+
+        Returns:
+            True si el modelo cambió o se lanzó una reconstrucción
+        """
+        version = self.repo.version_datos()
+        if version == self._version_modelo:
+            return False
+        hilo = self.hilo_entrenamiento
+        if hilo is not None and hilo.is_alive():
+            # El entrenamiento en curso pudo leer la BD antes del cambio: comprobar después
+            return False
+        self._version_modelo = version
+
+        consulta = "FROM imagenes_personas i JOIN personas p ON p.id = i.persona_id"
+        en_bd = dict(self._consultar(f"SELECT i.persona_id, COUNT(*) {consulta} GROUP BY i.persona_id"))
+        nuevas = {}
+        for imagen_id, persona_id, encoding, formato in self._consultar(
+                f"SELECT i.id, i.persona_id, i.encoding, {self.columna_formato} {consulta} "
+                "WHERE i.id > ? ORDER BY i.id", (self.id_maximo_modelo,)):
+            nuevas.setdefault(persona_id, []).append((imagen_id, encoding, formato))
+
+        with self.lock.lectura():
+            conocidas = dict(self.muestras_persona)
+        borradas = [persona_id for persona_id in conocidas if persona_id not in en_bd]
+        esperadas = {persona_id: n for persona_id, n in conocidas.items() if persona_id in en_bd}
+        for persona_id, filas in nuevas.items():
+            esperadas[persona_id] = esperadas.get(persona_id, 0) + len(filas)
+        if esperadas == en_bd and not borradas and not nuevas:
+            return False
+
+        self.galeria_histogramas.invalidar()
+        if esperadas != en_bd:
+            # No se explica solo con altas y bajas de personas: reconstruir
+            self.entrenar_en_segundo_plano()
+            return True
+
+        for persona_id in borradas:
+            self._eliminar_del_modelo(persona_id)
+        for persona_id, filas in nuevas.items():
+            faces, ids_imagenes = [], []
+            for imagen_id, encoding, formato in filas:
+                rostro = decodificar_rostro(encoding, formato)
+                if rostro is not None:
+                    faces.append(rostro)
+                    ids_imagenes.append(imagen_id)
+            self._agregar_al_modelo(persona_id, faces, ids_imagenes)
+        return True
+
+    def detectar_rostros(self, gray, escala=None, roi=None):
+        """
+        Detecta rostros con el clasificador compartido sobre el frame reducido.
+
+        Args:
+            gray: Frame en escala de grises a resolución original
+            escala: Escala de detección; por defecto self.escala_deteccion
+            roi: Caja (x, y, w, h) a la que limitar la búsqueda, o None
+
+        Returns:
+            Array Nx4 con las cajas (x, y, w, h) en coordenadas del frame original
+        """
+        escala = self.escala_deteccion if escala is None else escala
+        with self.lock_cascada:
+            return detectar_rostros(self.face_cascade, gray, escala, roi)
 
     def compare_faces(self, face1, face2, threshold=0.5):
         if len(face1.shape) > 2:
@@ -103,22 +662,27 @@ class FaceAppLogic:
         similarity = cv2.compareHist(hist1, hist2, cv2.HISTCMP_CORREL)
         return similarity > threshold, similarity
 
+    def compare_faces_many(self, probe, ids=None):
+        """
+        Compara un rostro con toda la galería (o con las personas indicadas) usando la
+        misma correlación de histogramas que compare_faces, en una sola operación.
+
+        Args:
+            probe: Imagen del rostro (BGR o escala de grises)
+            ids: Ids de persona a los que limitar la comparación, o None para todos
+
+        Returns:
+            Tupla (persona_ids, correlaciones) ordenada de mayor a menor correlación
+        """
+        return self.galeria_histogramas.comparar(self._preparar_rostro(probe), ids)
+
+    def _cargar_galeria(self):
+        # Puede llamarse desde otros hilos: cargar_rostros usa la conexión de lectura del hilo
+        return self.cargar_rostros()
+
     def registrar_rostro(self, nombre, face_img):
         """Registrar un nuevo rostro en la BD"""
-        if len(face_img.shape) > 2:
-            face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
-        face_resized = cv2.resize(face_img, (100, 100))
-        encoding = np.array(face_resized, dtype=np.float64).flatten()
-
-        fecha_registro = datetime.now().strftime("%Y-%m-%d")
-        carnet_id = ""  # Puedes pedirlo en otro campo si lo necesitas
-        self.cursor.execute(
-            "INSERT INTO personas (nombre, encoding, fecha_registro, carnet_id) VALUES (?, ?, ?, ?)",
-            (nombre, encoding.tobytes(), fecha_registro, carnet_id)
-        )
-        self.com.commit()
-        # Reentrenar el modelo con el nuevo rostro
-        self.entrenar_modelo()
+        self.registrar_rostro_con_carnet(nombre, face_img)
 
     def registrar_rostro_multiple(self, nombre, face_images, carnet_id=""):
         """
@@ -126,136 +690,420 @@ class FaceAppLogic:
         Almacena una sola entrada en la tabla personas y múltiples imágenes en imagenes_personas
         """
         fecha_registro = datetime.now().strftime("%Y-%m-%d")
+        faces, encodings = self._preparar_muestras(face_images)
 
-        # Primero insertamos los datos de la persona
-        self.cursor.execute(
-            "INSERT INTO personas (nombre, fecha_registro, carnet_id) VALUES (?, ?, ?)",
-            (nombre, fecha_registro, carnet_id)
-        )
+        def insertar(com):
+            # Primero insertamos los datos de la persona
+            persona_id = com.execute(
+                "INSERT INTO personas (nombre, fecha_registro, carnet_id) VALUES (?, ?, ?)",
+                (nombre, fecha_registro, carnet_id)
+            ).lastrowid
+            # Ahora insertamos todas las imágenes para esta persona, en la misma transacción
+            return persona_id, self._insertar_muestras(com, persona_id, encodings)
 
-        # Obtenemos el ID de la persona recién insertada
-        persona_id = self.cursor.lastrowid
+        persona_id, ids_imagenes = self.repo.escribir(insertar)
+        self.cache_personas.invalidar(persona_id)
 
-        # Ahora insertamos todas las imágenes para esta persona
-        for face_img in face_images:
-            if len(face_img.shape) > 2:
-                face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
-            face_resized = cv2.resize(face_img, (100, 100))
-            encoding = np.array(face_resized, dtype=np.float64).flatten()
+        # Añadir las nuevas imágenes al modelo y a la galería sin reentrenar ni recargar
+        self.galeria_histogramas.agregar(persona_id, faces)
+        self._agregar_al_modelo(persona_id, faces, ids_imagenes)
+        return persona_id
 
-            # Insertamos el encoding en la tabla de imágenes
-            self.cursor.execute(
-                "INSERT INTO imagenes_personas (persona_id, encoding) VALUES (?, ?)",
-                (persona_id, encoding.tobytes())
-            )
+    def agregar_muestras(self, persona_id, face_images):
+        """
+        Añade muestras a una persona ya registrada, p. ej. al fusionar un registro
+        duplicado con la identidad existente en lugar de crear una nueva
+        """
+        persona_id = int(persona_id)
+        faces, encodings = self._preparar_muestras(face_images)
+        ids_imagenes = self.repo.escribir(lambda com: self._insertar_muestras(com, persona_id, encodings))
+        self.galeria_histogramas.agregar(persona_id, faces)
+        self._agregar_al_modelo(persona_id, faces, ids_imagenes)
 
-        # Confirmar todos los cambios en la base de datos
-        self.com.commit()
+    def _preparar_muestras(self, face_images):
+        """Rostros preparados y sus encodings, calculados fuera del hilo escritor"""
+        faces = [self._preparar_rostro(face_img) for face_img in face_images]
+        return faces, [codificar_rostro(face, self.formato_muestras) for face in faces]
 
-        # Reentrenar el modelo con las nuevas imágenes
-        self.entrenar_modelo()
+    def _insertar_muestras(self, com, persona_id, encodings):
+        """
+        Inserta los encodings en imagenes_personas; se llama desde una escritura del
+        repositorio. Devuelve los ids de las filas insertadas.
+        """
+        return [com.execute(
+            "INSERT INTO imagenes_personas (persona_id, encoding, formato) VALUES (?, ?, ?)",
+            (persona_id, encoding, self.formato_muestras)).lastrowid
+            for encoding in encodings]
 
     def reconocer_rostro(self, face_img, confidence_threshold=80):
-        """Reconoce un rostro usando LBPH"""
+        """
+        Reconoce un rostro usando LBPH.
+
+        Returns:
+            Tupla (persona_id, distancia); persona_id es None si no se reconoce
+        """
         if not self.trained:
-            return "Desconocido", 0
+            return None, 0
 
-        if len(face_img.shape) > 2:
-            face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
-        face_resized = cv2.resize(face_img, (100, 100))
+        face_resized = self._preparar_rostro(face_img)
 
         try:
-            label, confidence = self.recognizer.predict(face_resized)
+            with self.lock.lectura():
+                label, confidence = self.recognizer.predict(face_resized)
+                if label in self.etiquetas_eliminadas:
+                    # La persona fue eliminada pero sus muestras aún no se compactaron
+                    return None, 0
             if confidence < confidence_threshold: # Menor confianza = mejor coincidencia
-                nombre = self.label_map.get(label, "Desconocido")
-                return nombre, confidence
+                return int(label), confidence
         except Exception as e:
             print(f"Error en reconocimiento: {e}")
 
-        return "Desconocido", 0
+        return None, 0
 
-    def obtener_info_persona(self, nombre):
-        self.cursor.execute(
-            "SELECT habilitado, fecha_registro, carnet_id FROM personas WHERE nombre = ?", (nombre,))
-        return self.cursor.fetchone()
+    def reconocer_rostros(self, frame, boxes, confidence_threshold=80):
+        """
+        Reconoce en lote todos los rostros de un frame: una sola conversión a gris,
+        recorte y redimensionado de cada caja y predicción en paralelo.
 
-    def obtener_todas_personas(self):
-        self.cursor.execute("SELECT nombre, habilitado, fecha_registro, carnet_id FROM personas")
-        return self.cursor.fetchall()
+        Args:
+            frame: Frame completo (BGR o escala de grises)
+            boxes: Cajas (x, y, w, h) de los rostros en coordenadas del frame
+            confidence_threshold: Distancia máxima para aceptar una coincidencia
 
-    def verificar_fechas_expiracion(self):
-        self.cursor.execute("SELECT id, fecha_registro, expirado FROM personas WHERE habilitado = 1")
-        filas = self.cursor.fetchall()
-        hoy = datetime.now()
-        for persona_id, fecha_str, expirado in filas:
-            if fecha_str:
-                fecha_registro = datetime.strptime(fecha_str, "%Y-%m-%d")
-                if (hoy - fecha_registro).days >= 30 and not expirado:
-                    self.cursor.execute(
-                        "UPDATE personas SET habilitado = 0, expirado = 1 WHERE id = ?",
-                        (persona_id,)
-                    )
-        self.com.commit()
+        Returns:
+            Tupla (ids, distancias, tiempos) con un id (o None) y una distancia por caja,
+            y un diccionario con los tiempos en ms de preparación, predicción y total
+        """
+        inicio = time.perf_counter()
+        ids = [None] * len(boxes)
+        distancias = [0] * len(boxes)
+        tiempos = {"preparacion_ms": 0.0, "prediccion_ms": 0.0, "total_ms": 0.0}
+        if not self.trained or len(boxes) == 0:
+            return ids, distancias, tiempos
 
-    def obtener_todas_personas_con_id(self):
-        """Obtiene todos los registros de personas incluyendo su ID"""
-        self.cursor.execute("SELECT id, nombre, habilitado, fecha_registro, carnet_id FROM personas")
-        return self.cursor.fetchall()
+        # Una sola conversión a gris, limitada al rectángulo que contiene todas las cajas
+        alto, ancho = frame.shape[:2]
+        cajas = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        x0s, y0s = np.clip(cajas[:, 0], 0, ancho), np.clip(cajas[:, 1], 0, alto)
+        x1s, y1s = np.clip(cajas[:, 0] + cajas[:, 2], 0, ancho), np.clip(cajas[:, 1] + cajas[:, 3], 0, alto)
+        # Las cajas vacías o fuera del frame se quedan con None
+        validas = np.flatnonzero((x1s > x0s) & (y1s > y0s))
+        if len(validas) == 0:
+            return ids, distancias, tiempos
+        ox, oy = int(x0s[validas].min()), int(y0s[validas].min())
+        region = frame[oy:int(y1s[validas].max()), ox:int(x1s[validas].max())]
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY) if len(region.shape) > 2 else region
 
-    def registrar_rostro_con_carnet(self, nombre, face_img, carnet_id=""):
-        """Registra un nuevo rostro en la BD con carnet"""
-        fecha_registro = datetime.now().strftime("%Y-%m-%d")
+        rostros = []
+        for indice in validas:
+            x0, y0, x1, y1 = x0s[indice], y0s[indice], x1s[indice], y1s[indice]
+            recorte = gray[y0 - oy:y1 - oy, x0 - ox:x1 - ox]
+            rostros.append((int(indice), cv2.resize(recorte, TAMANO_ROSTRO)))
+        preparado = time.perf_counter()
 
-        # Insertar datos de la persona
-        self.cursor.execute(
-            "INSERT INTO personas (nombre, fecha_registro, carnet_id) VALUES (?, ?, ?)",
-            (nombre, fecha_registro, carnet_id)
-        )
+        predicciones = self._predecir_lote([rostro for _, rostro in rostros])
 
-        # Obtener ID de la persona recién insertada
-        persona_id = self.cursor.lastrowid
+        for (indice, _), (label, distancia) in zip(rostros, predicciones):
+            if label is None or distancia >= confidence_threshold:
+                continue
+            ids[indice] = int(label)
+            distancias[indice] = distancia
 
-        # Procesar y guardar la imagen
-        if len(face_img.shape) > 2:
-            face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
-        face_resized = cv2.resize(face_img, (100, 100))
-        encoding = np.array(face_resized, dtype=np.float64).flatten()
+        fin = time.perf_counter()
+        tiempos["preparacion_ms"] = (preparado - inicio) * 1000
+        tiempos["prediccion_ms"] = (fin - preparado) * 1000
+        tiempos["total_ms"] = (fin - inicio) * 1000
+        return ids, distancias, tiempos
+
+    def _predecir_lote(self, rostros):
+        """
+        Predice en paralelo una lista de rostros 100x100 ya preparados.
+
+        Returns:
+            Lista de (etiqueta, distancia); etiqueta es None si falló o es una lápida
+        """
+        def predecir(rostro):
+            try:
+                return self.recognizer.predict(rostro)
+            except Exception as e:
+                print(f"Error en reconocimiento: {e}")
+                return None, 0
+
+        # Mantener la lectura durante todo el lote: los hilos del pool solo leen el modelo
+        # y así ningún update()/reentrenamiento lo modifica mientras tanto
+        with self.lock.lectura():
+            if not self.trained or not rostros:
+                return [(None, 0)] * len(rostros)
+            if len(rostros) == 1:
+                predicciones = [predecir(rostros[0])]
+            else:
+                predicciones = list(self._obtener_pool().map(predecir, rostros))
+            eliminadas = set(self.etiquetas_eliminadas)
+
+        return [(None, 0) if label is None or label in eliminadas else (int(label), distancia)
+                for label, distancia in predicciones]
 
-        # Insertar encoding en la tabla de imágenes
-        self.cursor.execute(
-            "INSERT INTO imagenes_personas (persona_id, encoding) VALUES (?, ?)",
-            (persona_id, encoding.tobytes())
+    def reconocer_lote(self, face_images, confidence_threshold=80):
+        """
+        Reconoce en una sola pasada rostros sueltos, que pueden venir de frames o
+        clientes distintos.
+
+        Args:
+            face_images: Recortes de rostro (BGR o escala de grises, cualquier tamaño)
+            confidence_threshold: Distancia máxima para aceptar una coincidencia
+
+        Returns:
+            Lista de (persona_id, distancia) por rostro; persona_id es None si no se reconoce
+        """
+        rostros = [self._preparar_rostro(face_img) for face_img in face_images]
+        return [(persona_id, distancia) if persona_id is not None and distancia < confidence_threshold
+                else (None, distancia)
+                for persona_id, distancia in self._predecir_lote(rostros)]
+
+    def buscar_duplicados(self, face_images, confidence_threshold=80, maximo=3):
+        """
+        Comprueba si las muestras capturadas para un registro ya pertenecen a alguien,
+        prediciéndolas todas en un solo lote con el modelo actual.
+
+        Args:
+            face_images: Rostros capturados (BGR o escala de grises)
+            confidence_threshold: Distancia máxima para considerar una coincidencia
+            maximo: Número máximo de personas a devolver
+
+        Returns:
+            Lista de diccionarios {persona_id, nombre, muestras, distancia, distancia_media}
+            ordenada por número de muestras coincidentes y después por distancia, o None
+            si hay muestras en la BD pero no hay un modelo con el que compararlas
+        """
+        # Al arrancar el modelo puede estar entrenándose todavía: sin él no hay coincidencias
+        self._esperar_entrenamiento()
+        if not self.trained:
+            hay_muestras = self._consultar("SELECT EXISTS(SELECT 1 FROM imagenes_personas)")[0][0]
+            return None if hay_muestras else []
+
+        rostros = [self._preparar_rostro(face_img) for face_img in face_images]
+        coincidencias = {}
+        for persona_id, distancia in self._predecir_lote(rostros):
+            if persona_id is None or distancia >= confidence_threshold:
+                continue
+            coincidencias.setdefault(persona_id, []).append(distancia)
+
+        candidatos = []
+        for persona_id, distancias in coincidencias.items():
+            info = self.cache_personas.obtener(persona_id)
+            if info is None:
+                continue
+            candidatos.append({
+                "persona_id": persona_id,
+                "nombre": info.nombre,
+                "muestras": len(distancias),
+                "distancia": min(distancias),
+                "distancia_media": sum(distancias) / len(distancias),
+            })
+        candidatos.sort(key=lambda c: (-c["muestras"], c["distancia"]))
+        return candidatos[:maximo]
+
+    def _obtener_pool(self):
+        if self._pool_reconocimiento is None:
+            with self._lock_pool:
+                if self._pool_reconocimiento is None:
+                    self._pool_reconocimiento = ThreadPoolExecutor(
+                        max_workers=self.hilos_reconocimiento, thread_name_prefix="reconocimiento")
+        return self._pool_reconocimiento
+
+    def _consultar(self, sql, parametros=()):
+        """Ejecuta una consulta de lectura; segura desde otros hilos"""
+        return self.repo.consultar(sql, parametros)
+
+    def obtener_info_persona(self, persona_id):
+        """Devuelve (habilitado, fecha_registro, carnet_id) de la persona o None"""
+        filas = self._consultar(
+            "SELECT habilitado, fecha_registro, carnet_id FROM personas WHERE id = ?", (int(persona_id),))
+        return filas[0] if filas else None
+
+    def buscar_ids_por_nombre(self, nombre):
+        """Devuelve los ids de las personas con el nombre indicado (puede haber homónimos)"""
+        filas = self._consultar("SELECT id FROM personas WHERE nombre = ? ORDER BY id", (nombre,))
+        return [fila[0] for fila in filas]
+
+    def habilitar_persona(self, persona_id):
+        """Habilita el acceso de una persona y limpia la marca de expiración"""
+        self.repo.ejecutar("UPDATE personas SET habilitado = 1, expirado = 0 WHERE id = ?", (int(persona_id),))
+        self.cache_personas.invalidar(persona_id)
+
+    def deshabilitar_persona(self, persona_id):
+        """Deshabilita el acceso de una persona"""
+        self.repo.ejecutar("UPDATE personas SET habilitado = 0 WHERE id = ?", (int(persona_id),))
+        self.cache_personas.invalidar(persona_id)
+
+    def actualizar_fecha_registro(self, persona_id, fecha_registro):
+        """
+        Cambia la fecha de referencia de la suscripción (fecha_registro, en formato
+        %Y-%m-%d) y reactiva el acceso
+        """
+        self.repo.ejecutar(
+            "UPDATE personas SET fecha_registro = ?, habilitado = 1, expirado = 0 WHERE id = ?",
+            (fecha_registro, int(persona_id))
         )
+        self.cache_personas.invalidar(persona_id)
+
+    def obtener_todas_personas(self):
+        return self.repo.consultar("SELECT nombre, habilitado, fecha_registro, carnet_id FROM personas")
+
+    def verificar_fechas_expiracion(self):
+        """Expira las suscripciones vencidas y devuelve cuántas personas se deshabilitaron"""
+        expirados = self.repo.escribir(expirar_suscripciones)
+        if expirados:
+            self.cache_personas.invalidar()
+        return expirados
 
-        self.com.commit()
-        # Reentrenar el modelo con el nuevo rostro
-        self.entrenar_modelo()
+    def obtener_todas_personas_con_id(self):
+        """Obtiene todos los registros de personas incluyendo su ID"""
+        return self.repo.consultar("SELECT id, nombre, habilitado, fecha_registro, carnet_id FROM personas")
+
+    def registrar_rostro_con_carnet(self, nombre, face_img, carnet_id=""):
+        """Registra un nuevo rostro en la BD con carnet"""
+        return self.registrar_rostro_multiple(nombre, [face_img], carnet_id)
 
     def actualizar_persona(self, id_persona, nombre, carnet_id=""):
         """Actualiza la información de una persona"""
-        self.cursor.execute(
+        id_persona = int(id_persona)
+        self.repo.ejecutar(
             "UPDATE personas SET nombre = ?, carnet_id = ? WHERE id = ?",
             (nombre, carnet_id, id_persona)
         )
-        self.com.commit()
-        # Actualizar el modelo si cambió el nombre
-        self.entrenar_modelo()
+        # El modelo se etiqueta por id, así que un cambio de nombre no lo afecta
+        self.cache_personas.invalidar(id_persona)
 
     def eliminar_persona(self, id_persona):
         """
         Elimina a una persona de la base de datos y todas sus imágenes asociadas
         """
-        # Primero eliminamos todas las imágenes asociadas a la persona
-        self.cursor.execute("DELETE FROM imagenes_personas WHERE persona_id = ?", (id_persona,))
+        id_persona = int(id_persona)
+
+        def eliminar(com):
+            # Primero eliminamos todas las imágenes asociadas a la persona
+            com.execute("DELETE FROM imagenes_personas WHERE persona_id = ?", (id_persona,))
+            # Luego eliminamos el registro de la persona
+            com.execute("DELETE FROM personas WHERE id = ?", (id_persona,))
+
+        self.repo.escribir(eliminar)
+        self.cache_personas.invalidar(id_persona)
+        self.galeria_histogramas.quitar(id_persona)
+
+        # Marcar sus muestras como obsoletas en el modelo
+        self._eliminar_del_modelo(id_persona)
+
+    def planificar_compactacion(self, k=5):
+        """
+        Decide, para cada persona con más de k muestras, qué k muestras diversas
+        conservar (ver lbp.seleccionar_representativas) sin modificar la BD.
+
+        Returns:
+            Diccionario con "eliminar" (ids de imagenes_personas), "personas" compactadas,
+            "muestras_antes", "muestras_despues", "bytes_antes" y "bytes_eliminados"
+        """
+        plan = {"eliminar": [], "personas": 0, "muestras_antes": 0, "muestras_despues": 0,
+                "bytes_antes": 0, "bytes_eliminados": 0}
+        cursor = self.repo.cursor()
+        personas = cursor.execute(
+            "SELECT persona_id, COUNT(*) FROM imagenes_personas GROUP BY persona_id").fetchall()
+        for persona_id, cantidad in personas:
+            filas = cursor.execute(
+                f"SELECT id, encoding, {self.columna_formato} FROM imagenes_personas WHERE persona_id = ? ORDER BY id",
+                (persona_id,)).fetchall()
+            plan["muestras_antes"] += len(filas)
+            plan["bytes_antes"] += sum(len(encoding) for _, encoding, _ in filas)
+            if cantidad <= k:
+                plan["muestras_despues"] += len(filas)
+                continue
+
+            validas = []
+            imagenes = []
+            for imagen_id, encoding, formato in filas:
+                imagen = decodificar_rostro(encoding, formato)
+                if imagen is not None:
+                    validas.append((imagen_id, len(encoding)))
+                    imagenes.append(imagen)
+            conservar = set(seleccionar_representativas(histogramas_lbp(np.stack(imagenes)), k).tolist()) \
+                if imagenes else set()
+
+            # Las filas que no se pueden decodificar tampoco aportan nada al modelo
+            ids_validos = {imagen_id for imagen_id, _ in validas}
+            for imagen_id, encoding, _ in filas:
+                if imagen_id not in ids_validos:
+                    plan["eliminar"].append(imagen_id)
+                    plan["bytes_eliminados"] += len(encoding)
+            for indice, (imagen_id, tamano) in enumerate(validas):
+                if indice not in conservar:
+                    plan["eliminar"].append(imagen_id)
+                    plan["bytes_eliminados"] += tamano
+            plan["muestras_despues"] += len(conservar)
+            plan["personas"] += 1
+        return plan
+
+    def aplicar_compactacion(self, plan, lote=500):
+        """Borra las muestras indicadas por planificar_compactacion y reentrena el modelo"""
+        eliminar = plan["eliminar"]
 
-        # Luego eliminamos el registro de la persona
-        self.cursor.execute("DELETE FROM personas WHERE id = ?", (id_persona,))
+        def borrar(com):
+            for inicio in range(0, len(eliminar), lote):
+                bloque = eliminar[inicio:inicio + lote]
+                com.execute(f"DELETE FROM imagenes_personas WHERE id IN ({','.join('?' * len(bloque))})", bloque)
+
+        self.repo.escribir(borrar)
+        if eliminar:
+            self.galeria_histogramas.invalidar()
+            self.entrenar_modelo()
+        return len(eliminar)
+
+    def migrar_formato_rostros(self, formato=FORMATO_POR_DEFECTO, lote=500):
+        """
+        Recodifica todas las muestras de imagenes_personas al formato indicado.
+        Procesa las filas por lotes para no cargar toda la galería en memoria.
+
+        Returns:
+            Tupla (filas_migradas, bytes_antes, bytes_despues)
+        """
+        filas_migradas = 0
+        bytes_antes = 0
+        bytes_despues = 0
+        ultimo_id = 0
+
+        while True:
+            filas = self.repo.consultar(
+                "SELECT id, encoding, formato FROM imagenes_personas "
+                "WHERE formato != ? AND id > ? ORDER BY id LIMIT ?",
+                (formato, ultimo_id, lote)
+            )
+            if not filas:
+                break
+
+            cambios = []
+            for id_imagen, blob, formato_actual in filas:
+                ultimo_id = id_imagen
+                face_img = decodificar_rostro(blob, formato_actual)
+                if face_img is None:
+                    print(f"Muestra {id_imagen} con tamaño inválido, se omite")
+                    continue
+                nuevo_blob = codificar_rostro(face_img, formato)
+                cambios.append((nuevo_blob, formato, id_imagen))
+                filas_migradas += 1
+                bytes_antes += len(blob)
+                bytes_despues += len(nuevo_blob)
 
-        # Confirmar los cambios
-        self.com.commit()
+            # Un lote por transacción
+            self.repo.escribir(lambda com: com.executemany(
+                "UPDATE imagenes_personas SET encoding = ?, formato = ? WHERE id = ?", cambios))
 
-        # Reentrenar el modelo
-        self.entrenar_modelo()
+        return filas_migradas, bytes_antes, bytes_despues
 
     def cerrar(self):
-        self.com.close()
\ No newline at end of file
+        # Persistir el modelo si cambió desde que se cargó, para el próximo arranque
+        if self.modelo_modificado and not self.solo_lectura:
+            self.guardar_modelo()
+        with self._lock_pool:
+            pool, self._pool_reconocimiento = self._pool_reconocimiento, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        self.repo.cerrar()
\ No newline at end of file
@@ -0,0 +1,119 @@
+import time
+
+from camara import CameraSource, interpretar_fuente
+from pipeline import PipelineReconocimiento
+
+
+class FuenteCamara:
+    """Una fuente del motor: su CameraSource, su pipeline y lo ya entregado de ella"""
+
+    def __init__(self, indice, fuente, camara, pipeline):
+        self.indice = indice
+        self.fuente = fuente
+        self.camara = camara
+        self.pipeline = pipeline
+        self.entregados = 0  # Resultados recogidos por obtener_resultados
+        self.inicio = None
+
+
+class MotorMulticamara:
+    """
+    Reconocimiento sobre varias fuentes a la vez (índices de cámara, archivos de
+    video o URLs de streams). Cada fuente tiene su propio hilo de captura y su propio
+    PipelineReconocimiento, con un clasificador de detección propio, de modo que una
+    cámara lenta o caída no frena a las demás. Todas comparten el mismo FaceAppLogic:
+    un único modelo, que los pipelines solo leen (las predicciones de varias cámaras
+    no se esperan entre sí), y una única caché de personas.
+    """
+
+    def __init__(self, logic, fuentes, renderizar=None, tiempo_real=True, repetir=True, **opciones_pipeline):
+        """
+        Args:
+            logic: Instancia de FaceAppLogic compartida por todas las fuentes
+            fuentes: Lista de índices, rutas o URLs (los textos numéricos se toman como índices)
+            renderizar: Función (frame, rostros) -> imagen, ejecutada en el hilo de render de cada fuente
+            tiempo_real: Reproducir los archivos a su velocidad original
+            repetir: Volver a empezar los archivos al terminar
+            opciones_pipeline: Argumentos adicionales de PipelineReconocimiento
+        """
+        self.logic = logic
+        self.fuentes = []
+        for indice, fuente in enumerate(fuentes):
+            fuente = interpretar_fuente(fuente)
+            # Sin alternar: con varias cámaras una caída no debe quedarse con el dispositivo de otra
+            camara = CameraSource(fuente, tiempo_real=tiempo_real, repetir=repetir,
+                                  alternar=len(fuentes) == 1)
+            pipeline = PipelineReconocimiento(logic, camara, renderizar, nombre=f"fuente{indice}",
+                                              **opciones_pipeline)
+            self.fuentes.append(FuenteCamara(indice, fuente, camara, pipeline))
+
+    def iniciar(self):
+        ahora = time.perf_counter()
+        for fuente in self.fuentes:
+            fuente.inicio = ahora
+            fuente.camara.iniciar()
+            fuente.pipeline.iniciar()
+
+    def detener(self):
+        for fuente in self.fuentes:
+            fuente.pipeline.detener()
+        for fuente in self.fuentes:
+            fuente.camara.detener()
+
+    @property
+    def terminado(self):
+        """True cuando todas las fuentes son archivos sin repetición que ya terminaron"""
+        return all(fuente.camara.terminado for fuente in self.fuentes)
+
+    def obtener_resultados(self):
+        """
+        Returns:
+            Lista de (FuenteCamara, resultado) con el último resultado nuevo de cada
+            fuente desde la llamada anterior; el resultado es el de
+            PipelineReconocimiento.obtener_resultado
+        """
+        resultados = []
+        for fuente in self.fuentes:
+            resultado = fuente.pipeline.obtener_resultado()
+            if resultado is not None:
+                fuente.entregados += 1
+                resultados.append((fuente, resultado))
+        return resultados
+
+    @property
+    def frames_procesados(self):
+        """Frames que completaron el pipeline entre todas las fuentes"""
+        return sum(fuente.pipeline.frames_procesados for fuente in self.fuentes)
+
+    def estadisticas(self):
+        """
+        Estado, FPS por etapa, FPS sostenido y frames perdidos de cada fuente. Los
+        frames y el FPS sostenido cuentan los frames que terminaron el render, no
+        solo los que se llegaron a recoger con obtener_resultados.
+        """
+        ahora = time.perf_counter()
+        estadisticas = []
+        for fuente in self.fuentes:
+            pipeline = fuente.pipeline
+            procesados = pipeline.frames_procesados
+            # Un video terminado no cuenta el tiempo posterior a su último frame
+            ultimo = pipeline.ultimo_procesado
+            fin = ultimo if fuente.camara.terminado and ultimo else ahora
+            segundos = fin - fuente.inicio if fuente.inicio is not None else 0.0
+            estadisticas.append({
+                "fuente": fuente.indice,
+                "origen": str(fuente.fuente),
+                "estado": fuente.camara.estado,
+                "conectada": fuente.camara.conectada,
+                "frames": procesados,
+                "entregados": fuente.entregados,
+                "fps_sostenido": round(procesados / segundos, 2) if segundos > 0 else 0.0,
+                "fps_etapas": {etapa: round(pipeline.fps[etapa].fps, 1) for etapa in pipeline.ETAPAS},
+                "descartados": pipeline.descartados(),
+            })
+        return estadisticas
+
+    def resumen_fps(self):
+        """Una línea por fuente con sus FPS por etapa"""
+        return "\n".join(f"[{fuente.indice}] {fuente.fuente}: {fuente.pipeline.resumen_fps()}"
+                         for fuente in self.fuentes)
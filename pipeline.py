@@ -0,0 +1,251 @@
+import queue
+import threading
+import time
+
+import cv2
+
+from deteccion import ESCALA_DETECCION, detectar_rostros
+from seguimiento import SeguidorRostros
+
+
+class ColaDescartable:
+    """Cola acotada que descarta el elemento más antiguo cuando está llena"""
+
+    def __init__(self, capacidad=2):
+        self._cola = queue.Queue(maxsize=capacidad)
+        self.descartados = 0
+
+    def put(self, item):
+        while True:
+            try:
+                self._cola.put_nowait(item)
+                return
+            except queue.Full:
+                # Quitar el elemento más antiguo para dejar sitio al más reciente
+                try:
+                    self._cola.get_nowait()
+                    self.descartados += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=0.1):
+        """Devuelve el siguiente elemento o None si no llegó ninguno a tiempo"""
+        try:
+            return self._cola.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class MedidorFPS:
+    """Mide la frecuencia de una etapa con un promedio exponencial"""
+
+    def __init__(self, suavizado=0.1):
+        self.suavizado = suavizado
+        self.fps = 0.0
+        self._ultimo = None
+
+    def marcar(self):
+        ahora = time.perf_counter()
+        if self._ultimo is not None:
+            intervalo = ahora - self._ultimo
+            if intervalo > 0:
+                instantaneo = 1.0 / intervalo
+                if self.fps == 0.0:
+                    self.fps = instantaneo
+                else:
+                    self.fps += self.suavizado * (instantaneo - self.fps)
+        self._ultimo = ahora
+
+
+class PipelineReconocimiento:
+    """
+    Pipeline captura -> detección -> reconocimiento -> render en hilos separados.
+    Cada etapa se comunica con la siguiente mediante colas acotadas que descartan
+    el frame más antiguo, así una etapa lenta no acumula retraso. El hilo de la
+    interfaz solo consulta el último resultado terminado con obtener_resultado().
+    Entre detecciones los rostros se siguen con SeguidorRostros y solo se reconocen
+    las pistas nuevas o las que toca reverificar.
+    """
+
+    ETAPAS = ("captura", "deteccion", "reconocimiento", "render")
+
+    def __init__(self, logic, camara, renderizar=None, capacidad_colas=2,
+                 intervalo_deteccion=5, intervalo_verificacion=15,
+                 escala_deteccion=ESCALA_DETECCION, usar_roi=False, nombre="pipeline"):
+        """
+        Args:
+            logic: Instancia de FaceAppLogic (reconocedor y consultas de personas)
+            camara: CameraSource de la que se toman los frames
+            renderizar: Función (frame, rostros) -> imagen final; se ejecuta en el hilo de render
+            capacidad_colas: Tamaño máximo de cada cola entre etapas
+            intervalo_deteccion: Ejecutar el detector cada N frames y seguir los rostros entre medias
+            intervalo_verificacion: Reconocer de nuevo cada pista tras N frames con el mismo resultado
+            escala_deteccion: Escala a la que se reduce el frame antes de pasar el detector
+            usar_roi: Alternar detecciones completas con detecciones solo alrededor de las pistas
+            nombre: Prefijo de los hilos (distingue los pipelines de varias cámaras)
+        """
+        self.logic = logic
+        self.camara = camara
+        self.renderizar = renderizar or (lambda frame, rostros: frame)
+
+        # Clasificador propio: detectMultiScale no es seguro entre hilos con la misma instancia
+        self.face_cascade = cv2.CascadeClassifier(logic.ruta_cascada)
+        self.escala_deteccion = escala_deteccion
+        self.seguidor = SeguidorRostros(self._detectar, intervalo_deteccion, intervalo_verificacion,
+                                        usar_roi=usar_roi)
+
+        self.cola_deteccion = ColaDescartable(capacidad_colas)
+        self.cola_reconocimiento = ColaDescartable(capacidad_colas)
+        self.cola_render = ColaDescartable(capacidad_colas)
+
+        self.fps = {etapa: MedidorFPS() for etapa in self.ETAPAS}
+        self.nombre = nombre
+        # Frames que la cámara publicó y la etapa de captura no llegó a ver
+        self.perdidos_captura = 0
+
+        self._resultado = None
+        self._secuencia = 0  # Frames que terminaron el render, se consulten o no
+        self._secuencia_entregada = 0
+        self.ultimo_procesado = None  # Momento en que terminó el último frame
+        self._lock_resultado = threading.Lock()
+
+        self._detener = threading.Event()
+        self._hilos = []
+
+    def iniciar(self):
+        self._detener.clear()
+        objetivos = (self._etapa_captura, self._etapa_deteccion,
+                     self._etapa_reconocimiento, self._etapa_render)
+        for etapa, objetivo in zip(self.ETAPAS, objetivos):
+            hilo = threading.Thread(target=objetivo, name=f"{self.nombre}-{etapa}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def detener(self):
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join(timeout=1.0)
+        self._hilos = []
+
+    def obtener_resultado(self):
+        """Devuelve el último resultado terminado si es nuevo desde la última llamada, o None"""
+        with self._lock_resultado:
+            if self._resultado is None or self._secuencia == self._secuencia_entregada:
+                return None
+            self._secuencia_entregada = self._secuencia
+            return self._resultado
+
+    @property
+    def frames_procesados(self):
+        """Frames que completaron todas las etapas, aunque nadie recogiera su resultado"""
+        return self._secuencia
+
+    def descartados(self):
+        """Frames perdidos por etapa: no leídos de la cámara o descartados en cada cola"""
+        return {
+            "captura": self.perdidos_captura,
+            "deteccion": self.cola_deteccion.descartados,
+            "reconocimiento": self.cola_reconocimiento.descartados,
+            "render": self.cola_render.descartados,
+        }
+
+    def resumen_fps(self):
+        """Texto con los FPS de cada etapa para la barra de estado"""
+        return " | ".join(f"{etapa.capitalize()}: {self.fps[etapa].fps:.1f}" for etapa in self.ETAPAS)
+
+    def _etapa_captura(self):
+        ultima_secuencia = 0
+        while not self._detener.is_set():
+            # La reconexión la gestiona CameraSource; aquí solo se esperan frames nuevos
+            frame, secuencia, _ = self.camara.esperar_frame(ultima_secuencia, timeout=0.5)
+            if frame is None:
+                continue
+            if ultima_secuencia:
+                self.perdidos_captura += secuencia - ultima_secuencia - 1
+            ultima_secuencia = secuencia
+
+            self.fps["captura"].marcar()
+            self.cola_deteccion.put(frame)
+
+    def _detectar(self, gray, roi=None):
+        return detectar_rostros(self.face_cascade, gray, self.escala_deteccion, roi)
+
+    def _etapa_deteccion(self):
+        while not self._detener.is_set():
+            frame = self.cola_deteccion.get()
+            if frame is None:
+                continue
+            try:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                # Detecta cada intervalo_deteccion frames y sigue las pistas en el resto
+                pistas = self.seguidor.procesar(gray)
+            except Exception as e:
+                print(f"Error en detectMultiScale: {e}")
+                self.seguidor.reiniciar()
+                pistas = []
+            self.fps["deteccion"].marcar()
+            self.cola_reconocimiento.put((frame, pistas))
+
+    def _etapa_reconocimiento(self):
+        while not self._detener.is_set():
+            item = self.cola_reconocimiento.get()
+            if item is None:
+                continue
+            frame, pistas = item
+
+            # Reutilizar el resultado de cada pista salvo que sea nueva o toque reverificarla;
+            # las pendientes se reconocen todas juntas en un solo lote
+            resultados = {pista_id: self.seguidor.resultado(pista_id) for pista_id, _ in pistas}
+            pendientes = [(pista_id, caja) for pista_id, caja in pistas if resultados[pista_id] is None]
+            if pendientes:
+                try:
+                    ids, distancias, _ = self.logic.reconocer_rostros(frame, [caja for _, caja in pendientes])
+                except Exception as e:
+                    print(f"Error procesando rostros: {e}")
+                    ids, distancias = [None] * len(pendientes), [0] * len(pendientes)
+                for (pista_id, _), persona_id, distancia in zip(pendientes, ids, distancias):
+                    self.seguidor.registrar_resultado(pista_id, persona_id, distancia)
+                    resultados[pista_id] = (persona_id, distancia)
+
+            rostros = []
+            for pista_id, (x, y, w, h) in pistas:
+                face_roi = frame[y:y + h, x:x + w]
+                if face_roi.size == 0:
+                    continue
+                try:
+                    persona_id, confianza = resultados[pista_id]
+                    info = None
+                    if persona_id is not None:
+                        # Estado desde la caché en memoria por clave primaria: el bucle no consulta la BD
+                        info = self.logic.cache_personas.obtener(persona_id)
+                except Exception as e:
+                    print(f"Error procesando rostro: {e}")
+                    continue
+                rostros.append({
+                    "caja": (int(x), int(y), int(w), int(h)),
+                    "pista": pista_id,
+                    "persona_id": persona_id if info else None,
+                    "nombre": info.nombre if info else "Desconocido",
+                    "confianza": confianza,
+                    "info": info,
+                    "rostro": face_roi,
+                })
+            self.fps["reconocimiento"].marcar()
+            self.cola_render.put((frame, rostros))
+
+    def _etapa_render(self):
+        while not self._detener.is_set():
+            item = self.cola_render.get()
+            if item is None:
+                continue
+            frame, rostros = item
+            try:
+                imagen = self.renderizar(frame, rostros)
+            except Exception as e:
+                print(f"Error al renderizar frame: {e}")
+                continue
+            self.fps["render"].marcar()
+            with self._lock_resultado:
+                self._secuencia += 1
+                self.ultimo_procesado = time.perf_counter()
+                self._resultado = {"imagen": imagen, "rostros": rostros, "frame": frame}
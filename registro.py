@@ -0,0 +1,49 @@
+from tkinter import messagebox
+
+
+def registrar_o_fusionar(parent, logic, nombre, imagenes, carnet_id=""):
+    """
+    Registra las muestras capturadas comprobando antes si el rostro ya pertenece a
+    una persona registrada. Si hay coincidencias ofrece añadir las muestras a esa
+    persona en lugar de crear una identidad duplicada.
+
+    Args:
+        parent: Ventana sobre la que se muestran los diálogos
+        logic: Instancia de FaceAppLogic
+        nombre: Nombre introducido para el nuevo registro
+        imagenes: Rostros capturados
+        carnet_id: Carnet del nuevo registro
+
+    Returns:
+        Mensaje de éxito, o None si el usuario canceló
+    """
+    candidatos = logic.buscar_duplicados(imagenes)
+    if candidatos is None:
+        # El modelo no está disponible (p. ej. falló el entrenamiento): avisar en lugar de callar
+        if not messagebox.askokcancel(
+                "Comprobación de duplicados no disponible",
+                "No se pudo comprobar si el rostro ya pertenece a una persona registrada "
+                "porque el modelo de reconocimiento no está entrenado.\n\n"
+                f"¿Registrar igualmente a {nombre} como una persona nueva?",
+                parent=parent):
+            return None
+    elif candidatos:
+        mejor = candidatos[0]
+        lineas = [f"• {c['nombre']} (id {c['persona_id']}): {c['muestras']}/{len(imagenes)} muestras, "
+                  f"distancia {c['distancia']:.1f}" for c in candidatos]
+        respuesta = messagebox.askyesnocancel(
+            "Posible registro duplicado",
+            "El rostro capturado se parece a personas ya registradas:\n\n"
+            + "\n".join(lineas)
+            + f"\n\n¿Añadir las muestras a {mejor['nombre']} (id {mejor['persona_id']})?\n"
+              f"Sí: fusionar con el registro existente\n"
+              f"No: crear igualmente un registro nuevo para {nombre}",
+            parent=parent)
+        if respuesta is None:
+            return None
+        if respuesta:
+            logic.agregar_muestras(mejor["persona_id"], imagenes)
+            return f"{len(imagenes)} imágenes añadidas al registro existente de {mejor['nombre']}."
+
+    logic.registrar_rostro_multiple(nombre, imagenes, carnet_id)
+    return f"{len(imagenes)} imágenes del rostro de {nombre} registradas correctamente."
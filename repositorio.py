@@ -0,0 +1,154 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from urllib.parse import quote
+
+from esquema import PRAGMAS, configurar_conexion
+
+
+class RepositorioSQLite:
+    """
+    Acceso a la base de datos seguro entre hilos. Cada hilo lee con su propia
+    conexión de solo lectura (en modo WAL las lecturas no esperan a las escrituras)
+    y todas las escrituras se encolan a un único hilo escritor, que es el dueño de
+    la única conexión con permiso de escritura. escribir() espera a que la
+    transacción se confirme, así que una lectura posterior desde cualquier hilo ya
+    ve los cambios.
+
+    En modo solo lectura no hay hilo escritor: el archivo no se crea ni se pasa a
+    WAL, y escribir() lanza sqlite3.OperationalError.
+    """
+
+    def __init__(self, db_path, timeout=5, solo_lectura=False):
+        """
+        Args:
+            db_path: Ruta del archivo de la base de datos (se crea si no existe)
+            timeout: Segundos que una conexión espera a un bloqueo de otro proceso
+            solo_lectura: Abrir solo conexiones de lectura (el archivo debe existir)
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lecturas = []  # Todas las conexiones de lectura abiertas, para cerrarlas
+        self._lock_lecturas = threading.Lock()
+        self._cola = queue.Queue()
+        self._com_escritura = None
+        self._com_version = None  # Conexión dedicada a PRAGMA data_version
+        self._lock_version = threading.Lock()
+        self.solo_lectura = solo_lectura
+        self._escritor = None
+        if solo_lectura:
+            # Propaga aquí un error al abrir la base de datos
+            self.cursor()
+            return
+        self._listo = Future()
+        self._escritor = threading.Thread(target=self._bucle_escritor, name="sqlite-escritor", daemon=True)
+        self._escritor.start()
+        # Propaga aquí un error al abrir la base de datos
+        self._listo.result()
+
+    def _bucle_escritor(self):
+        try:
+            self._com_escritura = configurar_conexion(sqlite3.connect(self.db_path, timeout=self.timeout))
+        except Exception as e:
+            self._listo.set_exception(e)
+            return
+        self._listo.set_result(True)
+
+        while True:
+            tarea = self._cola.get()
+            if tarea is None:
+                break
+            funcion, futuro = tarea
+            if not futuro.set_running_or_notify_cancel():
+                continue
+            try:
+                resultado = funcion(self._com_escritura)
+                self._com_escritura.commit()
+            except BaseException as e:
+                self._com_escritura.rollback()
+                futuro.set_exception(e)
+            else:
+                futuro.set_result(resultado)
+        self._com_escritura.close()
+
+    def escribir(self, funcion):
+        """
+        Ejecuta funcion(com) en el hilo escritor dentro de una transacción, que se
+        confirma al terminar o se deshace si lanza una excepción.
+
+        Returns:
+            Lo que devuelva funcion
+        """
+        if self.solo_lectura:
+            raise sqlite3.OperationalError(f"{self.db_path} está abierta en solo lectura")
+        if threading.current_thread() is self._escritor:
+            # Llamada anidada desde otra escritura: ya estamos en la transacción
+            return funcion(self._com_escritura)
+        futuro = Future()
+        self._cola.put((funcion, futuro))
+        return futuro.result()
+
+    def ejecutar(self, sql, parametros=()):
+        """Escritura de una sola sentencia; devuelve (lastrowid, rowcount)"""
+        def sentencia(com):
+            cursor = com.execute(sql, parametros)
+            return cursor.lastrowid, cursor.rowcount
+        return self.escribir(sentencia)
+
+    def cursor(self):
+        """Cursor de la conexión de solo lectura del hilo actual"""
+        com = getattr(self._local, "com", None)
+        if com is None:
+            uri = f"file:{quote(self.db_path)}?mode=ro"
+            com = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False)
+            # journal_mode no se puede cambiar desde una conexión de solo lectura
+            for nombre, valor in PRAGMAS:
+                if nombre != "journal_mode":
+                    com.execute(f"PRAGMA {nombre} = {valor}")
+            self._local.com = com
+            with self._lock_lecturas:
+                self._lecturas.append(com)
+        return com.cursor()
+
+    def version_datos(self):
+        """
+        PRAGMA data_version de una conexión propia: cambia cada vez que otra conexión,
+        de este proceso o de otro, confirma una escritura. Sirve para detectar que otro
+        proceso (la interfaz de administración) modificó la base de datos.
+        """
+        with self._lock_version:
+            if self._com_version is None:
+                uri = f"file:{quote(self.db_path)}?mode=ro"
+                self._com_version = sqlite3.connect(uri, uri=True, timeout=self.timeout,
+                                                    check_same_thread=False)
+            return self._com_version.execute("PRAGMA data_version").fetchone()[0]
+
+    def consultar(self, sql, parametros=()):
+        """Ejecuta una consulta de lectura y devuelve todas las filas"""
+        return self.cursor().execute(sql, parametros).fetchall()
+
+    def liberar_hilo(self):
+        """Cierra la conexión de lectura del hilo actual (para hilos de corta vida)"""
+        com = getattr(self._local, "com", None)
+        if com is not None:
+            self._local.com = None
+            with self._lock_lecturas:
+                self._lecturas.remove(com)
+            com.close()
+
+    def cerrar(self):
+        """Termina las escrituras pendientes y cierra todas las conexiones"""
+        if self._escritor is not None and self._escritor.is_alive():
+            self._cola.put(None)
+            self._escritor.join()
+        with self._lock_lecturas:
+            for com in self._lecturas:
+                com.close()
+            self._lecturas.clear()
+        with self._lock_version:
+            if self._com_version is not None:
+                self._com_version.close()
+                self._com_version = None
+        self._local = threading.local()
@@ -0,0 +1,186 @@
+import threading
+
+import cv2
+
+from deteccion import roi_alrededor
+
+
+def calcular_iou(caja_a, caja_b):
+    """Intersección sobre unión de dos cajas (x, y, w, h)"""
+    ax, ay, aw, ah = caja_a
+    bx, by, bw, bh = caja_b
+    ancho = min(ax + aw, bx + bw) - max(ax, bx)
+    alto = min(ay + ah, by + bh) - max(ay, by)
+    if ancho <= 0 or alto <= 0:
+        return 0.0
+    interseccion = ancho * alto
+    return interseccion / float(aw * ah + bw * bh - interseccion)
+
+
+class Pista:
+    """Un rostro seguido entre frames junto con su último resultado de reconocimiento"""
+
+    def __init__(self, pista_id, caja, plantilla):
+        self.id = pista_id
+        self.caja = caja
+        self.plantilla = plantilla
+        self.reconocida = False
+        self.persona_id = None
+        self.confianza = 0
+        self.frames_sin_verificar = 0
+
+
+class SeguidorRostros:
+    """
+    Ejecuta la detección solo cada intervalo_deteccion frames y, entre detecciones,
+    sigue los rostros con template matching alrededor de su última posición. Cada
+    pista conserva su último reconocimiento para que reconocer_rostro solo se llame
+    con pistas nuevas o cada intervalo_verificacion frames para reverificar.
+
+    procesar() se llama desde el hilo de detección y resultado() /
+    registrar_resultado() desde el de reconocimiento; el estado se protege con un lock.
+    """
+
+    def __init__(self, detectar, intervalo_deteccion=5, intervalo_verificacion=15,
+                 umbral_iou=0.3, umbral_seguimiento=0.5, margen_busqueda=0.5, usar_roi=False):
+        """
+        Args:
+            detectar: Función (gray, roi) -> lista de cajas (x, y, w, h)
+            intervalo_deteccion: Cada cuántos frames se ejecuta el detector (1 = todos)
+            intervalo_verificacion: Frames reconocidos tras los que se vuelve a verificar una pista
+            umbral_iou: IoU mínimo para asociar una detección con una pista existente
+            umbral_seguimiento: Correlación mínima del template matching para no perder la pista
+            margen_busqueda: Margen alrededor de la caja (fracción de su tamaño) donde se busca el rostro
+            usar_roi: Si hay pistas, alternar detecciones en todo el frame con detecciones
+                solo alrededor de las pistas (las completas siguen encontrando rostros nuevos)
+        """
+        self.detectar = detectar
+        self.intervalo_deteccion = max(1, int(intervalo_deteccion))
+        self.intervalo_verificacion = max(1, int(intervalo_verificacion))
+        self.umbral_iou = umbral_iou
+        self.umbral_seguimiento = umbral_seguimiento
+        self.margen_busqueda = margen_busqueda
+        self.usar_roi = usar_roi
+
+        self.pistas = {}
+        self._siguiente_id = 1
+        self._frames = 0
+        self._detecciones = 0
+        self._lock = threading.Lock()
+
+    def procesar(self, gray):
+        """
+        Detecta o sigue los rostros del frame según corresponda.
+
+        Returns:
+            Lista de (pista_id, caja) de las pistas activas
+        """
+        detectar_ahora = self._frames % self.intervalo_deteccion == 0 or not self.pistas
+        self._frames += 1
+
+        if detectar_ahora:
+            roi = None
+            if self.usar_roi and self._detecciones % 2 == 1:
+                with self._lock:
+                    roi = roi_alrededor([pista.caja for pista in self.pistas.values()],
+                                        gray.shape, self.margen_busqueda)
+            self._detecciones += 1
+            cajas = [tuple(int(v) for v in caja) for caja in self.detectar(gray, roi)]
+            with self._lock:
+                self._asociar_detecciones(gray, cajas)
+        else:
+            with self._lock:
+                self._seguir(gray)
+
+        with self._lock:
+            return [(pista.id, pista.caja) for pista in self.pistas.values()]
+
+    def resultado(self, pista_id):
+        """
+        Devuelve (persona_id, confianza) guardado para la pista, o None si hay que
+        (re)conocerla porque es nueva o porque toca reverificarla
+        """
+        with self._lock:
+            pista = self.pistas.get(pista_id)
+            if pista is None or not pista.reconocida:
+                return None
+            pista.frames_sin_verificar += 1
+            if pista.frames_sin_verificar >= self.intervalo_verificacion:
+                return None
+            return pista.persona_id, pista.confianza
+
+    def registrar_resultado(self, pista_id, persona_id, confianza):
+        with self._lock:
+            pista = self.pistas.get(pista_id)
+            if pista is None:
+                return
+            pista.reconocida = True
+            pista.persona_id = persona_id
+            pista.confianza = confianza
+            pista.frames_sin_verificar = 0
+
+    def reiniciar(self):
+        with self._lock:
+            self.pistas = {}
+            self._frames = 0
+            self._detecciones = 0
+
+    def _recortar(self, gray, caja):
+        x, y, w, h = caja
+        return gray[y:y + h, x:x + w].copy()
+
+    def _asociar_detecciones(self, gray, cajas):
+        # Emparejar de forma voraz las detecciones con las pistas de mayor IoU
+        pares = sorted(
+            ((calcular_iou(pista.caja, caja), pista_id, indice)
+             for pista_id, pista in self.pistas.items()
+             for indice, caja in enumerate(cajas)),
+            reverse=True)
+
+        pistas_usadas = set()
+        cajas_usadas = set()
+        nuevas = {}
+        for iou, pista_id, indice in pares:
+            if iou < self.umbral_iou:
+                break
+            if pista_id in pistas_usadas or indice in cajas_usadas:
+                continue
+            pista = self.pistas[pista_id]
+            pista.caja = cajas[indice]
+            pista.plantilla = self._recortar(gray, pista.caja)
+            nuevas[pista_id] = pista
+            pistas_usadas.add(pista_id)
+            cajas_usadas.add(indice)
+
+        # Las detecciones sin pista abren una nueva; las pistas sin detección se descartan
+        for indice, caja in enumerate(cajas):
+            if indice in cajas_usadas:
+                continue
+            pista = Pista(self._siguiente_id, caja, self._recortar(gray, caja))
+            nuevas[pista.id] = pista
+            self._siguiente_id += 1
+
+        self.pistas = nuevas
+
+    def _seguir(self, gray):
+        alto_frame, ancho_frame = gray.shape[:2]
+        for pista_id in list(self.pistas):
+            pista = self.pistas[pista_id]
+            x, y, w, h = pista.caja
+            margen_x = int(w * self.margen_busqueda)
+            margen_y = int(h * self.margen_busqueda)
+            x0, y0 = max(0, x - margen_x), max(0, y - margen_y)
+            x1, y1 = min(ancho_frame, x + w + margen_x), min(alto_frame, y + h + margen_y)
+
+            region = gray[y0:y1, x0:x1]
+            if region.shape[0] < h or region.shape[1] < w or pista.plantilla.size == 0:
+                del self.pistas[pista_id]
+                continue
+
+            coincidencias = cv2.matchTemplate(region, pista.plantilla, cv2.TM_CCOEFF_NORMED)
+            _, maximo, _, posicion = cv2.minMaxLoc(coincidencias)
+            if maximo < self.umbral_seguimiento:
+                # Rostro perdido: se volverá a detectar en la próxima detección
+                del self.pistas[pista_id]
+                continue
+            pista.caja = (x0 + posicion[0], y0 + posicion[1], w, h)
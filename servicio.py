@@ -0,0 +1,215 @@
+"""
+Servicio de reconocimiento sin interfaz gráfica: captura -> detección ->
+reconocimiento -> decisión de acceso sobre una o varias fuentes, con las
+decisiones como líneas JSON por la salida estándar o por un socket local. No
+importa Tkinter ni PIL.
+
+Puede compartir la base de datos con la interfaz gráfica: los cambios que haga
+otro proceso (habilitar, deshabilitar, registrar o borrar personas, expiraciones)
+se detectan con PRAGMA data_version; el estado de acceso se recarga en la
+siguiente consulta y el modelo en unos segundos (--intervalo-sincronizacion).
+
+    python servicio.py --fuente 0
+    python servicio.py --fuente 0 --fuente 1 --fuente rtsp://camara-entrada/stream
+    python servicio.py --fuente video.avi --sin-limite --una-vez
+    python servicio.py --fuente 0 --socket 127.0.0.1:8765
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+from acceso import evaluar_acceso
+from logic import BACKENDS, BACKEND_OPENCV, FaceAppLogic, TareaExpiracion, TareaSincronizacion
+from multicamara import MotorMulticamara
+
+
+class SalidaJSON:
+    """Escribe cada mensaje como una línea JSON por la salida estándar"""
+
+    def __init__(self, flujo=None):
+        self.flujo = flujo or sys.stdout
+
+    def escribir(self, mensaje):
+        self.flujo.write(json.dumps(mensaje, ensure_ascii=False) + "\n")
+        self.flujo.flush()
+
+    def cerrar(self):
+        pass
+
+
+class SalidaSocket(SalidaJSON):
+    """
+    Socket local (TCP "host:puerto" o ruta de socket Unix) que acepta clientes en
+    un hilo y les envía a todos cada mensaje como una línea JSON. Un cliente que
+    deja de leer o se desconecta se descarta sin afectar al resto.
+    """
+
+    def __init__(self, direccion):
+        if ":" in direccion:
+            host, puerto = direccion.rsplit(":", 1)
+            self._servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._servidor.bind((host, int(puerto)))
+            self._ruta_unix = None
+        else:
+            if os.path.exists(direccion):
+                os.remove(direccion)
+            self._servidor = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._servidor.bind(direccion)
+            self._ruta_unix = direccion
+        self._servidor.listen()
+        self._clientes = []
+        self._lock = threading.Lock()
+        self._hilo = threading.Thread(target=self._aceptar, name="servicio-socket", daemon=True)
+        self._hilo.start()
+
+    def _aceptar(self):
+        while True:
+            try:
+                cliente, _ = self._servidor.accept()
+            except OSError:
+                return  # Socket cerrado
+            cliente.settimeout(1.0)
+            with self._lock:
+                self._clientes.append(cliente)
+
+    def escribir(self, mensaje):
+        linea = (json.dumps(mensaje, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            for cliente in list(self._clientes):
+                try:
+                    cliente.sendall(linea)
+                except OSError:
+                    self._clientes.remove(cliente)
+                    cliente.close()
+
+    def cerrar(self):
+        self._servidor.close()
+        with self._lock:
+            for cliente in self._clientes:
+                cliente.close()
+            self._clientes = []
+        if self._ruta_unix and os.path.exists(self._ruta_unix):
+            os.remove(self._ruta_unix)
+
+
+def mensaje_decision(fuente, rostro, acceso):
+    persona_id = rostro["persona_id"]
+    return {
+        "tipo": "decision",
+        "hora": datetime.now().isoformat(timespec="milliseconds"),
+        "fuente": fuente.indice,
+        "pista": rostro["pista"],
+        "persona_id": None if persona_id is None else int(persona_id),
+        "nombre": rostro["nombre"],
+        "decision": acceso["decision"],
+        "dias_restantes": acceso["dias"],
+        "distancia": float(rostro["confianza"]),
+        "caja": list(rostro["caja"]),
+    }
+
+
+def mensaje_estado(motor, tipo="estado"):
+    fuentes = motor.estadisticas()
+    return {
+        "tipo": tipo,
+        "hora": datetime.now().isoformat(timespec="seconds"),
+        "frames": sum(fuente["frames"] for fuente in fuentes),
+        "fps_sostenido": round(sum(fuente["fps_sostenido"] for fuente in fuentes), 2),
+        "fuentes": fuentes,
+    }
+
+
+def ejecutar(args, salida, detener):
+    logic = FaceAppLogic(args.db, backend=args.backend)
+    motor = MotorMulticamara(logic, args.fuente or ["0"], tiempo_real=not args.sin_limite,
+                             repetir=not args.una_vez, intervalo_deteccion=args.intervalo_deteccion,
+                             intervalo_verificacion=args.intervalo_verificacion)
+    tarea_expiracion = TareaExpiracion(logic.repo, al_expirar=lambda expirados: logic.cache_personas.invalidar())
+    # Altas y bajas hechas por otro proceso (la interfaz de administración) sobre la misma BD
+    tarea_sincronizacion = TareaSincronizacion(logic, args.intervalo_sincronizacion)
+
+    motor.iniciar()
+    tarea_expiracion.iniciar()
+    tarea_sincronizacion.iniciar()
+
+    ultimo_estado = time.perf_counter()
+    ultimo_resultado = ultimo_estado
+    # Última (persona_id, decisión) emitida por (fuente, pista): solo se emite cuando cambia
+    emitidas = {}
+    try:
+        while not detener.is_set():
+            # El límite cuenta los frames procesados por los pipelines, no solo los recogidos
+            if args.frames and motor.frames_procesados >= args.frames:
+                break
+            ahora = time.perf_counter()
+            if ahora - ultimo_estado >= args.intervalo_estado:
+                salida.escribir(mensaje_estado(motor))
+                ultimo_estado = ahora
+
+            resultados = motor.obtener_resultados()
+            if not resultados:
+                # Fin de los videos: esperar a que los pipelines entreguen los frames en curso
+                if motor.terminado and ahora - ultimo_resultado > 1.0:
+                    break
+                detener.wait(0.005)
+                continue
+            ultimo_resultado = ahora
+
+            for fuente, resultado in resultados:
+                activas = {}
+                for rostro in resultado["rostros"]:
+                    acceso = evaluar_acceso(rostro["nombre"], rostro["info"])
+                    clave = (rostro["persona_id"], acceso["decision"])
+                    activas[rostro["pista"]] = clave
+                    if args.todos or emitidas.get(fuente.indice, {}).get(rostro["pista"]) != clave:
+                        salida.escribir(mensaje_decision(fuente, rostro, acceso))
+                emitidas[fuente.indice] = activas
+    finally:
+        motor.detener()
+        tarea_sincronizacion.detener()
+        tarea_expiracion.detener()
+        logic.cerrar()
+        salida.escribir(mensaje_estado(motor, "resumen"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio de reconocimiento facial sin interfaz gráfica")
+    parser.add_argument("--db", default="rostrosv2.db", help="Ruta de la base de datos SQLite")
+    parser.add_argument("--fuente", action="append",
+                        help="Índice de cámara, archivo de video o URL; se puede repetir (por defecto 0)")
+    parser.add_argument("--socket", help="Emitir por un socket local (host:puerto o ruta Unix) en lugar de stdout")
+    parser.add_argument("--backend", choices=BACKENDS, default=BACKEND_OPENCV)
+    parser.add_argument("--intervalo-deteccion", type=int, default=5)
+    parser.add_argument("--intervalo-verificacion", type=int, default=15)
+    parser.add_argument("--intervalo-estado", type=float, default=5.0,
+                        help="Segundos entre mensajes de estado con los FPS")
+    parser.add_argument("--intervalo-sincronizacion", type=float, default=2.0,
+                        help="Segundos entre comprobaciones de cambios hechos por otros procesos en la BD")
+    parser.add_argument("--todos", action="store_true",
+                        help="Emitir la decisión de cada rostro en cada frame, no solo cuando cambia")
+    parser.add_argument("--sin-limite", action="store_true",
+                        help="Leer los videos tan rápido como se pueda en lugar de a su velocidad original")
+    parser.add_argument("--una-vez", action="store_true", help="Terminar al acabar el video")
+    parser.add_argument("--frames", type=int, default=0,
+                        help="Terminar tras procesar N frames entre todas las fuentes (0: sin límite)")
+    args = parser.parse_args()
+
+    salida = SalidaSocket(args.socket) if args.socket else SalidaJSON()
+    detener = threading.Event()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(senal, lambda *_: detener.set())
+    try:
+        ejecutar(args, salida, detener)
+    finally:
+        salida.cerrar()
+
+
+if __name__ == "__main__":
+    main()
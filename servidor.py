@@ -0,0 +1,533 @@
+"""
+Servidor local HTTP/JSON de reconocimiento, para que varias cámaras o procesos
+compartan un único modelo. Las peticiones concurrentes se agrupan en lotes y cada
+lote se reconoce de una vez en un pool acotado de hilos.
+
+    python servidor.py servir --db rostrosv2.db --puerto 8765
+    python servidor.py reconocer --imagen rostro.png
+    python servidor.py reconocer --imagen frame.jpg --frame
+    python servidor.py carga --db rostrosv2.db --peticiones 500 --concurrencia 16
+
+Endpoints (el cuerpo es la imagen codificada, p. ej. PNG o JPEG, o un JSON
+{"imagen": "<base64>"}):
+
+    POST /reconocer/rostro  Un recorte de rostro
+    POST /reconocer/frame   Un frame completo: se detectan y reconocen sus rostros
+    GET  /estado            Contadores de peticiones y lotes
+
+Los cambios que otro proceso haga en la base de datos (la interfaz de
+administración) se detectan con PRAGMA data_version: el estado de acceso se
+recarga en la siguiente consulta y el modelo en unos segundos.
+"""
+import argparse
+import asyncio
+import base64
+import http.client
+import json
+import signal
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import cv2
+import numpy as np
+
+from acceso import evaluar_acceso
+from esquema import tiene_columna
+from logic import BACKENDS, BACKEND_OPENCV, FaceAppLogic, TareaExpiracion, TareaSincronizacion, decodificar_rostro
+
+MOTIVOS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class ErrorPeticion(Exception):
+    """Error que se devuelve al cliente con el código HTTP indicado"""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+class LoteadorReconocimiento:
+    """
+    Agrupa los rostros de peticiones concurrentes en lotes. Un único bucle toma el
+    primer rostro de la cola, espera como mucho `espera_lote` segundos a que lleguen
+    más (hasta `lote_maximo`) y manda el lote al pool. Como mucho hay `trabajadores`
+    lotes en curso: mientras están ocupados los rostros se acumulan en la cola y el
+    siguiente lote sale más grande. Con la cola llena las peticiones se rechazan.
+    """
+
+    def __init__(self, logic, lote_maximo=16, espera_lote=0.002, trabajadores=2, cola_maxima=256,
+                 umbral=80):
+        """
+        Args:
+            logic: Instancia de FaceAppLogic compartida por todas las peticiones
+            lote_maximo: Número máximo de rostros por pasada de reconocimiento
+            espera_lote: Segundos que se espera a completar un lote desde su primer rostro
+            trabajadores: Hilos del pool (lotes, decodificación y detección en paralelo)
+            cola_maxima: Rostros pendientes a partir de los cuales se responde 503
+            umbral: Distancia máxima para aceptar una coincidencia
+        """
+        self.logic = logic
+        self.lote_maximo = lote_maximo
+        self.espera_lote = espera_lote
+        self.trabajadores = trabajadores
+        self.cola_maxima = cola_maxima
+        self.umbral = umbral
+        self.pool = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix="servidor")
+        self.estadisticas = {"rostros": 0, "lotes": 0, "lote_maximo_visto": 0, "rechazados": 0,
+                             "segundos_lotes": 0.0}
+        self._cola = None
+        self._en_curso = None
+        self._tarea = None
+
+    def iniciar(self):
+        """Crea la cola y el bucle de lotes; se llama desde el bucle de eventos"""
+        self._cola = asyncio.Queue(self.cola_maxima)
+        self._en_curso = asyncio.Semaphore(self.trabajadores)
+        self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+        self.pool.shutdown(wait=True)
+
+    async def reconocer(self, rostros):
+        """
+        Encola los rostros y espera su resultado.
+
+        Returns:
+            Lista de diccionarios {persona_id, nombre, distancia, decision, dias_restantes}
+        """
+        if not rostros:
+            return []
+        if self._cola.qsize() + len(rostros) > self.cola_maxima:
+            self.estadisticas["rechazados"] += len(rostros)
+            raise ErrorPeticion(503, "Servidor ocupado, reintente más tarde")
+        loop = asyncio.get_running_loop()
+        futuros = []
+        for rostro in rostros:
+            futuro = loop.create_future()
+            self._cola.put_nowait((rostro, futuro))
+            futuros.append(futuro)
+        return await asyncio.gather(*futuros)
+
+    async def _bucle(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Reservar el trabajador antes de formar el lote, para que mientras se
+            # espera a uno libre se acumulen rostros en la cola
+            await self._en_curso.acquire()
+            lote = [await self._cola.get()]
+            limite = loop.time() + self.espera_lote
+            while len(lote) < self.lote_maximo:
+                if not self._cola.empty():
+                    lote.append(self._cola.get_nowait())
+                    continue
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self._cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+            asyncio.create_task(self._procesar(lote))
+
+    async def _procesar(self, lote):
+        loop = asyncio.get_running_loop()
+        inicio = time.perf_counter()
+        try:
+            resultados = await loop.run_in_executor(self.pool, self._reconocer_lote, [r for r, _ in lote])
+        except Exception as e:
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+        else:
+            for (_, futuro), resultado in zip(lote, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+        finally:
+            self._en_curso.release()
+            self.estadisticas["rostros"] += len(lote)
+            self.estadisticas["lotes"] += 1
+            self.estadisticas["lote_maximo_visto"] = max(self.estadisticas["lote_maximo_visto"], len(lote))
+            self.estadisticas["segundos_lotes"] += time.perf_counter() - inicio
+
+    def _reconocer_lote(self, rostros):
+        # En el hilo del pool: la caché de personas puede tener que ir a la BD
+        resultados = []
+        for persona_id, distancia in self.logic.reconocer_lote(rostros, self.umbral):
+            info = self.logic.cache_personas.obtener(persona_id) if persona_id is not None else None
+            nombre = info.nombre if info else "Desconocido"
+            acceso = evaluar_acceso(nombre, info)
+            resultados.append({
+                "persona_id": info.id if info else None,
+                "nombre": nombre,
+                "distancia": float(distancia),
+                "decision": acceso["decision"],
+                "dias_restantes": acceso["dias"],
+            })
+        return resultados
+
+
+def _decodificar_imagen(datos):
+    imagen = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if imagen is None:
+        raise ErrorPeticion(400, "La imagen no se pudo decodificar")
+    return imagen
+
+
+class ServidorReconocimiento:
+    """Servidor HTTP/1.1 mínimo sobre asyncio (conexiones persistentes, cuerpos con Content-Length)"""
+
+    def __init__(self, logic, host="127.0.0.1", puerto=8765, tamano_maximo=8 * 1024 * 1024, **opciones_lote):
+        """
+        Args:
+            logic: Instancia de FaceAppLogic compartida
+            host: Dirección de escucha (por defecto solo local)
+            puerto: Puerto de escucha; 0 elige uno libre
+            tamano_maximo: Tamaño máximo del cuerpo de una petición en bytes
+            opciones_lote: Argumentos de LoteadorReconocimiento
+        """
+        self.logic = logic
+        self.host = host
+        self.puerto = puerto
+        self.tamano_maximo = tamano_maximo
+        self.lotes = LoteadorReconocimiento(logic, **opciones_lote)
+        self.peticiones = 0
+        self.inicio = time.time()
+
+    async def servir(self, listo=None):
+        """Atiende peticiones hasta SIGINT/SIGTERM; listo (threading.Event) se activa al escuchar"""
+        self.lotes.iniciar()
+        servidor = await asyncio.start_server(self._atender, self.host, self.puerto)
+        self.puerto = servidor.sockets[0].getsockname()[1]
+        detener = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for senal in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(senal, detener.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Fuera del hilo principal o en Windows
+        print(f"Servidor de reconocimiento en http://{self.host}:{self.puerto}", flush=True)
+        if listo is not None:
+            listo.set()
+        async with servidor:
+            await detener.wait()
+        await self.lotes.detener()
+
+    async def _atender(self, lector, escritor):
+        try:
+            while True:
+                try:
+                    cabecera = await lector.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lineas = cabecera.decode("latin-1").split("\r\n")
+                try:
+                    metodo, ruta, version = lineas[0].split(" ", 2)
+                except ValueError:
+                    break
+                cabeceras = {}
+                for linea in lineas[1:]:
+                    if ":" in linea:
+                        nombre, valor = linea.split(":", 1)
+                        cabeceras[nombre.strip().lower()] = valor.strip()
+
+                # Solo dígitos ASCII: int() aceptaría también signos, espacios y "1_000"
+                valor = cabeceras.get("content-length", "0")
+                if not (valor.isascii() and valor.isdigit()):
+                    await self._responder(escritor, 400, {"error": "Content-Length inválido"}, False)
+                    break
+                longitud = int(valor)
+                if longitud > self.tamano_maximo:
+                    await self._responder(escritor, 413, {"error": "Imagen demasiado grande"}, False)
+                    break
+                cuerpo = await lector.readexactly(longitud) if longitud else b""
+
+                self.peticiones += 1
+                try:
+                    respuesta = await self._despachar(metodo, ruta, cabeceras, cuerpo)
+                    estado = 200
+                except ErrorPeticion as e:
+                    estado, respuesta = e.estado, {"error": str(e)}
+                except Exception as e:
+                    estado, respuesta = 500, {"error": f"Error interno: {e}"}
+
+                seguir = version == "HTTP/1.1" and cabeceras.get("connection", "").lower() != "close"
+                await self._responder(escritor, estado, respuesta, seguir)
+                if not seguir:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _responder(self, escritor, estado, datos, seguir):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        escritor.write((f"HTTP/1.1 {estado} {MOTIVOS.get(estado, '')}\r\n"
+                        f"Content-Type: application/json; charset=utf-8\r\n"
+                        f"Content-Length: {len(cuerpo)}\r\n"
+                        f"Connection: {'keep-alive' if seguir else 'close'}\r\n\r\n").encode("latin-1") + cuerpo)
+        await escritor.drain()
+
+    async def _despachar(self, metodo, ruta, cabeceras, cuerpo):
+        ruta = ruta.split("?", 1)[0]
+        rutas = {"/estado": "GET", "/reconocer/rostro": "POST", "/reconocer/frame": "POST"}
+        if ruta not in rutas:
+            raise ErrorPeticion(404, f"Ruta desconocida: {ruta}")
+        if metodo != rutas[ruta]:
+            raise ErrorPeticion(405, f"Use {rutas[ruta]} en {ruta}")
+        if ruta == "/estado":
+            return self.estado()
+
+        datos = self._extraer_imagen(cabeceras, cuerpo)
+        loop = asyncio.get_running_loop()
+        if ruta == "/reconocer/rostro":
+            rostro = await loop.run_in_executor(self.lotes.pool, _decodificar_imagen, datos)
+            return {"rostros": await self.lotes.reconocer([rostro])}
+
+        cajas, rostros = await loop.run_in_executor(self.lotes.pool, self._detectar, datos)
+        resultados = await self.lotes.reconocer(rostros)
+        for caja, resultado in zip(cajas, resultados):
+            resultado["caja"] = caja
+        return {"rostros": resultados}
+
+    def _extraer_imagen(self, cabeceras, cuerpo):
+        if not cuerpo:
+            raise ErrorPeticion(400, "Falta la imagen en el cuerpo de la petición")
+        if cabeceras.get("content-type", "").startswith("application/json"):
+            try:
+                return base64.b64decode(json.loads(cuerpo)["imagen"])
+            except (ValueError, KeyError, TypeError):
+                raise ErrorPeticion(400, 'Se esperaba un JSON {"imagen": "<base64>"}')
+        return cuerpo
+
+    def _detectar(self, datos):
+        gray = _decodificar_imagen(datos)
+        cajas, rostros = [], []
+        for (x, y, w, h) in self.logic.detectar_rostros(gray):
+            x, y, w, h = int(x), int(y), int(w), int(h)
+            recorte = gray[y:y + h, x:x + w]
+            if recorte.size:
+                cajas.append([x, y, w, h])
+                rostros.append(recorte)
+        return cajas, rostros
+
+    def estado(self):
+        estadisticas = self.lotes.estadisticas
+        lotes = estadisticas["lotes"]
+        return {
+            "entrenado": bool(self.logic.trained),
+            "segundos_activo": round(time.time() - self.inicio, 1),
+            "peticiones": self.peticiones,
+            "rostros": estadisticas["rostros"],
+            "lotes": lotes,
+            "rostros_por_lote": round(estadisticas["rostros"] / lotes, 2) if lotes else 0.0,
+            "lote_maximo_visto": estadisticas["lote_maximo_visto"],
+            "ms_por_lote": round(estadisticas["segundos_lotes"] / lotes * 1000, 2) if lotes else 0.0,
+            "rechazados": estadisticas["rechazados"],
+            "en_cola": self.lotes._cola.qsize() if self.lotes._cola is not None else 0,
+        }
+
+
+class ClienteReconocimiento:
+    """Cliente del servidor local; mantiene una conexión persistente (un cliente por hilo)"""
+
+    def __init__(self, host="127.0.0.1", puerto=8765, timeout=10):
+        self.conexion = http.client.HTTPConnection(host, puerto, timeout=timeout)
+
+    def _peticion(self, metodo, ruta, cuerpo=None, tipo=None):
+        cabeceras = {"Content-Type": tipo} if tipo else {}
+        self.conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+        respuesta = self.conexion.getresponse()
+        datos = json.loads(respuesta.read() or b"{}")
+        if respuesta.status != 200:
+            raise RuntimeError(f"Error {respuesta.status}: {datos.get('error', respuesta.reason)}")
+        return datos
+
+    def reconocer_rostro(self, rostro):
+        """Reconoce un recorte de rostro (array BGR o en grises); devuelve su resultado"""
+        ok, png = cv2.imencode(".png", rostro)
+        if not ok:
+            raise ValueError("No se pudo codificar el rostro")
+        return self._peticion("POST", "/reconocer/rostro", png.tobytes(), "image/png")["rostros"][0]
+
+    def reconocer_frame(self, frame, calidad_jpeg=90):
+        """Detecta y reconoce los rostros de un frame; devuelve la lista de resultados con su caja"""
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, calidad_jpeg])
+        if not ok:
+            raise ValueError("No se pudo codificar el frame")
+        return self._peticion("POST", "/reconocer/frame", jpeg.tobytes(), "image/jpeg")["rostros"]
+
+    def enviar_archivo(self, ruta, frame=False):
+        """Envía una imagen ya codificada tal cual está en disco"""
+        with open(ruta, "rb") as archivo:
+            datos = archivo.read()
+        destino = "/reconocer/frame" if frame else "/reconocer/rostro"
+        return self._peticion("POST", destino, datos, "application/octet-stream")["rostros"]
+
+    def estado(self):
+        return self._peticion("GET", "/estado")
+
+    def cerrar(self):
+        self.conexion.close()
+
+
+def servir(args):
+    logic = FaceAppLogic(args.db, backend=args.backend)
+    tarea_expiracion = TareaExpiracion(logic.repo, al_expirar=lambda expirados: logic.cache_personas.invalidar())
+    tarea_expiracion.iniciar()
+    # Cambios hechos por otro proceso (la interfaz de administración) sobre la misma BD
+    tarea_sincronizacion = TareaSincronizacion(logic)
+    tarea_sincronizacion.iniciar()
+    servidor = ServidorReconocimiento(logic, args.host, args.puerto, lote_maximo=args.lote_maximo,
+                                      espera_lote=args.espera_lote / 1000, trabajadores=args.trabajadores,
+                                      cola_maxima=args.cola_maxima, umbral=args.umbral)
+    try:
+        asyncio.run(servidor.servir())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tarea_sincronizacion.detener()
+        tarea_expiracion.detener()
+        logic.cerrar()
+
+
+def reconocer(args):
+    cliente = ClienteReconocimiento(args.host, args.puerto)
+    try:
+        print(json.dumps(cliente.enviar_archivo(args.imagen, args.frame), ensure_ascii=False, indent=2))
+    finally:
+        cliente.cerrar()
+
+
+def cargar_rostros_prueba(db_path, cantidad):
+    """Rostros de la base de datos (solo lectura) con los que generar carga"""
+    com = sqlite3.connect(f"file:{quote(db_path)}?mode=ro", uri=True)
+    try:
+        # Las BD antiguas sin migrar no tienen la columna formato: sus muestras son float64
+        formato = "formato" if tiene_columna(com.cursor(), "imagenes_personas", "formato") else "0"
+        filas = com.execute(f"SELECT persona_id, encoding, {formato} FROM imagenes_personas "
+                            "ORDER BY RANDOM() LIMIT ?", (cantidad,)).fetchall()
+    finally:
+        com.close()
+    rostros = []
+    for persona_id, blob, formato in filas:
+        rostro = decodificar_rostro(blob, formato or 0)
+        if rostro is not None:
+            rostros.append((persona_id, rostro))
+    return rostros
+
+
+def carga(args):
+    """Lanza peticiones concurrentes desde varios hilos y mide latencia, rendimiento y lotes"""
+    from benchmark import percentiles
+
+    rostros = cargar_rostros_prueba(args.db, args.rostros)
+    if not rostros:
+        print("La base de datos no tiene rostros con los que probar")
+        return
+    latencias = []
+    aciertos = [0]
+    errores = []
+    lock = threading.Lock()
+    siguiente = iter(range(args.peticiones))
+
+    def trabajador():
+        cliente = ClienteReconocimiento(args.host, args.puerto)
+        try:
+            while True:
+                with lock:
+                    i = next(siguiente, None)
+                if i is None:
+                    return
+                persona_id, rostro = rostros[i % len(rostros)]
+                inicio = time.perf_counter()
+                try:
+                    resultado = cliente.reconocer_rostro(rostro)
+                except Exception as e:
+                    with lock:
+                        errores.append(str(e))
+                    continue
+                with lock:
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+                    aciertos[0] += resultado["persona_id"] == persona_id
+        finally:
+            cliente.cerrar()
+
+    def estado():
+        cliente = ClienteReconocimiento(args.host, args.puerto)
+        try:
+            return cliente.estado()
+        finally:
+            cliente.cerrar()
+
+    antes = estado()
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=trabajador) for _ in range(args.concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+    despues = estado()
+
+    lotes = despues["lotes"] - antes["lotes"]
+    rostros_lote = (despues["rostros"] - antes["rostros"]) / lotes if lotes else 0.0
+    print(f"Peticiones: {len(latencias)} correctas, {len(errores)} con error, concurrencia {args.concurrencia}")
+    print(f"Rendimiento: {len(latencias) / segundos:.1f} peticiones/s en {segundos:.2f} s")
+    if latencias:
+        resumen = percentiles(latencias)
+        print("Latencia (ms): " + ", ".join(f"{clave} {valor:.2f}" for clave, valor in resumen.items() if clave != "n"))
+        print(f"Reconocidos como su propia persona: {aciertos[0] / len(latencias):.1%}")
+    print(f"Lotes: {lotes}, {rostros_lote:.2f} rostros por lote (máximo visto {despues['lote_maximo_visto']})")
+    if errores:
+        print(f"Primer error: {errores[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API local HTTP/JSON de reconocimiento facial")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    def conexion(sub):
+        sub.add_argument("--host", default="127.0.0.1")
+        sub.add_argument("--puerto", type=int, default=8765)
+
+    sub = subparsers.add_parser("servir", help="Iniciar el servidor")
+    conexion(sub)
+    sub.add_argument("--db", default="rostrosv2.db", help="Ruta de la base de datos SQLite")
+    sub.add_argument("--backend", choices=BACKENDS, default=BACKEND_OPENCV)
+    sub.add_argument("--lote-maximo", type=int, default=16, help="Rostros máximos por pasada de reconocimiento")
+    sub.add_argument("--espera-lote", type=float, default=2.0, help="Milisegundos de espera para completar un lote")
+    sub.add_argument("--trabajadores", type=int, default=2, help="Hilos del pool de reconocimiento")
+    sub.add_argument("--cola-maxima", type=int, default=256, help="Rostros en espera antes de responder 503")
+    sub.add_argument("--umbral", type=float, default=80, help="Distancia máxima para aceptar una coincidencia")
+    sub.set_defaults(funcion=servir)
+
+    sub = subparsers.add_parser("reconocer", help="Enviar una imagen al servidor")
+    conexion(sub)
+    sub.add_argument("--imagen", required=True, help="Archivo de imagen (PNG, JPEG...)")
+    sub.add_argument("--frame", action="store_true", help="La imagen es un frame completo, no un recorte de rostro")
+    sub.set_defaults(funcion=reconocer)
+
+    sub = subparsers.add_parser("carga", help="Medir el servidor con peticiones concurrentes")
+    conexion(sub)
+    sub.add_argument("--db", default="rostrosv2.db", help="Base de datos de la que tomar rostros (solo lectura)")
+    sub.add_argument("--rostros", type=int, default=200, help="Rostros distintos a enviar")
+    sub.add_argument("--peticiones", type=int, default=500)
+    sub.add_argument("--concurrencia", type=int, default=8, help="Clientes simultáneos")
+    sub.set_defaults(funcion=carga)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,15 @@ from tkinter import messagebox, ttk
 from PIL import Image, ImageTk
 import cv2
 from datetime import datetime, timedelta
-from logic import FaceAppLogic
+from logic import FaceAppLogic, TareaExpiracion
 from admin import AdminWindow
 from dashboard import UserDashboard
+from pipeline import PipelineReconocimiento, MedidorFPS
+from camara import CameraSource
+from registro import registrar_o_fusionar
+from acceso import evaluar_acceso
+from calidad import SelectorMuestras, evaluar_calidad
+
 
 class FaceAppUI:
     def __init__(self, root, logic: FaceAppLogic):
@@ -148,16 +154,26 @@ class FaceAppUI:
         self.statusbar = ttk.Label(self.root, text="Sistema listo", relief=tk.SUNKEN, anchor=tk.W)
         self.statusbar.pack(side=tk.BOTTOM, fill=tk.X)
 
-        # Inicializar cámara con opciones robustas y reintentos
-        self.cap = None
-        self.camera_index = 0
-        self.max_retries = 3
-        self.initialize_camera()
+        # La cámara la gestiona un hilo propio con reconexión automática
+        self.camara = CameraSource(0)
+        self.camara.iniciar()
+        self.error_camara_mostrado = False
 
         self.current_frame = None
         self.face_locations_actual = None
 
-        self.admin_window = AdminWindow(self.root, self.logic, self.cap)
+        # Pipeline de reconocimiento en hilos; el bucle de Tkinter solo muestra resultados
+        self.pipeline = PipelineReconocimiento(self.logic, self.camara, self._renderizar_frame)
+        self.fps_pantalla = MedidorFPS()
+        self.pipeline.iniciar()
+
+        # Barrido de expiración programado (cada minuto y al cambiar de día)
+        self.tarea_expiracion = TareaExpiracion(
+            self.logic.repo, al_expirar=lambda expirados: self.logic.cache_personas.invalidar())
+        self.tarea_expiracion.iniciar()
+        self.mensaje_expiracion = ""
+
+        self.admin_window = AdminWindow(self.root, self.logic, self.camara)
 
         self.ventana_admin = None
         self.root.protocol("WM_DELETE_WINDOW", self.cerrar_aplicacion)
@@ -165,260 +181,144 @@ class FaceAppUI:
 
         self.actualizar_video()
 
-    def initialize_camera(self):
-        """Intenta inicializar la cámara con reintentos y manejo de errores."""
-        for attempt in range(self.max_retries):
-            try:
-                # Liberar cualquier instancia previa
-                if self.cap is not None:
-                    self.cap.release()
-
-                # Crear una nueva instancia con configuración explícita para Windows Media Foundation
-                self.cap = cv2.VideoCapture(self.camera_index, cv2.CAP_MSMF)
-
-                if not self.cap.isOpened():
-                    raise ValueError("No se puede abrir la cámara.")
-
-                # Configurar propiedades específicas para evitar errores MSMF
-                self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
-                self.cap.set(cv2.CAP_PROP_FPS, 15)  # Reducir FPS puede ayudar con la estabilidad
-                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 3)
-
-                # Verificar si podemos leer correctamente
-                for check_attempt in range(3):
-                    ret, frame = self.cap.read()
-                    if ret and frame is not None:
-                        # Si la lectura fue exitosa, salimos del bucle
-                        break
-                    # Pequeña pausa entre intentos
-                    import time
-                    time.sleep(0.2)
-
-                if not ret or frame is None:
-                    raise ValueError("No se puede acceder al stream de la cámara.")
-
-                # Configuración exitosa
-                self.statusbar.config(text="Cámara lista")
-                return True
+    def _renderizar_frame(self, frame, rostros):
+        """
+        Dibuja los rostros reconocidos y prepara la imagen para Tkinter.
+        Se ejecuta en el hilo de render del pipeline, por lo que no toca widgets.
+        """
+        display_frame = frame.copy()
 
-            except Exception as e:
-                self.statusbar.config(text=f"Error al inicializar cámara {self.camera_index}: {e}")
-                print(f"Fallo al inicializar cámara {self.camera_index}: {e}")
+        for rostro in rostros:
+            x, y, w, h = rostro["caja"]
+            acceso = evaluar_acceso(rostro["nombre"], rostro["info"])
+            nombre = acceso["etiqueta"]
+            color = acceso["color"]
 
-                # Probar con la siguiente cámara
-                self.camera_index = (self.camera_index + 1) % 2  # Alternar entre 0 y 1
+            # Dibujar rectángulo alrededor del rostro
+            cv2.rectangle(display_frame, (x, y), (x + w, y + h), color, 2)
 
-                # Dar tiempo al sistema para liberar recursos
-                import time
-                time.sleep(1)
+            # Añadir fondo para el texto
+            text_size = cv2.getTextSize(nombre, cv2.FONT_HERSHEY_SIMPLEX, 0.75, 2)[0]
+            cv2.rectangle(display_frame, (x, y - 30), (x + text_size[0] + 10, y), color, -1)
+            cv2.putText(display_frame, nombre, (x + 5, y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.75, (255, 255, 255), 2)
 
-        # Si no se pudo inicializar ninguna cámara
-        messagebox.showerror("Error", "No se pudo inicializar la cámara. Verifica la conexión o cierra otras aplicaciones que puedan estar usándola.")
-        return False
+        # Convertir para visualización en Tkinter
+        img = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
+        img = Image.fromarray(img)
 
-    def actualizar_video(self):
+        # Redimensionar para la interfaz
         try:
-            # Usar un mecanismo try/except más robusto
-            try:
-                self.logic.verificar_fechas_expiracion()
-
-                # Verificar si la cámara está disponible
-                if self.cap is None or not self.cap.isOpened():
-                    self.statusbar.config(text="Cámara no disponible. Intentando reiniciar...")
-                    self.initialize_camera()
-                    # Si la inicialización falla, programar el siguiente intento y salir
-                    if self.cap is None or not self.cap.isOpened():
-                        self.root.after(2000, self.actualizar_video)
-                        return
-
-                # Intento de lectura con timeouts
-                import time
-                start_time = time.time()
-                read_timeout = 0.5  # 500ms timeout para la lectura
-
-                # Intentar leer frame con límite de tiempo
-                ret, frame = self.cap.read()
-
-                # Verificar si la operación tomó demasiado tiempo o falló
-                if time.time() - start_time > read_timeout or not ret or frame is None:
-                    # Incrementar contador de errores
-                    error_count = getattr(self, 'error_count', 0) + 1
-                    self.error_count = error_count
-
-                    print(f"Error de captura #{error_count} - ret: {ret}")
-                    self.statusbar.config(text=f"Problema de captura: {error_count}/3. Reintentando...")
-
-                    # Si hay muchos errores consecutivos, forzar reinicio de cámara
-                    if error_count >= 3:
-                        print("Reiniciando cámara debido a errores consecutivos")
-                        self.statusbar.config(text="Reiniciando dispositivo de cámara...")
-
-                        # Liberar recursos explícitamente
-                        if self.cap is not None:
-                            self.cap.release()
-                            self.cap = None
-
-                        # Forzar recolección de basura para liberar recursos
-                        import gc
-                        gc.collect()
-
-                        # Esperar un momento antes de reinicializar
-                        time.sleep(1.0)
-
-                        # Reintentar con parámetros diferentes
-                        self.camera_index = (self.camera_index + 1) % 2
-                        self.initialize_camera()
-                        self.error_count = 0
-
-                    # Esperamos más tiempo entre intentos cuando hay errores
-                    self.root.after(1000, self.actualizar_video)
-                    return
+            w, h = img.size
+            target_height = 480
+            ratio = target_height / h
+            new_width = int(w * ratio)
+            img = img.resize((new_width, target_height), Image.Resampling.LANCZOS)
+        except Exception as e:
+            print(f"Error al redimensionar imagen: {e}")
 
-                # Si la lectura fue exitosa, restablecer contador de errores
-                self.error_count = 0
+        return img
 
-                # Procesamiento normal de video
-                display_frame = frame.copy()
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-                # Detectar rostros con manejo de excepciones
-                try:
-                    faces = self.logic.face_cascade.detectMultiScale(
-                        gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
-                    )
-                    self.face_locations_actual = faces
-                except Exception as e:
-                    print(f"Error en detectMultiScale: {e}")
-                    faces = []
-
-                # Mostrar información en la barra de estado
-                if len(faces) > 0:
-                    self.statusbar.config(text=f"Detectados {len(faces)} rostros")
+    def actualizar_video(self):
+        """
+        Bucle de Tkinter: solo muestra el último frame terminado por el pipeline y
+        actualiza el estado y el dashboard. La captura, detección, reconocimiento y
+        render se ejecutan en los hilos de PipelineReconocimiento.
+        """
+        try:
+            expirados = self.tarea_expiracion.obtener_expirados()
+            if expirados:
+                self.mensaje_expiracion = (f"{expirados} suscripciones expiradas "
+                                           f"({datetime.now().strftime('%H:%M')})")
+
+            # Si la cámara no está disponible, mostrar su estado (la reconexión es automática)
+            if not self.camara.conectada:
+                self.statusbar.config(text=self.camara.estado)
+                if self.camara.rondas_fallidas > 0 and not self.error_camara_mostrado:
+                    self.error_camara_mostrado = True
+                    messagebox.showerror("Error", "No se pudo inicializar la cámara. Verifica la conexión o cierra otras aplicaciones que puedan estar usándola.")
+
+            resultado = self.pipeline.obtener_resultado()
+            if resultado is not None:
+                self.fps_pantalla.marcar()
+                self._mostrar_resultado(resultado)
+
+        except Exception as e:
+            # Manejo de excepciones a nivel de ciclo de visualización
+            print(f"Error general en actualizar_video: {e}")
+            self.statusbar.config(text=f"Error: {str(e)[:50]}...")
+
+        # Programar la siguiente actualización
+        if self.root.winfo_exists():
+            self.root.after(15, self.actualizar_video)
+
+    def _mostrar_resultado(self, resultado):
+        """Muestra un resultado del pipeline en la interfaz (hilo de Tkinter)"""
+        rostros = resultado["rostros"]
+
+        # Guardar frame actual para referencia
+        self.current_frame = resultado["frame"]
+        self.face_locations_actual = [rostro["caja"] for rostro in rostros]
+
+        # Mostrar información en la barra de estado junto con los FPS de cada etapa
+        if len(rostros) > 0:
+            texto = f"Detectados {len(rostros)} rostros"
+        else:
+            texto = "No se detectan rostros en la imagen"
+        if self.mensaje_expiracion:
+            texto = f"{texto} | {self.mensaje_expiracion}"
+        self.statusbar.config(
+            text=f"{texto}  —  {self.pipeline.resumen_fps()} | Pantalla: {self.fps_pantalla.fps:.1f} fps")
+
+        # Procesar cada rostro reconocido
+        for rostro in rostros:
+            try:
+                persona_id = rostro["persona_id"]
+                nombre_bd = rostro["nombre"]
+                result = rostro["info"]
+                face_roi = rostro["rostro"]
+
+                if persona_id is None:
+                    self.status_label.config(text="⚠ Persona no reconocida", foreground="gray")
+                    self.dashboard_cooldown = max(0, self.dashboard_cooldown - 1)
+                    continue
+
+                if not result:
+                    continue
+
+                acceso = evaluar_acceso(nombre_bd, result)
+
+                # Actualizar etiqueta de estado
+                self.status_label.config(text=acceso["estado_texto"], foreground=acceso["color_estado"])
+
+                # Mostrar dashboard del usuario si tiene acceso permitido
+                # Usar un cooldown para evitar abrir constantemente la ventana
+                if result.habilitado == 1 and (self.dashboard_cooldown <= 0 or self.last_detected_user != persona_id):
+                    user_data = (result.habilitado, result.fecha_registro, result.carnet_id)
+                    self.mostrar_dashboard_usuario(persona_id, nombre_bd, user_data, face_roi)
+                    self.dashboard_cooldown = 60  # Enfriar por 60 frames (aproximadamente 2 segundos)
                 else:
-                    self.statusbar.config(text="No se detectan rostros en la imagen")
-
-                # Procesar cada rostro detectado
-                for (x, y, w, h) in faces:
-                    try:
-                        nombre = "Desconocido"
-                        color = (0, 255, 0)  # Color verde por defecto
-
-                        # Extraer región de interés
-                        face_roi = frame[y:y + h, x:x + w]
-
-                        if face_roi.size > 0:
-                            # Reconocimiento facial
-                            nombre_bd, confidence = self.logic.reconocer_rostro(face_roi)
-
-                            if nombre_bd != "Desconocido":
-                                result = self.logic.obtener_info_persona(nombre_bd)
-                                if result:
-                                    habilitado, fecha_registro, carnet_id = result
-                                    dias_restantes = "?"
-                                    if fecha_registro:
-                                        fecha = datetime.strptime(fecha_registro, "%Y-%m-%d")
-                                        dias = 30 - (datetime.now() - fecha).days
-                                        if dias <= 0:
-                                            dias_restantes = 0
-                                        else:
-                                            dias_restantes = dias
-
-                                    # Actualizar estado según condiciones
-                                    if habilitado == 0:
-                                        estado_texto = f"✘ {nombre_bd}: Acceso denegado"
-                                        self.status_label.config(foreground="red")
-                                        nombre = f"{nombre_bd} (DENEGADO)"
-                                        color = (0, 0, 255)  # Rojo en BGR
-                                    elif dias_restantes <= 5:
-                                        estado_texto = f"⚠ {nombre_bd}: {dias_restantes} días restantes"
-                                        self.status_label.config(foreground="orange")
-                                        nombre = f"{nombre_bd} ({dias_restantes} dias)"
-                                        color = (0, 165, 255)  # Naranja en BGR
-                                    else:
-                                        estado_texto = f"✓ {nombre_bd}: Acceso permitido ({dias_restantes} días)"
-                                        self.status_label.config(foreground="green")
-                                        nombre = f"{nombre_bd}"
-                                        color = (0, 255, 0)  # Verde en BGR
-
-                                    # Actualizar etiqueta de estado
-                                    self.status_label.config(text=estado_texto)
-
-                                    # Mostrar dashboard del usuario si tiene acceso permitido
-                                    # Usar un cooldown para evitar abrir constantemente la ventana
-                                    if habilitado == 1 and (self.dashboard_cooldown <= 0 or self.last_detected_user != nombre_bd):
-                                        self.mostrar_dashboard_usuario(nombre_bd, result, face_roi)
-                                        self.dashboard_cooldown = 60  # Enfriar por 60 frames (aproximadamente 2 segundos)
-                                    else:
-                                        self.dashboard_cooldown = max(0, self.dashboard_cooldown - 1)
-
-                                        # Si tenemos un dashboard abierto, actualizar la foto
-                                        if self.user_dashboard is not None and self.last_detected_user == nombre_bd:
-                                            self.user_dashboard.update_photo(face_roi)
-                            else:
-                                self.status_label.config(text="⚠ Persona no reconocida", foreground="gray")
-                                self.dashboard_cooldown = max(0, self.dashboard_cooldown - 1)
-
-                        # Dibujar rectángulo alrededor del rostro
-                        cv2.rectangle(display_frame, (x, y), (x + w, y + h), color, 2)
-
-                        # Añadir fondo para el texto
-                        text_size = cv2.getTextSize(nombre, cv2.FONT_HERSHEY_SIMPLEX, 0.75, 2)[0]
-                        cv2.rectangle(display_frame, (x, y - 30), (x + text_size[0] + 10, y), color, -1)
-                        cv2.putText(display_frame, nombre, (x + 5, y - 10),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.75, (255, 255, 255), 2)
-
-                    except Exception as e:
-                        print(f"Error procesando rostro: {e}")
-                        continue
-
-                # Guardar frame actual para referencia
-                self.current_frame = display_frame
-
-                # Convertir para visualización en Tkinter
-                img = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(img)
-
-                # Redimensionar para la interfaz
-                try:
-                    w, h = img.size
-                    target_height = 480
-                    ratio = target_height / h
-                    new_width = int(w * ratio)
-                    img = img.resize((new_width, target_height), Image.Resampling.LANCZOS)
-                except Exception as e:
-                    print(f"Error al redimensionar imagen: {e}")
-
-                # Crear PhotoImage y actualizar interfaz
-                try:
-                    imgtk = ImageTk.PhotoImage(image=img)
-                    self.video_label.imgtk = imgtk
-                    self.video_label.configure(image=imgtk)
-                except Exception as e:
-                    print(f"Error al actualizar imagen en UI: {e}")
+                    self.dashboard_cooldown = max(0, self.dashboard_cooldown - 1)
 
-                # Programar la siguiente actualización
-                if self.root.winfo_exists():
-                    # Usar after_idle para evitar que se acumulen llamadas
-                    self.root.after_idle(lambda: self.root.after(30, self.actualizar_video))
+                    # Si tenemos un dashboard abierto, actualizar la foto
+                    if self.user_dashboard is not None and self.last_detected_user == persona_id:
+                        self.user_dashboard.update_photo(face_roi)
 
             except Exception as e:
-                # Manejo de excepciones a nivel de ciclo de captura
-                print(f"Error general en actualizar_video: {e}")
-                self.statusbar.config(text=f"Error: {str(e)[:50]}...")
+                print(f"Error procesando rostro: {e}")
+                continue
 
-                # Reintentar con delay mayor
-                if self.root.winfo_exists():
-                    self.root.after(1500, self.actualizar_video)
-
-        except KeyboardInterrupt:
-            # Manejar explícitamente la interrupción por teclado
-            print("Interrupción por teclado capturada - reintentando ciclo de video")
-            if self.root.winfo_exists():
-                self.root.after(2000, self.actualizar_video)
+        # Crear PhotoImage y actualizar interfaz
+        try:
+            imgtk = ImageTk.PhotoImage(image=resultado["imagen"])
+            self.video_label.imgtk = imgtk
+            self.video_label.configure(image=imgtk)
+        except Exception as e:
+            print(f"Error al actualizar imagen en UI: {e}")
 
     def mostrar_admin(self, event=None):
         if not hasattr(self, 'admin_window'):
-            self.admin_window = AdminWindow(self.root, self.logic, self.cap)
+            self.admin_window = AdminWindow(self.root, self.logic, self.camara)
         self.admin_window.show()
 
     def registrar_rostro(self):
@@ -438,8 +338,12 @@ class FaceAppUI:
         progress_label = ttk.Label(progress_frame, text="Buscando rostro para iniciar captura...")
         progress_label.pack()
 
+        # Selección de las mejores muestras según su calidad
+        selector = SelectorMuestras()
+
         # Crear una barra de progreso
-        progress_bar = ttk.Progressbar(top, orient="horizontal", length=300, mode="determinate", maximum=10)
+        progress_bar = ttk.Progressbar(top, orient="horizontal", length=300, mode="determinate",
+                                       maximum=selector.suficientes)
         progress_bar.pack(pady=5)
 
         # Área de visualización de la cámara
@@ -450,70 +354,99 @@ class FaceAppUI:
         captured_images = []
         is_capturing = [False]
         rostro_detectado = [False]  # Para controlar si ya se detectó un rostro
+        caja_anterior = [None]  # Caja del frame anterior, para medir la estabilidad
 
         def guardar_imagenes():
             try:
-                # Usar el método para registrar múltiples imágenes
-                self.logic.registrar_rostro_multiple(nombre, captured_images[:10])
-                messagebox.showinfo("Éxito", f"10 imágenes del rostro de {nombre} registradas correctamente.")
+                # Registrar las imágenes, o fusionarlas si el rostro ya pertenece a alguien
+                mensaje = registrar_o_fusionar(top, self.logic, nombre, captured_images)
+                if mensaje is None:
+                    # Registro cancelado por el usuario
+                    top.destroy()
+                    return
+                messagebox.showinfo("Éxito", mensaje)
                 top.destroy()
             except Exception as e:
                 messagebox.showerror("Error", f"No se pudo registrar el rostro: {e}")
 
+        ultima_secuencia = [0]  # Último frame de la cámara ya procesado
+
         def actualizar_captura():
-            ret, frame = self.cap.read()
-            if ret:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = self.logic.face_cascade.detectMultiScale(
-                    gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
-                )
-
-                frame_copia = frame.copy()
-
-                # Si hay un rostro y no estamos capturando aún, iniciamos la captura
-                if len(faces) > 0 and not is_capturing[0] and not rostro_detectado[0]:
-                    is_capturing[0] = True
-                    rostro_detectado[0] = True
-                    progress_label.config(text="¡Rostro detectado! Capturando imágenes (0/10)")
-
-                # Dibujar rectángulos alrededor de los rostros detectados
-                for (x, y, w, h) in faces:
-                    cv2.rectangle(frame_copia, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-                # Si estamos en modo captura y hay un rostro, capturamos la imagen
-                if is_capturing[0] and len(faces) > 0:
-                    x, y, w, h = faces[0]  # Capturar el primer rostro detectado
-                    face_roi = frame[y:y + h, x:x + w]
-                    captured_images.append(face_roi)
-
-                    # Actualizar la barra de progreso y el texto
-                    num_captured = len(captured_images)
-                    progress_bar["value"] = num_captured
-                    progress_label.config(text=f"Capturando imágenes ({num_captured}/10)")
-
-                    # Señal visual de captura (rectángulo rojo)
-                    cv2.rectangle(frame_copia, (x, y), (x + w, y + h), (0, 0, 255), 3)
-
-                    if num_captured >= 10:
-                        is_capturing[0] = False
-                        progress_label.config(text="¡Captura completa! Guardando...")
-                        # Guardar automáticamente las imágenes después de un corto retraso
-                        top.after(500, guardar_imagenes)
-                    else:
-                        # Pequeño retraso para no tomar todas las imágenes idénticas
-                        # pero lo suficientemente rápido para ser automático
-                        top.after(100, actualizar_captura)
-                        return
-
-                # Mostrar la imagen en la interfaz
-                img = cv2.cvtColor(frame_copia, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(img)
-                imgtk = ImageTk.PhotoImage(image=img)
-                video_label.imgtk = imgtk
-                video_label.configure(image=imgtk)
-                video_label.img = imgtk
+            if not top.winfo_exists():
+                return
 
+            frame, secuencia, _ = self.camara.leer()
+            if frame is None or secuencia == ultima_secuencia[0]:
+                # Todavía no hay un frame nuevo de la cámara
                 top.after(30, actualizar_captura)
+                return
+            ultima_secuencia[0] = secuencia
+
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = self.logic.detectar_rostros(gray)
+
+            frame_copia = frame.copy()
+
+            # Si hay un rostro y no estamos capturando aún, iniciamos la captura
+            if len(faces) > 0 and not is_capturing[0] and not rostro_detectado[0]:
+                is_capturing[0] = True
+                rostro_detectado[0] = True
+                progress_label.config(text=f"¡Rostro detectado! Capturando imágenes (0/{selector.suficientes})")
+
+            # Dibujar rectángulos alrededor de los rostros detectados
+            for (x, y, w, h) in faces:
+                cv2.rectangle(frame_copia, (x, y), (x + w, y + h), (0, 255, 0), 2)
+
+            # Si estamos en modo captura y hay un rostro, lo evaluamos como candidato
+            if is_capturing[0] and len(faces) > 0:
+                x, y, w, h = faces[0]  # Capturar el primer rostro detectado
+                face_roi = frame[y:y + h, x:x + w]
+                calidad = evaluar_calidad(face_roi, faces[0], caja_anterior[0])
+                caja_anterior[0] = faces[0]
+                aceptada = selector.ofrecer(face_roi, calidad)
+
+                # Actualizar la barra de progreso y el texto
+                buenas = min(selector.buenas, selector.suficientes)
+                progress_bar["value"] = buenas
+                texto = f"Capturando imágenes ({buenas}/{selector.suficientes})"
+                if calidad.motivo:
+                    texto += f" - {calidad.motivo}"
+                progress_label.config(text=texto)
+
+                # Señal visual de captura: rojo si la muestra se guardó, naranja si se descartó
+                color = (0, 0, 255) if aceptada else (0, 165, 255)
+                cv2.rectangle(frame_copia, (x, y), (x + w, y + h), color, 3)
+
+                if selector.completo:
+                    is_capturing[0] = False
+                    captured_images[:] = selector.muestras()
+                    progress_label.config(text="¡Captura completa! Guardando...")
+                    # Guardar automáticamente las imágenes después de un corto retraso
+                    top.after(500, guardar_imagenes)
+                elif selector.fallido:
+                    # Ningún frame pasó el control de calidad: terminar en lugar de seguir siempre
+                    is_capturing[0] = False
+                    progress_label.config(text="No se pudo capturar el rostro")
+                    motivo = selector.ultimo_motivo or "calidad insuficiente"
+                    messagebox.showerror("Error", f"No se pudo capturar el rostro ({motivo}). "
+                                                  "Inténtelo de nuevo.")
+                    top.destroy()
+                    return
+                else:
+                    # Pequeño retraso para no tomar todas las imágenes idénticas
+                    # pero lo suficientemente rápido para ser automático
+                    top.after(100, actualizar_captura)
+                    return
+
+            # Mostrar la imagen en la interfaz
+            img = cv2.cvtColor(frame_copia, cv2.COLOR_BGR2RGB)
+            img = Image.fromarray(img)
+            imgtk = ImageTk.PhotoImage(image=img)
+            video_label.imgtk = imgtk
+            video_label.configure(image=imgtk)
+            video_label.img = imgtk
+
+            top.after(30, actualizar_captura)
 
         # Iniciar la actualización de la cámara que ahora incluye detección, captura y guardado automático
         actualizar_captura()
@@ -526,31 +459,38 @@ class FaceAppUI:
         y = (top.winfo_screenheight() // 2) - (height // 2)
         top.geometry(f'{width}x{height}+{x}+{y}')
 
-    def habilitar_acceso(self):
+    def _ids_desde_entrada(self):
+        """Resuelve el nombre escrito en el formulario a los ids de persona (o None si no hay)"""
         nombre = self.entry_update.get().strip()
         if not nombre or nombre == "Nombre para actualizar":
             messagebox.showwarning("Advertencia", "Ingrese un nombre válido.")
+            return nombre, None
+        ids = self.logic.buscar_ids_por_nombre(nombre)
+        if not ids:
+            messagebox.showwarning("Advertencia", f"No existe ninguna persona llamada {nombre}.")
+            return nombre, None
+        return nombre, ids
+
+    def habilitar_acceso(self):
+        nombre, ids = self._ids_desde_entrada()
+        if not ids:
             return
-        self.logic.cursor.execute(
-            "UPDATE personas SET habilitado = 1, expirado = 0 WHERE nombre = ?", (nombre,))
-        self.logic.com.commit()
+        for persona_id in ids:
+            self.logic.habilitar_persona(persona_id)
         messagebox.showinfo("Éxito", f"Acceso habilitado para {nombre}.")
 
     def deshabilitar_acceso(self):
-        nombre = self.entry_update.get().strip()
-        if not nombre or nombre == "Nombre para actualizar":
-            messagebox.showwarning("Advertencia", "Ingrese un nombre válido.")
+        nombre, ids = self._ids_desde_entrada()
+        if not ids:
             return
-        self.logic.cursor.execute(
-            "UPDATE personas SET habilitado = 0 WHERE nombre = ?", (nombre,))
-        self.logic.com.commit()
+        for persona_id in ids:
+            self.logic.deshabilitar_persona(persona_id)
         messagebox.showinfo("Éxito", f"Acceso deshabilitado para {nombre}.")
 
     def actualizar_dias_disponibles(self):
-        nombre = self.entry_update.get().strip()
         dias = self.entry_dias.get().strip()
-        if not nombre or nombre == "Nombre para actualizar":
-            messagebox.showwarning("Advertencia", "Ingrese un nombre válido.")
+        nombre, ids = self._ids_desde_entrada()
+        if not ids:
             return
         try:
             dias = int(dias)
@@ -560,24 +500,22 @@ class FaceAppUI:
             messagebox.showwarning("Advertencia", "Ingrese un número de días válido.")
             return
         fecha_nueva = (datetime.now() - timedelta(days=30 - dias)).strftime("%Y-%m-%d")
-        self.logic.cursor.execute(
-            "UPDATE personas SET fecha_registro = ?, habilitado = 1, expirado = 0 WHERE nombre = ?",
-            (fecha_nueva, nombre)
-        )
-        self.logic.com.commit()
+        for persona_id in ids:
+            self.logic.actualizar_fecha_registro(persona_id, fecha_nueva)
         messagebox.showinfo("Éxito", f"Días disponibles actualizados para {nombre}.")
 
-    def mostrar_dashboard_usuario(self, nombre_usuario, user_data, face_roi):
+    def mostrar_dashboard_usuario(self, persona_id, nombre_usuario, user_data, face_roi):
         """
         Muestra el dashboard del usuario cuando se detecta un rostro conocido
 
         Args:
+            persona_id: Id de la persona reconocida
             nombre_usuario: Nombre del usuario detectado
             user_data: Tupla con datos del usuario (habilitado, fecha_registro, carnet_id)
             face_roi: Región de interés del rostro detectado para mostrar en el dashboard
         """
         # Si ya hay un dashboard abierto para otro usuario, cerrarlo
-        if self.user_dashboard is not None and self.last_detected_user != nombre_usuario:
+        if self.user_dashboard is not None and self.last_detected_user != persona_id:
             if hasattr(self.user_dashboard, 'window') and self.user_dashboard.window is not None:
                 try:
                     self.user_dashboard.window.destroy()
@@ -588,10 +526,10 @@ class FaceAppUI:
 
         # Si no hay dashboard o es para otro usuario, crear uno nuevo
         if self.user_dashboard is None:
-            self.user_dashboard = UserDashboard(self.root, self.logic, nombre_usuario, user_data)
+            self.user_dashboard = UserDashboard(self.root, self.logic, persona_id, nombre_usuario, user_data)
             self.user_dashboard.show()
             self.dashboard_showing = True
-            self.last_detected_user = nombre_usuario
+            self.last_detected_user = persona_id
 
         # Actualizar la foto en el dashboard si está visible
         if self.user_dashboard is not None and hasattr(self.user_dashboard, 'window'):
@@ -604,6 +542,8 @@ class FaceAppUI:
                 self.last_detected_user = None
 
     def cerrar_aplicacion(self):
-        self.cap.release()
+        self.pipeline.detener()
+        self.tarea_expiracion.detener()
+        self.camara.detener()
         self.logic.cerrar()
         self.root.quit()